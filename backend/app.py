@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 import sys
 import os
 import pandas as pd
@@ -12,6 +12,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # 导入预测模块
 from stock_prediction.predict_by_agent import predict_by_agent, get_format_predict_result_by_agent, get_format_result_from_content
 from stock_prediction.fetch_stock_data import fetch_stock_data
+from stock_prediction.util.frame_cache import read_frame
+from stock_prediction.util.metrics import get_metrics_registry, PROMETHEUS_CONTENT_TYPE
 
 app = Flask(__name__)
 CORS(app)  # 启用CORS支持跨域请求
@@ -21,6 +23,11 @@ ws_server = WebSocketServer(app)  # 初始化WebSocket服务器
 def index():
     return jsonify({"message": "股票预测系统API服务已启动"})
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus 指标"""
+    return Response(get_metrics_registry().render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.route('/api/test/predict/agent', methods=['POST'])
 def test_predict_stock_by_agent():
     """测试使用代理模型预测股票"""
@@ -129,30 +136,32 @@ def predict_stock_traditional():
         
         # 构建数据路径
         data_path = os.path.join(root_dir, "stock_prediction", "data", stock_code, "股票日线数据.csv")
-        if method == 'LSTM':
-            model_path = os.path.join(root_dir, "stock_prediction", "traditional_model", method, "best_model.h5")
-            scaler_path = os.path.join(root_dir, "stock_prediction", "traditional_model", method, "scaler.npy")
+        # 记录模型推理耗时
+        with get_metrics_registry().histogram('model_predict_duration_seconds', '传统模型预测的耗时', ('method',)).time(method=method):
+            if method == 'LSTM':
+                model_path = os.path.join(root_dir, "stock_prediction", "traditional_model", method, "best_model.h5")
+                scaler_path = os.path.join(root_dir, "stock_prediction", "traditional_model", method, "scaler.npy")
             
-            from stock_prediction.traditional_model.LSTM.predict import predict_next_day
+                from stock_prediction.traditional_model.LSTM.predict import predict_next_day
             
-            # 预测下一天股价
-            result = predict_next_day(model_path, data_path, scaler_path)
-        elif method == 'SVM':
-            model_path = os.path.join(root_dir, "stock_prediction", "traditional_model", method, "best_model.pkl")
-            scaler_path = os.path.join(root_dir, "stock_prediction", "traditional_model", method, "scaler.npy")
+                # 预测下一天股价
+                result = predict_next_day(model_path, data_path, scaler_path)
+            elif method == 'SVM':
+                model_path = os.path.join(root_dir, "stock_prediction", "traditional_model", method, "best_model.pkl")
+                scaler_path = os.path.join(root_dir, "stock_prediction", "traditional_model", method, "scaler.npy")
 
-            from stock_prediction.traditional_model.SVM.predict import predict_next_day
+                from stock_prediction.traditional_model.SVM.predict import predict_next_day
 
-            # 预测下一天股价
-            result = predict_next_day(model_path, data_path, scaler_path)
-        elif method == 'Transformer':
-            model_path = os.path.join(root_dir, "stock_prediction", "traditional_model", method, "best_model.pt")
-            scaler_path = os.path.join(root_dir, "stock_prediction", "traditional_model", method, "scaler.pt")
+                # 预测下一天股价
+                result = predict_next_day(model_path, data_path, scaler_path)
+            elif method == 'Transformer':
+                model_path = os.path.join(root_dir, "stock_prediction", "traditional_model", method, "best_model.pt")
+                scaler_path = os.path.join(root_dir, "stock_prediction", "traditional_model", method, "scaler.pt")
 
-            from stock_prediction.traditional_model.transformer.predict import predict_next_day
+                from stock_prediction.traditional_model.transformer.predict import predict_next_day
 
-            # 预测下一天股价
-            result = predict_next_day(model_path, data_path, scaler_path)
+                # 预测下一天股价
+                result = predict_next_day(model_path, data_path, scaler_path)
 
         # 提取预测结果
         prediction_date = result['日期'].iloc[0].strftime("%Y-%m-%d")
@@ -214,7 +223,7 @@ def get_historical_data(stock_code):
                 return jsonify({"error": "无法获取股票历史数据"}), 404
         
         # 读取CSV文件
-        df = pd.read_csv(data_path)
+        df = read_frame(data_path, columns=["日期", "开盘", "收盘", "最低", "最高"])
         
         # 只返回最近20天的数据
         df = df.tail(20)
@@ -1,19 +1,41 @@
 import os
+import time
+import asyncio
 from datetime import datetime
 # 升级方舟 SDK 到最新版本 pip install -U 'volcengine-python-sdk[ark]'
-from volcenginesdkarkruntime import Ark
+from volcenginesdkarkruntime import Ark, AsyncArk
+from .response_cache import get_default_response_cache
+from stock_prediction.util.metrics import StreamMetrics, get_metrics_registry
+from stock_prediction.util.prompt_format import PromptFormatter, get_prompt_format
+from stock_prediction.util.token_budget import TokenBudget, get_token_budget
 
 class Agent:
     def __init__(self, api_key: str = None) -> None:
         # 自定义 deepseek-R1 接入点
         self.model = "ep-20250218214614-mhts7"
         self.timeout = 1800
+        # 优先使用传入的API Key，如果未传入则从环境变量读取
+        self.api_key = api_key or os.environ.get("ARK_API_KEY")
         self.client = Ark(
-            # 优先使用传入的API Key，如果未传入则从环境变量读取
-            api_key = api_key or os.environ.get("ARK_API_KEY"),
+            api_key = self.api_key,
             # 深度推理模型耗费时间会较长，请您设置较大的超时时间，避免超时，推荐30分钟以上
             timeout = self.timeout,
         )
+        # 异步客户端按需创建，同一进程内可并发驱动大量流式请求而无需每个流占用一个线程，用完后需调用 aclose 释放连接池
+        self._async_client = None
+        # 分析名称（如 市场分析），用于日志和输出文件名；stock_code 为 None 时表示与个股无关
+        self.analysis_name = self.__class__.__name__
+        self.stock_code = None
+        # 系统提示词，由子类设置
+        self.system_prompt = []
+        # 额外的采样参数（如 temperature），会参与响应缓存键的计算
+        self.sampling_params = {}
+        # 响应缓存，相同输入直接回放历史输出，置为 None 可关闭
+        self.response_cache = get_default_response_cache()
+        # 提示词中数据的序列化格式，为 None 时由环境变量决定（见 get_prompt_format）
+        self.prompt_format = None
+        # 提示词中数据部分的 token 预算，为 None 时由环境变量或默认值决定（见 get_token_budget）
+        self.token_budget = None
         self.reasoning_content = ""
         self.content = ""
         self.log_file_path = "agent/suggestions"
@@ -38,37 +60,248 @@ class Agent:
     def get_answer(self, response) -> str:
         return response.choices[0].message.content
     
-    def ask_agent_streaming_output(self, content: str, messages = None, ws_server = None) -> tuple[str, str]:
-        response = self.client.chat.completions.create(
+    @property
+    def async_client(self) -> AsyncArk:
+        """
+        异步方舟客户端，首次使用时创建
+        """
+        if self._async_client is None:
+            self._async_client = AsyncArk(
+                api_key = self.api_key,
+                timeout = self.timeout,
+            )
+        return self._async_client
+
+    async def aclose(self) -> None:
+        """
+        关闭异步客户端，释放其持有的连接池
+        """
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    async def ask_agent_async(self, content: str, messages = None):
+        """
+        ask_agent 的异步版本
+        """
+        response = await self.async_client.chat.completions.create(
             model = self.model,
             messages = messages + [
                 {"role": "user", "content": content}
-            ],
-            stream = True
+            ]
         )
+        return response
+
+    def consume_stream_chunk(self, chunk, ws_server = None) -> list:
+        """
+        处理一个流式输出分片：累积推理过程和回答，并打印或推送到前端
+        :return: [分片类型('reasoning'/'content'), 分片文本]
+        """
+        if hasattr(chunk.choices[0].delta, 'reasoning_content') and chunk.choices[0].delta.reasoning_content:
+            return self.consume_text('reasoning', chunk.choices[0].delta.reasoning_content, ws_server)
+        return self.consume_text('content', chunk.choices[0].delta.content, ws_server)
+
+    def consume_text(self, kind: str, tmp_content: str, ws_server = None) -> list:
+        """
+        累积一段推理过程或回答，并打印或推送到前端
+        """
+        if kind == 'reasoning':
+            self.reasoning_content += tmp_content
+        else:
+            self.content += tmp_content
+        if ws_server is None:
+            print(tmp_content, end="")
+        else:
+            # 实时推送推理过程
+            ws_server.emit_analysis_progress(self.agent_type, self.status_messages[0], tmp_content)
+        return [kind, tmp_content]
+
+    @property
+    def metric_label(self) -> str:
+        """
+        指标中标识该智能体的标签值
+        """
+        return getattr(self, 'agent_type', self.__class__.__name__)
+
+    @property
+    def prompt_formatter(self) -> PromptFormatter:
+        """
+        读取数据时使用的序列化方式，同时按智能体统计 token 节省量
+
+        每次获取都会创建新的预算，同一次提示词构建中的多次读取应共用同一个 formatter
+        """
+        budget = TokenBudget(self.token_budget or get_token_budget(self.metric_label), agent=self.metric_label)
+        return PromptFormatter(self.prompt_format or get_prompt_format(self.metric_label), agent=self.metric_label,
+                               budget=budget)
+
+    def finish_stream(self, ws_server = None) -> None:
+        """
+        流式输出结束
+        """
         if ws_server is None:
-            for chunk in response:
-                if hasattr(chunk.choices[0].delta, 'reasoning_content') and chunk.choices[0].delta.reasoning_content:
-                    self.reasoning_content += chunk.choices[0].delta.reasoning_content
-                    print(chunk.choices[0].delta.reasoning_content, end="")
-                else:
-                    self.content += chunk.choices[0].delta.content
-                    print(chunk.choices[0].delta.content, end="")
             print("\n")
         else:
-            for chunk in response:
-                tmp_content = ""
-                if hasattr(chunk.choices[0].delta,'reasoning_content') and chunk.choices[0].delta.reasoning_content:
-                    tmp_content = chunk.choices[0].delta.reasoning_content
-                    # 实时推送推理过程                    
-                    self.reasoning_content += tmp_content
-                else:
-                    tmp_content = chunk.choices[0].delta.content
-                    self.content += tmp_content
-                ws_server.emit_analysis_progress(self.agent_type, self.status_messages[0], tmp_content)
             # 结束推理
             ws_server.emit_analysis_progress(self.agent_type, self.status_messages[1])
+
+    def load_cached_stream(self, messages: list) -> tuple[str, dict]:
+        """
+        查询响应缓存（读取磁盘）
+        :param messages: 完整的消息列表
+        :return: (缓存键, 缓存条目)，未启用缓存时缓存键为None，未命中时缓存条目为None
+        """
+        if self.response_cache is None:
+            return None, None
+        cache_key = self.response_cache.make_key(self.model, messages, self.sampling_params)
+        entry = self.response_cache.get(cache_key)
+        cache_counter = get_metrics_registry().counter('agent_response_cache_total', '智能体响应缓存的命中情况', ('agent', 'result'))
+        cache_counter.inc(agent=self.metric_label, result='miss' if entry is None else 'hit')
+        return cache_key, entry
+
+    def replay_cached_stream(self, cache_key: str, entry: dict, ws_server = None) -> None:
+        """
+        按原分片顺序将缓存的输出回放到控制台或WebSocket
+        """
+        print(f'✅ 命中响应缓存: {cache_key[:12]}')
+        if entry.get('chunks'):
+            for kind, tmp_content in entry['chunks']:
+                self.consume_text(kind, tmp_content, ws_server)
+        else:
+            if entry.get('reasoning_content'):
+                self.consume_text('reasoning', entry['reasoning_content'], ws_server)
+            self.consume_text('content', entry.get('content', ''), ws_server)
+        self.finish_stream(ws_server)
+
+    def lookup_cached_stream(self, messages: list, ws_server = None) -> tuple[str, bool]:
+        """
+        查询响应缓存，命中时按原分片顺序回放到控制台或WebSocket
+        :param messages: 完整的消息列表
+        :return: (缓存键, 是否命中)，未启用缓存时缓存键为None
+        """
+        cache_key, entry = self.load_cached_stream(messages)
+        if entry is None:
+            return cache_key, False
+        self.replay_cached_stream(cache_key, entry, ws_server)
+        return cache_key, True
+
+    def store_cached_stream(self, cache_key: str, chunks: list) -> None:
+        """
+        将本次流式输出写入响应缓存
+        """
+        if self.response_cache is None or cache_key is None:
+            return
+        reasoning_content = ''.join(text for kind, text in chunks if kind == 'reasoning')
+        content = ''.join(text for kind, text in chunks if kind == 'content')
+        try:
+            self.response_cache.put(cache_key, self.model, reasoning_content, content, chunks)
+        except OSError as e:
+            print(f"❌ 写入响应缓存失败: {str(e)}")
+
+    def ask_agent_streaming_output(self, content: str, messages = None, ws_server = None) -> tuple[str, str]:
+        messages = messages + [
+            {"role": "user", "content": content}
+        ]
+        cache_key, hit = self.lookup_cached_stream(messages, ws_server)
+        if hit:
+            return self.reasoning_content, self.content
+
+        stream_metrics = StreamMetrics(self.metric_label)
+        response = self.client.chat.completions.create(
+            model = self.model,
+            messages = messages,
+            stream = True,
+            **self.sampling_params
+        )
+        chunks = []
+        for chunk in response:
+            stream_metrics.on_chunk(chunk)
+            chunks.append(self.consume_stream_chunk(chunk, ws_server))
+        stream_metrics.finish()
+        self.finish_stream(ws_server)
+        self.store_cached_stream(cache_key, chunks)
         return self.reasoning_content, self.content
+
+    async def ask_agent_streaming_output_async(self, content: str, messages = None, ws_server = None) -> tuple[str, str]:
+        """
+        ask_agent_streaming_output 的异步版本，在事件循环中迭代流式响应，缓存的磁盘读写放到线程中执行
+        """
+        messages = messages + [
+            {"role": "user", "content": content}
+        ]
+        cache_key, entry = await asyncio.to_thread(self.load_cached_stream, messages)
+        if entry is not None:
+            self.replay_cached_stream(cache_key, entry, ws_server)
+            return self.reasoning_content, self.content
+
+        stream_metrics = StreamMetrics(self.metric_label)
+        response = await self.async_client.chat.completions.create(
+            model = self.model,
+            messages = messages,
+            stream = True,
+            **self.sampling_params
+        )
+        chunks = []
+        async for chunk in response:
+            stream_metrics.on_chunk(chunk)
+            chunks.append(self.consume_stream_chunk(chunk, ws_server))
+        stream_metrics.finish()
+        self.finish_stream(ws_server)
+        await asyncio.to_thread(self.store_cached_stream, cache_key, chunks)
+        return self.reasoning_content, self.content
+
+    def build_analysis_content(self, target_date: str = None) -> str:
+        """
+        读取数据并构建分析提示词，由子类实现
+        :param target_date: 目标日期, 格式%Y%m%d, 如果为None则使用最新数据
+        :return: 提示词, 数据为空时返回空字符串
+        """
+        raise NotImplementedError
+
+    @property
+    def analysis_title(self) -> str:
+        """
+        日志中显示的分析名称
+        """
+        return self.analysis_name if self.stock_code is None else f'{self.analysis_name} {self.stock_code}'
+
+    def finish_analysis(self, start_time: float, target_date: str = None) -> None:
+        """
+        打印耗时并保存输出
+        """
+        print(f'⏰ {self.analysis_name}完成，耗时 {time.time() - start_time:.2f}秒')
+        self.save_analysis_output(target_date)
+
+    def analyze(self, target_date: str = None, ws_server = None) -> tuple[str, str]:
+        """
+        构建提示词、请求模型并保存输出
+        :param target_date: 目标日期, 格式%Y%m%d, 如果为None则使用最新数据
+        :return: (推理过程, 分析结果)，数据为空时返回空字符串
+        """
+        print(f'🔍 开始{self.analysis_title}')
+        start_time = time.time()
+
+        content = self.build_analysis_content(target_date)
+        if not content:
+            return "", ""
+
+        reasoning_content, content = self.ask_agent_streaming_output(content=content, messages=self.system_prompt, ws_server=ws_server)
+        self.finish_analysis(start_time, target_date)
+        return reasoning_content, content
+
+    async def analyze_async(self, target_date: str = None, ws_server = None) -> tuple[str, str]:
+        """
+        analyze 的异步版本，读取数据和保存输出放到线程中执行，不阻塞事件循环中的其他流
+        """
+        print(f'🔍 开始{self.analysis_title}')
+        start_time = time.time()
+
+        content = await asyncio.to_thread(self.build_analysis_content, target_date)
+        if not content:
+            return "", ""
+
+        reasoning_content, content = await self.ask_agent_streaming_output_async(content=content, messages=self.system_prompt, ws_server=ws_server)
+        await asyncio.to_thread(self.finish_analysis, start_time, target_date)
+        return reasoning_content, content
     
     def save_output(self, file_name: str = None):
         """
@@ -93,6 +326,16 @@ class Agent:
             if self.content:
                 f.write(self.content)
 
+    def save_analysis_output(self, target_date: str = None) -> None:
+        """
+        保存分析输出，文件名包含股票代码、分析名称和目标日期
+        """
+        if target_date is None:
+            self.save_output()
+            return
+        prefix = self.analysis_name if self.stock_code is None else f'{self.stock_code}{self.analysis_name}'
+        self.save_output(f"{prefix}_{str(target_date).replace(' ', '_').replace(':', '_')}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.md")
+
 
 if __name__ == '__main__':
     agent = Agent()
@@ -5,72 +5,158 @@ from .fundamental_analysis_agent import FundamentalAnalysisAgent
 from .agent import Agent
 from .macro_analysis_agent import MacroAnalysisAgent
 import time
-from datetime import datetime
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from stock_prediction.util.metrics import get_metrics_registry
+from stock_prediction.util.prompt_format import get_prompt_token_report
 
 class DecisionMakingAgent(Agent):
-    def __init__(self, stock_code: str, data_path: str = None, api_key: str = None) -> None:
+    def __init__(self, stock_code: str, data_path: str = None, api_key: str = None, data_view=None) -> None:
         """
-        data_path:
-            
+        data_path: 数据根目录
+        data_view: 按日期切片的内存数据视图（AsOfDataView），传入时各代理从视图读取数据
         """
         super().__init__(api_key=api_key)
 
         self.agent_type = 'decision'
         self.status_messages = ['开始决策分析...', '决策分析完成']
+        self.analysis_name = '决策分析'
         
         self.stock_code = stock_code
         self.data_path = data_path
+        self.data_view = data_view
         
-        self.market_analysis_agent = MarketAnalysisAgent(stock_code=self.stock_code, data_path=self.data_path, api_key=api_key)
-        self.news_analysis_agent = NewsAnalysisAgent(stock_code=self.stock_code, data_path=self.data_path, api_key=api_key)
-        self.fundamental_analysis_agent = FundamentalAnalysisAgent(stock_code=self.stock_code, data_path=self.data_path, api_key=api_key)
-        self.macro_analysis_agent = MacroAnalysisAgent(data_path=self.data_path, api_key=api_key)
+        self.market_analysis_agent = MarketAnalysisAgent(stock_code=self.stock_code, data_path=self.data_path, api_key=api_key, data_view=self.data_view)
+        self.news_analysis_agent = NewsAnalysisAgent(stock_code=self.stock_code, data_path=self.data_path, api_key=api_key, data_view=self.data_view)
+        self.fundamental_analysis_agent = FundamentalAnalysisAgent(stock_code=self.stock_code, data_path=self.data_path, api_key=api_key, data_view=self.data_view)
+        self.macro_analysis_agent = MacroAnalysisAgent(data_path=self.data_path, api_key=api_key, data_view=self.data_view)
 
         self.agent_name = '决策制定代理'
 
-    def make_decision(self, target_date: str = None, ws_server=None) -> tuple[str, str]:
+        # 最近一次决策中各代理的耗时（秒）
+        self.agent_timings = {}
+
+    def make_decision(self, target_date: str = None, ws_server=None, concurrent: bool = True) -> tuple[str, str]:
         """
         做出投资决策
         :param target_date: 目标日期, 格式%Y%m%d, 如果为None则使用最新数据
         :param ws_server: WebSocket服务器实例，用于实时推送分析进度
+        :param concurrent: 是否并发执行四个分析代理，False 时按顺序依次执行
         :return: (推理过程, 决策建议)
         """
         start_time = time.time()
-        
-        market_analysis_result = self.market_analysis_agent.analyze_market(target_date=target_date, ws_server=ws_server)
-        news_analysis_result = self.news_analysis_agent.analyze_news(target_date=target_date, ws_server=ws_server)
-        fundamentals_analysis_result = self.fundamental_analysis_agent.analyze_fundamentals(target_date=target_date, ws_server=ws_server)
-        macro_analysis_result = self.macro_analysis_agent.analyze_macro_data(target_date=target_date, ws_server=ws_server)
+
+        # 四个分析代理互相独立，各自持有独立的客户端和输出缓冲区
+        analysis_tasks = {
+            'market': lambda: self.market_analysis_agent.analyze_market(target_date=target_date, ws_server=ws_server),
+            'news': lambda: self.news_analysis_agent.analyze_news(target_date=target_date, ws_server=ws_server),
+            'fundamental': lambda: self.fundamental_analysis_agent.analyze_fundamentals(target_date=target_date, ws_server=ws_server),
+            'macro': lambda: self.macro_analysis_agent.analyze_macro_data(target_date=target_date, ws_server=ws_server),
+        }
+        analysis_results = self.run_analysis_tasks(analysis_tasks, concurrent=concurrent)
 
         # 综合分析结果
         print('🔍 开始综合分析结果')
+        decision_start_time = time.time()
         reasoning, decision = self.generate_decision_suggestion(
-            market_analysis_result, 
-            news_analysis_result, 
-            fundamentals_analysis_result, 
-            macro_analysis_result,
+            analysis_results['market'],
+            analysis_results['news'],
+            analysis_results['fundamental'],
+            analysis_results['macro'],
             target_date,
             ws_server=ws_server
         )
+        self.agent_timings['decision'] = time.time() - decision_start_time
         print('✅ 综合分析结果获取完成')
         
         end_time = time.time()
         total_time = end_time - start_time
-        print(f'⏰ 所有分析完成，总耗时 {total_time:.2f}秒')
+        self.agent_timings['total'] = total_time
+        self.report_timings()
         
         return reasoning, decision
+
+    def report_timings(self) -> None:
+        """
+        打印各阶段耗时和提示词 token 节省统计，并记录到指标中
+        """
+        stage_histogram = get_metrics_registry().histogram('decision_stage_duration_seconds', '决策流程各阶段的耗时', ('stage',))
+        for name, seconds in self.agent_timings.items():
+            stage_histogram.observe(seconds, stage=name)
+        timing_summary = ', '.join(f'{name}: {seconds:.2f}秒' for name, seconds in self.agent_timings.items())
+        print(f'⏰ 所有分析完成，总耗时 {self.agent_timings["total"]:.2f}秒 ({timing_summary})')
+        get_prompt_token_report().print_report()
+
+    def run_analysis_tasks(self, analysis_tasks: dict, concurrent: bool = True) -> dict:
+        """
+        执行各个分析代理，并记录每个代理的耗时
+        :param analysis_tasks: {agent_type: 无参调用} 形式的任务字典
+        :param concurrent: 是否使用线程池并发执行
+        :return: {agent_type: (推理过程, 分析结果)}
+        """
+        self.agent_timings = {}
+
+        def timed_task(agent_type, task):
+            task_start_time = time.time()
+            try:
+                return task()
+            finally:
+                self.agent_timings[agent_type] = time.time() - task_start_time
+
+        if not concurrent:
+            return {agent_type: timed_task(agent_type, task) for agent_type, task in analysis_tasks.items()}
+
+        with ThreadPoolExecutor(max_workers=len(analysis_tasks), thread_name_prefix='analysis_agent') as executor:
+            futures = {agent_type: executor.submit(timed_task, agent_type, task) for agent_type, task in analysis_tasks.items()}
+            return {agent_type: future.result() for agent_type, future in futures.items()}
     
-    def generate_decision_suggestion(self, market_analysis_result: tuple[str, str], news_analysis_result: tuple[str, str], fundamentals_analysis_result: tuple[str, str], macro_analysis_result: tuple[str, str], target_date: str = None, ws_server = None) -> tuple[str, str]:
+    async def make_decision_async(self, target_date: str = None, ws_server=None) -> tuple[str, str]:
         """
-        根据三个分析结果生成最终决策建议
-        :param market_analysis_result: 市场分析结果
-        :param news_analysis_result: 新闻分析结果
-        :param fundamentals_analysis_result: 基本面分析结果
-        :param macro_analysis_result: 宏观分析结果
-        :return: (思考过程, 决策建议)
+        make_decision 的异步版本，四个分析代理在同一事件循环中并发执行
+        :param target_date: 目标日期, 格式%Y%m%d, 如果为None则使用最新数据
+        :param ws_server: WebSocket服务器实例，用于实时推送分析进度
+        :return: (推理过程, 决策建议)
         """
         start_time = time.time()
+        self.agent_timings = {}
+
+        async def timed_task(agent_type, coroutine):
+            task_start_time = time.time()
+            try:
+                return await coroutine
+            finally:
+                self.agent_timings[agent_type] = time.time() - task_start_time
 
+        market_analysis_result, news_analysis_result, fundamentals_analysis_result, macro_analysis_result = await asyncio.gather(
+            timed_task('market', self.market_analysis_agent.analyze_market_async(target_date=target_date, ws_server=ws_server)),
+            timed_task('news', self.news_analysis_agent.analyze_news_async(target_date=target_date, ws_server=ws_server)),
+            timed_task('fundamental', self.fundamental_analysis_agent.analyze_fundamentals_async(target_date=target_date, ws_server=ws_server)),
+            timed_task('macro', self.macro_analysis_agent.analyze_macro_data_async(target_date=target_date, ws_server=ws_server)),
+        )
+
+        # 综合分析结果
+        print('🔍 开始综合分析结果')
+        reasoning, decision = await timed_task('decision', self.generate_decision_suggestion_async(
+            market_analysis_result,
+            news_analysis_result,
+            fundamentals_analysis_result,
+            macro_analysis_result,
+            target_date,
+            ws_server=ws_server
+        ))
+        print('✅ 综合分析结果获取完成')
+
+        total_time = time.time() - start_time
+        self.agent_timings['total'] = total_time
+        self.report_timings()
+
+        return reasoning, decision
+
+    def build_decision_prompt(self, market_analysis_result: tuple[str, str], news_analysis_result: tuple[str, str], fundamentals_analysis_result: tuple[str, str], macro_analysis_result: tuple[str, str]) -> tuple[list, str]:
+        """
+        构建决策代理的系统提示词和分析提示词
+        :return: (messages, content)
+        """
         # 构建系统提示词
         system_prompt = """你是一个短线交易员，擅长综合各类分析结果做出对下一日股价的涨跌预测。
         在分析时，请遵循以下原则：
@@ -103,23 +189,54 @@ class DecisionMakingAgent(Agent):
         例如：
         看跌 25.98
         """
+        return [{"role": "system", "content": system_prompt}], content
+
+    def generate_decision_suggestion(self, market_analysis_result: tuple[str, str], news_analysis_result: tuple[str, str], fundamentals_analysis_result: tuple[str, str], macro_analysis_result: tuple[str, str], target_date: str = None, ws_server = None) -> tuple[str, str]:
+        """
+        根据三个分析结果生成最终决策建议
+        :param market_analysis_result: 市场分析结果
+        :param news_analysis_result: 新闻分析结果
+        :param fundamentals_analysis_result: 基本面分析结果
+        :param macro_analysis_result: 宏观分析结果
+        :return: (思考过程, 决策建议)
+        """
+        start_time = time.time()
+
+        messages, content = self.build_decision_prompt(market_analysis_result, news_analysis_result, fundamentals_analysis_result, macro_analysis_result)
         
         # 获取模型响应
-        reasoning_content, content = self.ask_agent_streaming_output(content=content, messages=[{"role": "system", "content": system_prompt}], ws_server=ws_server)
-        
-        end_time = time.time()
-        process_time = end_time - start_time
-        print(f'⏰ 决策分析完成，耗时 {process_time:.2f}秒')
+        reasoning_content, content = self.ask_agent_streaming_output(content=content, messages=messages, ws_server=ws_server)
         
-        # 保存输出
-        if target_date is not None:
-            self.save_output(f"{self.stock_code}决策分析_{str(target_date).replace(' ', '_').replace(':', '_')}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.md")
-        else:
-            self.save_output()
+        # 打印耗时并保存输出
+        self.finish_analysis(start_time, target_date)
 
         # 返回思考过程和决策建议
         return reasoning_content, content
 
+    async def generate_decision_suggestion_async(self, market_analysis_result: tuple[str, str], news_analysis_result: tuple[str, str], fundamentals_analysis_result: tuple[str, str], macro_analysis_result: tuple[str, str], target_date: str = None, ws_server = None) -> tuple[str, str]:
+        """
+        generate_decision_suggestion 的异步版本
+        """
+        start_time = time.time()
+
+        messages, content = self.build_decision_prompt(market_analysis_result, news_analysis_result, fundamentals_analysis_result, macro_analysis_result)
+        reasoning_content, content = await self.ask_agent_streaming_output_async(content=content, messages=messages, ws_server=ws_server)
+
+        await asyncio.to_thread(self.finish_analysis, start_time, target_date)
+        return reasoning_content, content
+
+    async def aclose(self) -> None:
+        """
+        关闭自身及四个分析代理的异步客户端
+        """
+        await asyncio.gather(
+            self.market_analysis_agent.aclose(),
+            self.news_analysis_agent.aclose(),
+            self.fundamental_analysis_agent.aclose(),
+            self.macro_analysis_agent.aclose(),
+        )
+        await super().aclose()
+
 
 if __name__ == '__main__':
     # 测试代码
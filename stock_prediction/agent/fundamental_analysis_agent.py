@@ -1,18 +1,19 @@
 import os
 from .agent import Agent
 from stock_prediction.util.data_reader import get_stock_fundamentals_data
-import time
-from datetime import datetime
 
 class FundamentalAnalysisAgent(Agent):
-    def __init__(self, stock_code: str, data_path: str = None, api_key: str = None) -> None:
+    def __init__(self, stock_code: str, data_path: str = None, api_key: str = None, data_view=None) -> None:
         super().__init__(api_key=api_key)
 
         self.agent_type = 'fundamental'
         self.status_messages = ['正在进行基本面分析...', '基本面分析完成']
+        self.analysis_name = '基本面分析'
 
         self.stock_code = stock_code
         self.data_path = data_path
+        # 按日期切片的内存数据视图，为None时直接读取data_path下的文件
+        self.data_view = data_view
         
         # 定义系统提示词，用于指导模型进行财务分析
         system_prompt = """你是一个专业的财务分析师，擅长分析公司财务报表和基本面。
@@ -44,41 +45,34 @@ class FundamentalAnalysisAgent(Agent):
         生成一份完整的财务分析报告。
         """
         
-    def analyze_fundamentals(self, target_date: str = None, ws_server=None) -> tuple[str, str]:
+    def build_analysis_content(self, target_date: str = None) -> str:
         """
-        分析公司财务数据并返回推理过程和投资建议
+        读取基本面数据并构建财务分析提示词
         :param target_date: 目标日期, 格式%Y%m%d, 如果为None则使用最新数据
-        :return: (推理过程, 投资建议)
+        :return: 提示词, 数据为空时返回空字符串
         """
-        print(f'🔍 开始基本面分析 {self.stock_code}')
-        start_time = time.time()
-
-        tmp_content = get_stock_fundamentals_data(stock_code=self.stock_code, target_date=target_date, data_path=self.data_path)
+        tmp_content = get_stock_fundamentals_data(stock_code=self.stock_code, target_date=target_date, data_path=self.data_path, data_view=self.data_view, formatter=self.prompt_formatter)
         if tmp_content is None or tmp_content == "":
             print("❌ 基本面数据为空, 将不进行基本面分析")
-            return "", ""
+            return ""
         # 构建完整的提示词
-        content = self.content_template.format(
+        return self.content_template.format(
             content=tmp_content
         )
 
-        # print('content: ', content)
-
-        reasoning_content, content = self.ask_agent_streaming_output(content=content, messages=self.system_prompt, ws_server=ws_server)
-            
-        end_time = time.time()
-        process_time = end_time - start_time
-        print(f'⏰ 基本面分析完成，耗时 {process_time: .2f}秒')
-
-        # 保存输出
-        if target_date is not None:
-            self.save_output(f"{self.stock_code}基本面分析_{str(target_date).replace(' ', '_').replace(':', '_')}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.md")
-        else:
-            self.save_output()
+    def analyze_fundamentals(self, target_date: str = None, ws_server=None) -> tuple[str, str]:
+        """
+        分析公司财务数据并返回推理过程和投资建议
+        :param target_date: 目标日期, 格式%Y%m%d, 如果为None则使用最新数据
+        :return: (推理过程, 投资建议)
+        """
+        return self.analyze(target_date=target_date, ws_server=ws_server)
 
-        # 返回推理过程和投资建议
-        # return self.get_reasoning_content(response), self.get_answer(response)
-        return reasoning_content, content
+    async def analyze_fundamentals_async(self, target_date: str = None, ws_server=None) -> tuple[str, str]:
+        """
+        analyze_fundamentals 的异步版本
+        """
+        return await self.analyze_async(target_date=target_date, ws_server=ws_server)
 
 if __name__ == '__main__':
     # 测试代码
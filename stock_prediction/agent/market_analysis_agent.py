@@ -1,17 +1,18 @@
 import os
 from .agent import Agent
 from stock_prediction.util.data_reader import get_stock_price_data
-import time
-from datetime import datetime
 class MarketAnalysisAgent(Agent):
-    def __init__(self, stock_code: str, data_path: str = None, api_key: str = None) -> None:
+    def __init__(self, stock_code: str, data_path: str = None, api_key: str = None, data_view=None) -> None:
         super().__init__(api_key=api_key)
 
         self.agent_type = 'market'
         self.status_messages = ['正在进行市场分析...', '市场分析完成']
+        self.analysis_name = '市场分析'
 
         self.stock_code = stock_code
         self.data_path = data_path
+        # 按日期切片的内存数据视图，为None时直接读取data_path下的文件
+        self.data_view = data_view
 
         # 定义系统提示词，用于指导模型进行市场分析
         system_prompt = """你是一个专业的股票市场分析师，擅长技术分析和市场预测。
@@ -44,42 +45,36 @@ class MarketAnalysisAgent(Agent):
         请基于以上数据，给出详细的市场分析和预测。
         """
         
-    def analyze_market(self, target_date: str = None, ws_server=None) -> tuple[str, str]:
+    def build_analysis_content(self, target_date: str = None) -> str:
         """
-        分析市场数据并返回推理过程和预测结果
+        读取价格数据并构建市场分析提示词
         :param target_date: 目标预测日期, 格式%Y%m%d, 如果为None则使用最新数据
-        :return: (推理过程, 预测结果)
+        :return: 提示词, 数据为空时返回空字符串
         """
-        print(f'🔍 开始市场分析 {self.stock_code}')
-        start_time = time.time()
-
-        tmp_price_data=get_stock_price_data(stock_code=self.stock_code, target_date=target_date, data_path=self.data_path),
+        tmp_price_data=get_stock_price_data(stock_code=self.stock_code, target_date=target_date, data_path=self.data_path, data_view=self.data_view, formatter=self.prompt_formatter)
         
         if tmp_price_data is None or tmp_price_data == "":
             print("❌ 市场数据为空, 将不进行市场分析")
-            return "", ""
+            return ""
 
         # 构建完整的提示词
-        content = self.content_template.format(
+        return self.content_template.format(
             price_data=tmp_price_data
         )
-        
-        # 获取模型响应
-        reasoning_content, content = self.ask_agent_streaming_output(content=content, messages=self.system_prompt, ws_server=ws_server)
-        
-        end_time = time.time()
-        process_time = end_time - start_time
-        print(f'⏰ 市场分析完成，耗时 {process_time: .2f}秒')
 
-        # 保存输出
-        if target_date is not None:
-            self.save_output(f"{self.stock_code}市场分析_{str(target_date).replace(' ', '_').replace(':', '_')}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.md")
-        else:
-            self.save_output()
-        
-        # 返回推理过程和预测结果
-        return reasoning_content, content
+    def analyze_market(self, target_date: str = None, ws_server=None) -> tuple[str, str]:
+        """
+        分析市场数据并返回推理过程和预测结果
+        :param target_date: 目标预测日期, 格式%Y%m%d, 如果为None则使用最新数据
+        :return: (推理过程, 预测结果)
+        """
+        return self.analyze(target_date=target_date, ws_server=ws_server)
 
+    async def analyze_market_async(self, target_date: str = None, ws_server=None) -> tuple[str, str]:
+        """
+        analyze_market 的异步版本
+        """
+        return await self.analyze_async(target_date=target_date, ws_server=ws_server)
 
 if __name__ == '__main__':
     # 测试代码
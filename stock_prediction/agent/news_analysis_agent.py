@@ -1,18 +1,19 @@
 import os
 from .agent import Agent
-from stock_prediction.util.data_reader import read_specific_csv, read_stock_news_csv_by_date
-import time
-from datetime import datetime
+from stock_prediction.util.data_reader import read_specific_csv, read_stock_news_csv_by_date, load_company_profile
 
 class NewsAnalysisAgent(Agent):
-    def __init__(self, stock_code: int, data_path: str = None, api_key: str = None) -> None:
+    def __init__(self, stock_code: int, data_path: str = None, api_key: str = None, data_view=None) -> None:
         super().__init__(api_key=api_key)
 
         self.agent_type = 'news'
         self.status_messages = ['正在进行新闻分析...', '新闻分析完成']
+        self.analysis_name = '新闻分析'
 
         self.stock_code = stock_code
         self.data_path = data_path
+        # 按日期切片的内存数据视图，为None时直接读取data_path下的文件
+        self.data_view = data_view
 
         self.news_path = ('data' if self.data_path is None else self.data_path) + '/' + str(stock_code) + '/股票新闻数据.csv'
         self.stock_info_path = ('data' if self.data_path is None else self.data_path) + '/' + str(stock_code) + '/股票基本面数据/主营介绍.csv'
@@ -58,43 +59,41 @@ class NewsAnalysisAgent(Agent):
         生成一份分析报告
         """
         
-    def analyze_news(self, target_date: str = None, ws_server=None) -> tuple[str, str]:
+    def build_analysis_content(self, target_date: str = None) -> str:
         """
-        分析新闻数据并返回推理过程和投资建议
+        读取新闻和主营介绍并构建新闻分析提示词
         :param target_date: 目标日期, 如果为None则使用最新数据
-        :return: (推理过程, 投资建议)
+        :return: 提示词, 数据为空时返回空字符串
         """
-        print(f'🔍 开始新闻分析 {self.stock_code}')
-        start_time = time.time()
-
-        tmp_news_content=read_stock_news_csv_by_date(self.news_path, target_date=target_date),
-        tmp_stock_info=read_specific_csv(self.stock_info_path)
+        formatter = self.prompt_formatter
+        # 以公司主营业务为查询，只取与公司相关度最高的新闻
+        query = load_company_profile(self.stock_info_path, data_view=self.data_view)
+        tmp_news_content=read_stock_news_csv_by_date(self.news_path, target_date=target_date, data_view=self.data_view, formatter=formatter, query=query)
+        tmp_stock_info=read_specific_csv(self.stock_info_path, data_view=self.data_view, formatter=formatter)
         
         if tmp_news_content is None or tmp_news_content == "":
             print("❌ 新闻数据为空, 将不进行新闻分析")
-            return "", ""
+            return ""
         
         # 构建完整的提示词
-        content = self.content_template.format(
+        return self.content_template.format(
             news_content=tmp_news_content,
             stock_info=tmp_stock_info
         )
-        
-        # 实时推送推理过程
-        reasoning_content, content = self.ask_agent_streaming_output(content=content, messages=self.system_prompt, ws_server=ws_server)
-        
-        end_time = time.time()
-        process_time = end_time - start_time
-        print(f'⏰ 新闻分析完成，耗时 {process_time: .2f}秒')
 
-        # 保存输出
-        if target_date is not None:
-            self.save_output(f"{self.stock_code}新闻分析_{str(target_date).replace(' ', '_').replace(':', '_')}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.md")
-        else:
-            self.save_output()
+    def analyze_news(self, target_date: str = None, ws_server=None) -> tuple[str, str]:
+        """
+        分析新闻数据并返回推理过程和投资建议
+        :param target_date: 目标日期, 如果为None则使用最新数据
+        :return: (推理过程, 投资建议)
+        """
+        return self.analyze(target_date=target_date, ws_server=ws_server)
 
-        # 返回推理过程和投资建议
-        return reasoning_content, content
+    async def analyze_news_async(self, target_date: str = None, ws_server=None) -> tuple[str, str]:
+        """
+        analyze_news 的异步版本
+        """
+        return await self.analyze_async(target_date=target_date, ws_server=ws_server)
 
 if __name__ == '__main__':
     # 测试代码
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Optional, List
+
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ResponseCache:
+    """
+    大模型响应的磁盘缓存
+
+    以 (模型接入点, 消息列表, 采样参数) 的哈希作为键, 每个键对应一个 JSON 文件,
+    保存推理过程、回答以及原始的流式分片序列, 命中时可以按原顺序回放到 WebSocket。
+    """
+
+    def __init__(self, cache_dir: str = None, max_size_mb: float = 512, max_age_days: float = 30) -> None:
+        """
+        Args:
+            cache_dir: 缓存目录, 默认 stock_prediction/agent/response_cache
+            max_size_mb: 缓存总大小上限（MB）, 超出时按最近访问时间淘汰
+            max_age_days: 缓存条目最大有效期（天）
+        """
+        self.cache_dir = cache_dir or os.path.join(root_dir, 'agent', 'response_cache')
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 24 * 3600
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model: str, messages: list, params: dict = None) -> str:
+        """
+        计算缓存键
+
+        Args:
+            model: 模型接入点
+            messages: 完整的消息列表（含系统提示词和用户输入）
+            params: 采样参数
+
+        Returns:
+            str: sha256 十六进制摘要
+        """
+        payload = json.dumps(
+            {'model': model, 'messages': messages, 'params': params or {}},
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        # 按前两位分桶, 避免单个目录下文件过多
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json')
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        读取缓存条目, 不存在或已过期时返回 None
+
+        Returns:
+            dict: {'reasoning_content', 'content', 'chunks', 'created_at', ...}
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if time.time() - entry.get('created_at', 0) > self.max_age_seconds:
+            self._remove(entry_path)
+            with self._lock:
+                self.misses += 1
+                self.evictions += 1
+            return None
+
+        # 更新访问时间, 供按大小淘汰时使用
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key: str, model: str, reasoning_content: str, content: str, chunks: List[list] = None) -> None:
+        """
+        写入缓存条目
+
+        Args:
+            key: 缓存键
+            model: 模型接入点
+            reasoning_content: 推理过程
+            content: 回答
+            chunks: 流式分片序列, 每项为 [类型('reasoning'/'content'), 文本]
+        """
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        entry = {
+            'model': model,
+            'created_at': time.time(),
+            'reasoning_content': reasoning_content,
+            'content': content,
+            'chunks': chunks or [],
+        }
+        # 先写临时文件再重命名, 避免并发读取到半写入的条目
+        tmp_path = f'{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, entry_path)
+
+        self.evict()
+
+    def _remove(self, entry_path: str) -> None:
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+
+    def evict(self) -> int:
+        """
+        淘汰过期条目, 并在总大小超限时按最近访问时间从旧到新淘汰
+
+        Returns:
+            int: 本次淘汰的条目数
+        """
+        now = time.time()
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for file in files:
+                if not file.endswith('.json'):
+                    continue
+                entry_path = os.path.join(root, file)
+                try:
+                    stat = os.stat(entry_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        removed = 0
+        total_size = 0
+        alive = []
+        for mtime, size, entry_path in entries:
+            # 访问时间同样受有效期约束, 长期未命中的条目直接清理
+            if now - mtime > self.max_age_seconds:
+                self._remove(entry_path)
+                removed += 1
+            else:
+                alive.append((mtime, size, entry_path))
+                total_size += size
+
+        alive.sort()
+        for mtime, size, entry_path in alive:
+            if total_size <= self.max_size_bytes:
+                break
+            self._remove(entry_path)
+            total_size -= size
+            removed += 1
+
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def stats(self) -> dict:
+        """
+        获取命中统计
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_response_cache() -> Optional[ResponseCache]:
+    """
+    获取进程内共享的默认响应缓存
+
+    设置环境变量 AGENT_RESPONSE_CACHE=0 可关闭缓存,
+    AGENT_RESPONSE_CACHE_DIR / AGENT_RESPONSE_CACHE_MAX_MB / AGENT_RESPONSE_CACHE_MAX_AGE_DAYS 可调整位置和淘汰策略
+    """
+    global _default_cache
+    if os.environ.get('AGENT_RESPONSE_CACHE', '1') == '0':
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(
+                cache_dir=os.environ.get('AGENT_RESPONSE_CACHE_DIR'),
+                max_size_mb=float(os.environ.get('AGENT_RESPONSE_CACHE_MAX_MB', 512)),
+                max_age_days=float(os.environ.get('AGENT_RESPONSE_CACHE_MAX_AGE_DAYS', 30)),
+            )
+        return _default_cache
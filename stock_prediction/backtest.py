@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 import pandas as pd
 import matplotlib.pyplot as plt
 from predict_by_agent import get_format_predict_result_by_agent
+from stock_prediction.util.frame_cache import read_frame
 import time
 import os
 import matplotlib.dates as mdates
@@ -31,7 +32,7 @@ def backtest_prediction(
 
     # 读取市场数据
     market_data_path = "data" + "/" + stock_code + "/" + "股票日线数据.csv"
-    df = pd.read_csv(market_data_path, encoding='utf-8', low_memory=False)
+    df = read_frame(market_data_path)
     
     # 添加昨天的收盘价
     df['yesterday_close'] = df['收盘'].shift(1)
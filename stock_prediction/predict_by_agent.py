@@ -1,33 +1,41 @@
 import stock_prediction.agent.decision_making_agent as decision_making_agent
-from stock_prediction.util.data_api import process_all_csvs_in_directory
+from stock_prediction.util.data_view import get_data_store
 import time
 from datetime import timedelta, datetime
 import os
 
-def predict_by_agent(stock_code: str, start_date: str, target_date: str, ws_server=None, api_key: str = None) -> tuple[str, str]:
+def get_agent_data_view(start_date: str, target_date: str):
     """
-    使用决策制定代理预测股票价格
-    :param stock_code: 股票代码
+    获取预测使用的数据视图，数据只在内存中按日期切片，不再写入 temp_data 目录
     :param start_date: 数据开始日期(包含)
     :param target_date: 目标预测日期
-    :param ws_server: WebSocket服务器实例
-    :return: 决策建议 [reasoning: str, decision: str]
+    :return: (数据根目录, 数据视图)
     """
     # 获取项目根目录
     root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    
-    # 截取日期范围内的数据
     data_path = os.path.join(root_dir, "stock_prediction", "data")
-    temp_data_path = os.path.join(root_dir, "stock_prediction", "temp_data")
 
     # 目标日期的前一天，因为目标日期的股价是未知的，所以不能使用目标日期的数据
     end_date = (datetime.strptime(target_date, "%Y%m%d") - timedelta(days=1)).strftime("%Y%m%d")
 
-    process_all_csvs_in_directory(data_path, temp_data_path, start_date, end_date)
+    return data_path, get_data_store(data_path).as_of(start_date, end_date)
+
+
+def predict_by_agent(stock_code: str, start_date: str, target_date: str, ws_server=None, api_key: str = None) -> tuple[str, str]:
+    """
+    使用决策制定代理预测股票价格
+    :param stock_code: 股票代码
+    :param start_date: 数据开始日期(包含)
+    :param target_date: 目标预测日期
+    :param ws_server: WebSocket服务器实例
+    :return: 决策建议 [reasoning: str, decision: str]
+    """
+    # 截取日期范围内的数据
+    data_path, data_view = get_agent_data_view(start_date, target_date)
     print("🔍 数据处理完成")
 
     # 创建决策制定代理
-    decision_maker = decision_making_agent.DecisionMakingAgent(stock_code, data_path=temp_data_path, api_key=api_key)
+    decision_maker = decision_making_agent.DecisionMakingAgent(stock_code, data_path=data_path, api_key=api_key, data_view=data_view)
     
     # 获取决策建议
     reasoning, decision = decision_maker.make_decision(target_date=target_date, ws_server=ws_server)
@@ -36,6 +44,26 @@ def predict_by_agent(stock_code: str, start_date: str, target_date: str, ws_serv
     return reasoning, decision
 
 
+async def predict_by_agent_async(stock_code: str, start_date: str, target_date: str, ws_server=None, api_key: str = None) -> tuple[str, str]:
+    """
+    predict_by_agent 的异步版本，多只股票的预测可在同一事件循环中并发执行
+    :param stock_code: 股票代码
+    :param start_date: 数据开始日期(包含)
+    :param target_date: 目标预测日期
+    :param ws_server: WebSocket服务器实例
+    :return: 决策建议 [reasoning: str, decision: str]
+    """
+    data_path, data_view = get_agent_data_view(start_date, target_date)
+    print("🔍 数据处理完成")
+
+    decision_maker = decision_making_agent.DecisionMakingAgent(stock_code, data_path=data_path, api_key=api_key, data_view=data_view)
+    try:
+        return await decision_maker.make_decision_async(target_date=target_date, ws_server=ws_server)
+    finally:
+        # 释放各代理异步客户端的连接池
+        await decision_maker.aclose()
+
+
 def get_format_predict_result_by_agent(stock_code: str, start_date: str, target_date: str) -> tuple[int, float]:
     """
     获取格式化后的决策建议
@@ -1,12 +1,15 @@
 import torch
 import tensorflow as tf
 import numpy as np
-import pandas as pd
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 from keras.api.models import load_model
 import matplotlib.pyplot as plt
 import seaborn as sns
 from keras.api.losses import MeanSquaredError, MeanAbsoluteError
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from stock_prediction.util.feature_store import load_features, FEATURE_COLUMNS
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
@@ -17,52 +20,6 @@ print(torch.cuda.is_available())
 
 print(tf.__version__)
 
-def calculate_technical_indicators(df):
-    """计算技术指标"""
-    # 计算5日、10日、20日移动平均线
-    df['MA5'] = df['收盘'].rolling(window=5).mean()
-    df['MA10'] = df['收盘'].rolling(window=10).mean()
-    df['MA20'] = df['收盘'].rolling(window=20).mean()
-    
-    # 计算RSI
-    delta = df['收盘'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df['RSI'] = 100 - (100 / (1 + rs))
-    
-    # 计算MACD
-    exp1 = df['收盘'].ewm(span=12, adjust=False).mean()
-    exp2 = df['收盘'].ewm(span=26, adjust=False).mean()
-    df['MACD'] = exp1 - exp2
-    df['Signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-    
-    # 计算布林带
-    df['BB_middle'] = df['收盘'].rolling(window=20).mean()
-    df['BB_upper'] = df['BB_middle'] + 2 * df['收盘'].rolling(window=20).std()
-    df['BB_lower'] = df['BB_middle'] - 2 * df['收盘'].rolling(window=20).std()
-    
-    # 计算价格变化率
-    df['Price_Change'] = df['收盘'].pct_change()
-    
-    # 计算成交量变化率
-    df['Volume_Change'] = df['成交量'].pct_change()
-    
-    # 计算波动率
-    df['Volatility'] = df['收盘'].rolling(window=20).std()
-    
-    # 计算价格动量
-    df['Momentum'] = df['收盘'].pct_change(periods=10)
-    
-    # 计算VWAP（成交量加权平均价格）
-    df['VWAP'] = (df['收盘'] * df['成交量']).cumsum() / df['成交量'].cumsum()
-    
-    # 计算市场情绪指标
-    df['Price_MA_Ratio'] = df['收盘'] / df['MA20']  # 价格与20日均线比率
-    df['Volume_MA_Ratio'] = df['成交量'] / df['成交量'].rolling(window=20).mean()  # 成交量比率
-    
-    return df
-
 def plot_predictions(y_true, y_pred, dates, train_y_true=None, train_y_pred=None, train_dates=None):
     """绘制预测结果和真实值的对比图"""
     plt.figure(figsize=(20, 10))
@@ -161,22 +118,11 @@ def test_model(model_path='best_model.h5',
                data_path='data/600415/股票日线数据.csv',
                scaler_path='scaler.npy'):
     """测试模型性能"""
-    # 加载数据
-    df = pd.read_csv(data_path)
-    
-    # 计算技术指标
-    df = calculate_technical_indicators(df)
+    # 加载特征数据（基础行情 + 技术指标）
+    df = load_features(data_path)
     
     # 选择需要的特征
-    base_features = ['开盘', '收盘', '最高', '最低', '成交量', '成交额', 
-                    '振幅', '涨跌幅', '涨跌额', '换手率']
-    
-    technical_features = ['MA5', 'MA10', 'MA20', 'RSI', 'MACD', 'Signal', 
-                         'BB_middle', 'BB_upper', 'BB_lower', 'Price_Change', 
-                         'Volume_Change', 'Volatility', 'Momentum', 'VWAP', 
-                         'Price_MA_Ratio', 'Volume_MA_Ratio']
-    
-    features = base_features + technical_features
+    features = FEATURE_COLUMNS
     
     # 删除包含NaN的行
     df = df.dropna()
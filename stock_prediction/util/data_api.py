@@ -1,4 +1,3 @@
-import akshare as ak
 import pandas as pd
 from datetime import datetime
 import os
@@ -8,14 +7,46 @@ import functools
 from typing import Optional, List
 import re
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+from .fetch_scheduler import TokenBucketRateLimiter, FetchScheduler
+from .market_snapshot import get_earnings_snapshot_store
+from .data_source import DataSource, create_data_source_from_env
+from .manifest import get_manifest, get_default_policy
+from .storage import write_table, to_csv_atomic, write_atomic, get_dataset_lock
+from .metrics import get_metrics_registry
+from .date_index import build_date_index, get_date_index
+from .macro_snapshot import get_macro_snapshot_store
 
 
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 path = os.path.join(root_dir, 'data')
 
+# akshare 数据源，默认直接调用 akshare，可通过环境变量 DATA_SOURCE_MODE 切换为录制或回放
+ak = create_data_source_from_env()
+
+metrics = get_metrics_registry()
+# 数据集拉取结果：cache_hit / reused / fetched / fallback / failed
+fetch_counter = metrics.counter('dataset_fetch_total', '数据集拉取次数，按结果分类', ('dataset', 'result'))
+
+# 所有接口请求共享的限流器，替代固定的随机延时
+rate_limiter = TokenBucketRateLimiter(
+    rate=float(os.environ.get('FETCH_RATE_PER_SECOND', 1.0)),
+    capacity=float(os.environ.get('FETCH_RATE_BURST', 2.0)),
+)
+
+def set_data_source(data_source: DataSource) -> None:
+    """
+    替换所有拉取函数使用的数据源
+    
+    Args:
+        data_source: 数据源，如 DataSource(mode='replay', latency_ms=200)
+    """
+    global ak
+    ak = data_source
+
 def timer(func):
     """
-    计时装饰器，用于统计函数执行时间
+    计时装饰器，用于统计函数执行时间，同时记录到指标 function_duration_seconds
     
     Args:
         func: 要计时的函数
@@ -23,12 +54,20 @@ def timer(func):
     Returns:
         包装后的函数
     """
+    duration_histogram = metrics.histogram('function_duration_seconds', '被 @timer 装饰的函数的执行耗时', ('function',))
+    error_counter = metrics.counter('function_errors_total', '被 @timer 装饰的函数抛出异常的次数', ('function',))
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        duration = end_time - start_time
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            error_counter.inc(function=func.__name__)
+            raise
+        finally:
+            duration = time.time() - start_time
+            duration_histogram.observe(duration, function=func.__name__)
         print(f"{func.__name__} 执行耗时: {duration:.2f}秒")
         return result
     return wrapper
@@ -54,13 +93,20 @@ def create_path(path_str: str) -> None:
         os.makedirs(path_str)
         print(f"创建路径: {path_str}")
 
-def check_file_exists(file_path: str, max_age_days: int = 30) -> bool:
+def get_dataset_name(file_path: str) -> str:
+    """
+    获取数据集名称（文件名去掉扩展名），用作指标标签
+    """
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+def check_file_exists(file_path: str, max_age_days: int = 30, policy: str = None) -> bool:
     """
     检查文件是否存在且未过期
     
     Args:
         file_path: 文件路径
-        max_age_days: 文件最大有效期（天），默认30天
+        max_age_days: 没有刷新策略时文件的最大有效期（天），默认30天
+        policy: 刷新策略（见 manifest.REFRESH_POLICIES），默认按文件名取 DATASET_POLICIES 中的配置
     
     Returns:
         bool: 文件是否存在且未过期
@@ -68,86 +114,235 @@ def check_file_exists(file_path: str, max_age_days: int = 30) -> bool:
     if not os.path.exists(file_path):
         return False
     
-    # 检查文件修改时间
-    file_mtime = os.path.getmtime(file_path)
-    current_time = time.time()
-    age_days = (current_time - file_mtime) / (24 * 3600)
-    
-    if age_days > max_age_days:
-        print(f"文件已过期（{age_days:.1f}天），需要更新: {file_path}")
+    # 按数据集清单中记录的拉取时间和刷新策略判断
+    policy = policy or get_default_policy(file_path)
+    if get_manifest().is_stale(file_path, policy, max_age_days):
+        print(f"文件已过期（刷新策略: {policy or f'{max_age_days}天'}），需要更新: {file_path}")
         return False
     
     return True
 
+def get_data_date_summary(df) -> tuple:
+    """
+    获取数据中最新的日期和相邻两期的间隔天数
+    
+    Returns:
+        (最新日期, 间隔天数)，没有可识别的日期列时返回 (None, None)
+    """
+    if not isinstance(df, pd.DataFrame):
+        return None, None
+    for date_col in find_date_columns(df):
+        dates = parse_date_column(df[date_col], date_col).dropna().drop_duplicates().sort_values()
+        if dates.empty:
+            continue
+        interval_days = None
+        if len(dates) > 1:
+            interval_days = float(dates.diff().dropna().median() / pd.Timedelta(days=1))
+        return dates.iloc[-1].to_pydatetime(), interval_days
+    return None, None
+
+def save_fetched_data(df, file_path: str, policy: str = None) -> None:
+    """
+    保存拉取到的数据并更新数据集清单
+    
+    Args:
+        df: 拉取到的数据
+        file_path: 文件保存路径
+        policy: 刷新策略，默认按文件名取 DATASET_POLICIES 中的配置
+    """
+    write_table(df, file_path)
+    last_data_date, interval_days = get_data_date_summary(df)
+    row_count = len(df) if isinstance(df, pd.DataFrame) else 1
+    entry = get_manifest().record(file_path, row_count, policy or get_default_policy(file_path), last_data_date, interval_days)
+    if not entry['changed']:
+        print(f"数据内容未变化: {file_path}")
+
 @timer
-def fetch_with_cache(func, file_path: str, max_age_days: int = 30, position: str = None) -> bool:
+def fetch_with_cache(func, file_path: str, max_age_days: int = 30, position: str = None, policy: str = None) -> bool:
     """
     带缓存检查的数据获取函数
     
     Args:
         func: 获取数据的函数
         file_path: 文件保存路径
-        max_age_days: 文件最大有效期（天），默认30天
+        max_age_days: 没有刷新策略时文件的最大有效期（天），默认30天
         position: 获取位置，'first' 表示第一行，'last' 表示最后一行, None 表示全部
+        policy: 刷新策略，默认按文件名取 DATASET_POLICIES 中的配置
     """
-    if check_file_exists(file_path, max_age_days):
+    if check_file_exists(file_path, max_age_days, policy):
         print(f"✅ 文件有效，跳过获取: {file_path}")
+        fetch_counter.inc(dataset=get_dataset_name(file_path), result='cache_hit')
         return True
     
     if position is not None and position != 'first' and position != 'last':
         print(f"❌ 位置参数错误: {position}")
         return False
     
+    # 同一数据集同时只允许一个请求拉取，其余请求等待后直接复用结果
+    with get_dataset_lock(file_path):
+        if check_file_exists(file_path, max_age_days, policy):
+            print(f"✅ 其他请求已完成拉取，复用结果: {file_path}")
+            fetch_counter.inc(dataset=get_dataset_name(file_path), result='reused')
+            return True
+        return fetch_and_save(func, file_path, position, policy)
+
+def fetch_and_save(func, file_path: str, position: str = None, policy: str = None) -> bool:
+    """
+    拉取数据并保存，接口调用的超时、重试和熔断由数据源负责，
+    最终失败时继续使用上次成功拉取的文件
+    
+    Args:
+        func: 获取数据的函数
+        file_path: 文件保存路径
+        position: 获取位置，'first' 表示第一行，'last' 表示最后一行, None 表示全部
+        policy: 刷新策略
+    """
     print(f"🔍 获取新数据: {file_path}")
     try:
-        sleep_random(1.5, 0.5)  # 添加随机延时
+        rate_limiter.acquire()  # 限流，避免请求过于频繁
         df = func()
         print('df: ', df)
         if position == 'first':
             df = df.iloc[0]
         elif position == 'last':
             df = df.iloc[-1]
-        df.to_csv(file_path, index=False, encoding='utf-8-sig')
+        save_fetched_data(df, file_path, policy)
         print(f"✅ 数据已保存到: {file_path}")
+        fetch_counter.inc(dataset=get_dataset_name(file_path), result='fetched')
         return True
     except Exception as e:
         print(f"❌ 获取数据失败: {str(e)}")
-        sleep_random(3.0, 1.0)  # 失败后等待更长时间
-        try:
-            df = func()
-            if position == 'first':
-                df = df.iloc[0]
-            elif position == 'last':
-                df = df.iloc[-1]
-            df.to_csv(file_path, index=False, encoding='utf-8-sig')
-            print(f"✅ 重试成功：数据已保存到: {file_path}")
+        if os.path.exists(file_path):
+            print(f"⚠️ 继续使用上次成功拉取的数据: {file_path}")
+            fetch_counter.inc(dataset=get_dataset_name(file_path), result='fallback')
             return True
-        except Exception as e2:
-            print(f"❌ 重试失败: {str(e2)}")
+        fetch_counter.inc(dataset=get_dataset_name(file_path), result='failed')
+        return False
+
+
+def download_stock_daily_data(stock_code: int, start_date: str, end_date: str) -> pd.DataFrame:
+    """
+    从接口拉取前复权日线数据
+    
+    Args:
+        stock_code: 股票代码
+        start_date: 开始日期 (格式: %Y%m%d) 包含
+        end_date: 结束日期 (格式: %Y%m%d) 包含
+    
+    Returns:
+        pd.DataFrame: 日线数据，日期列统一为 %Y-%m-%d 字符串
+    """
+    stock_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", 
+                                  start_date=start_date, end_date=end_date,
+                                  adjust="qfq")
+    # 删除不需要的列
+    stock_df = stock_df.drop('股票代码', axis=1)
+    if not stock_df.empty:
+        stock_df['日期'] = pd.to_datetime(stock_df['日期']).dt.strftime('%Y-%m-%d')
+    return stock_df
+
+
+def is_same_daily_bar(stored_row: pd.Series, fetched_row: pd.Series) -> bool:
+    """
+    判断同一交易日的本地数据与新拉取数据的价格是否一致
+    前复权价格在除权除息后会整体变化，不一致说明本地历史数据已失效
+    """
+    for column in ['开盘', '收盘', '最高', '最低']:
+        if abs(float(stored_row[column]) - float(fetched_row[column])) > 1e-6:
             return False
+    return True
+
+
+def update_stock_daily_data(stock_code: int, daily_data_path: str, start_date: str, end_date: str) -> Optional[pd.DataFrame]:
+    """
+    增量更新本地日线数据，只拉取缺失的日期范围
+    
+    Args:
+        stock_code: 股票代码
+        daily_data_path: 本地日线数据路径
+        start_date: 开始日期 (格式: %Y%m%d) 包含
+        end_date: 结束日期 (格式: %Y%m%d) 包含
+    
+    Returns:
+        更新后的日线数据；本地数据不可用或发生除权除息需要全量刷新时返回 None
+    """
+    try:
+        stored_df = pd.read_csv(daily_data_path, encoding='utf-8-sig')
+    except Exception as e:
+        print(f"❌ 读取本地日线数据失败，将全量拉取: {str(e)}")
+        return None
+    if stored_df.empty or '日期' not in stored_df.columns:
+        return None
+
+    stored_dates = pd.to_datetime(stored_df['日期'])
+    first_date = stored_dates.min()
+    last_date = stored_dates.max()
+    stored_df['日期'] = stored_dates.dt.strftime('%Y-%m-%d')
+
+    result_df = stored_df
+    # 从本地最后一个交易日开始拉取，即使本地已是最新也拉取这一天，用重叠的一天校验复权价格是否变化
+    tail_start = last_date.strftime('%Y%m%d')
+    tail_end = max(end_date, tail_start)
+    tail_df = download_stock_daily_data(stock_code, tail_start, tail_end)
+    overlap = tail_df[tail_df['日期'] == last_date.strftime('%Y-%m-%d')] if not tail_df.empty else tail_df
+    if not overlap.empty and not is_same_daily_bar(stored_df.iloc[stored_dates.argmax()], overlap.iloc[0]):
+        print(f"⚠️ {stock_code} 前复权价格发生变化（可能发生除权除息），将全量刷新日线数据")
+        return None
+    new_rows = tail_df[pd.to_datetime(tail_df['日期']) > last_date] if not tail_df.empty else tail_df
+    if not new_rows.empty:
+        result_df = pd.concat([result_df, new_rows], ignore_index=True)
+    print(f"🔍 增量拉取日线数据 {tail_start} - {tail_end}，新增 {len(new_rows)} 行")
+
+    # 请求的开始日期早于本地数据时，补齐缺失的历史部分
+    head_end = first_date - pd.Timedelta(days=1)
+    if datetime.strptime(start_date, '%Y%m%d') <= head_end:
+        head_df = download_stock_daily_data(stock_code, start_date, head_end.strftime('%Y%m%d'))
+        if not head_df.empty:
+            result_df = pd.concat([head_df, result_df], ignore_index=True)
+            print(f"🔍 补齐历史日线数据 {start_date} - {head_end.strftime('%Y%m%d')}，新增 {len(head_df)} 行")
 
+    return result_df
+
+
+# 日线文件路径 -> 最近一次完成拉取的 (完成时间, 开始日期, 结束日期)
+completed_daily_fetches = {}
 
 @timer
-def fetch_stock_daily_data(stock_code: int, start_date: str, end_date: str) -> None:
+def fetch_stock_daily_data(stock_code: int, start_date: str, end_date: str, incremental: bool = True) -> None:
     """
     获取股票日线数据
+    
+    Args:
+        stock_code: 股票代码
+        start_date: 开始日期 (格式: %Y%m%d) 包含
+        end_date: 结束日期 (格式: %Y%m%d) 包含
+        incremental: 本地已有数据时只拉取缺失部分，检测到复权价格变化时自动全量刷新
     """
     global path
     daily_data_path = os.path.join(path, str(stock_code), '股票日线数据.csv')
+    requested_at = time.time()
 
-    # 获取股票日线数据
-    print('🔍 正在获取股票日线数据...')
-    try:
-        stock_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", 
-                                      start_date=start_date, end_date=end_date,
-                                      adjust="qfq")
-        # 删除不需要的列
-        stock_df = stock_df.drop('股票代码', axis=1)
-        # 保存日线数据
-        stock_df.to_csv(daily_data_path, index=False, encoding='utf-8-sig')
-        print(f'✅ 股票日线数据已保存到 {daily_data_path}')
-    except Exception as e:
-        print(f"❌ 获取股票日线数据失败: {str(e)}")
+    with get_dataset_lock(daily_data_path):
+        # 等待期间其他请求已拉取完成，且覆盖了所需的日期范围时直接复用
+        completed = completed_daily_fetches.get(daily_data_path)
+        if completed is not None and completed[0] >= requested_at and completed[1] <= start_date and completed[2] >= end_date:
+            print(f"✅ 其他请求已完成拉取，复用结果: {daily_data_path}")
+            return
+
+        # 获取股票日线数据
+        print('🔍 正在获取股票日线数据...')
+        try:
+            stock_df = None
+            if incremental and os.path.exists(daily_data_path):
+                stock_df = update_stock_daily_data(stock_code, daily_data_path, start_date, end_date)
+            if stock_df is None:
+                stock_df = download_stock_daily_data(stock_code, start_date, end_date)
+            # 保存日线数据
+            save_fetched_data(stock_df, daily_data_path, policy='daily')
+            completed_daily_fetches[daily_data_path] = (time.time(), start_date, end_date)
+            print(f'✅ 股票日线数据已保存到 {daily_data_path}')
+        except Exception as e:
+            print(f"❌ 获取股票日线数据失败: {str(e)}")
 
 @timer
 def fetch_stock_news_data(stock_code: int) -> None:
@@ -156,20 +351,28 @@ def fetch_stock_news_data(stock_code: int) -> None:
     """
     global path
     news_data_path = os.path.join(path, str(stock_code), '股票新闻数据.csv')
+    if check_file_exists(news_data_path):
+        print(f"✅ 文件有效，跳过获取: {news_data_path}")
+        return
 
-    # 获取新闻数据
-    print('🔍 正在获取新闻数据...')
-    try:
-        news_df = ak.stock_news_em(symbol=stock_code)
-        # 删除不需要的列
-        news_df = news_df.drop('关键词', axis=1)
-        # 按时间排序
-        news_df['发布时间'] = pd.to_datetime(news_df['发布时间'], format='%Y-%m-%d %H:%M:%S')
-        news_df = news_df.sort_values('发布时间', ascending=False)
-        news_df.to_csv(news_data_path, index=False, encoding='utf-8-sig')
-        print(f"✅ 新闻数据已保存到 {news_data_path}")
-    except Exception as e:
-        print(f"❌ 获取新闻数据失败: {str(e)}")
+    with get_dataset_lock(news_data_path):
+        if check_file_exists(news_data_path):
+            print(f"✅ 其他请求已完成拉取，复用结果: {news_data_path}")
+            return
+
+        # 获取新闻数据
+        print('🔍 正在获取新闻数据...')
+        try:
+            news_df = ak.stock_news_em(symbol=stock_code)
+            # 删除不需要的列
+            news_df = news_df.drop('关键词', axis=1)
+            # 按时间排序
+            news_df['发布时间'] = pd.to_datetime(news_df['发布时间'], format='%Y-%m-%d %H:%M:%S')
+            news_df = news_df.sort_values('发布时间', ascending=False)
+            save_fetched_data(news_df, news_data_path)
+            print(f"✅ 新闻数据已保存到 {news_data_path}")
+        except Exception as e:
+            print(f"❌ 获取新闻数据失败: {str(e)}")
 
 @timer
 def fetch_stock_fundamentals_data(stock_code: int):
@@ -292,32 +495,31 @@ def fetch_stock_yjbb_data(stock_code: int, fundamentals_data_path: str, target_d
 
     print(f"最近的已过期的两个季度日期: {latest_date}")
 
+    # 全市场业绩报表按报告期只下载一次，各股票从本地快照中查询
+    snapshot_store = get_earnings_snapshot_store()
+
+    def download_market_yjbb(date: str) -> pd.DataFrame:
+        rate_limiter.acquire()
+        print(f'🔍 正在获取全市场业绩报表，使用日期: {date}...')
+        return ak.stock_yjbb_em(date=date)
+
     # 获取业绩报表
     def fetch_and_filter_data(date_list: List[str]) -> pd.DataFrame:
         result_dfs = []
         for date in date_list:
-            sleep_random()
-            print(f'🔍 正在获取业绩报表，使用日期: {date}...')
-            # 获取所有股票的业绩报表
             try:
-                df = ak.stock_yjbb_em(date=date)
+                stock_data = snapshot_store.get_stock_rows(date, stock_code, download_market_yjbb)
             except Exception as e:
                 print(f"❌ 获取数据失败: {str(e)}")
                 continue
-            
-            if df is None or df.empty:
-                print(f"❌ 日期 {date} 没有业绩报表数据或接口返回异常")
-                continue
-
-            print('开始筛选')
-            # 筛选指定股票的数据
-            stock_data = df[df['股票代码'] == str(stock_code)]
-            stock_data.insert(loc=0, column='时间', value=date)
-            print('stock_data: ', stock_data)
 
             if stock_data.empty:
                 print(f"❌ 日期 {date} 没有股票 {stock_code} 的业绩报表数据")
                 continue
+
+            # 添加报告期列
+            stock_data.insert(loc=0, column='时间', value=date)
+            print('stock_data: ', stock_data)
             
             result_dfs.append(stock_data)
         
@@ -347,13 +549,14 @@ def fetch_stock_zygc_data(stock_code: int, fundamentals_data_path: str) -> None:
     create_path(fundamentals_data_path)
     zygc_data_path = os.path.join(fundamentals_data_path, '主营构成.csv')
     
-    # 获取主营构成
+    # 获取主营构成，先按代码判断交易所，避免每次都对错误的市场请求并触发重试和熔断
     print('🔍 正在获取主营构成...')
-    result = fetch_with_cache(lambda: ak.stock_zygc_em(symbol='SH' + str(stock_code)), zygc_data_path)
+    markets = ['SH', 'SZ'] if str(stock_code).startswith(('6', '9')) else ['SZ', 'SH']
+    result = fetch_with_cache(lambda: ak.stock_zygc_em(symbol=markets[0] + str(stock_code)), zygc_data_path)
     
-    # 如果沪市获取失败，则尝试深市
+    # 如果获取失败，则尝试另一个市场
     if not result:
-        fetch_with_cache(lambda: ak.stock_zygc_em(symbol='SZ' + str(stock_code)), zygc_data_path)
+        fetch_with_cache(lambda: ak.stock_zygc_em(symbol=markets[1] + str(stock_code)), zygc_data_path)
 
 
 @timer
@@ -382,27 +585,54 @@ def fetch_macro_data():
     fetch_macro_us(os.path.join(macro_data_path, '美国宏观数据'))
 
 
-def fetch_macro_cn(macro_cn_data_path: str):
+def schedule_fetch(scheduler: Optional[FetchScheduler], func, file_path: str):
+    """
+    提交单个数据集的拉取任务，未传入调度器时直接同步执行
+    
+    Args:
+        scheduler: 拉取调度器
+        func: 数据集拉取函数，参数为文件保存路径
+        file_path: 文件保存路径
+    """
+    if scheduler is None:
+        return func(file_path)
+    scheduler.submit(os.path.splitext(os.path.basename(file_path))[0], func, file_path)
+
+
+def fetch_macro_cn(macro_cn_data_path: str, max_workers: int = 4):
     """
     获取中国宏观数据
+    各数据集在有界线程池中并发拉取，请求频率由共享限流器控制
+    
+    Args:
+        macro_cn_data_path: 中国宏观数据保存目录
+        max_workers: 最大并发拉取数
     """
     print('🔍 正在获取中国宏观数据...')
     create_path(macro_cn_data_path)
+    scheduler = FetchScheduler(max_workers=max_workers, name='中国宏观数据')
 
     # 获取中国宏观杠杆率数据
-    fetch_macro_cnbs_data(os.path.join(macro_cn_data_path, '宏观杠杆率数据.csv'))
+    schedule_fetch(scheduler, fetch_macro_cnbs_data, os.path.join(macro_cn_data_path, '宏观杠杆率数据.csv'))
 
     # 获取国民经济运行状况数据
-    fetch_macro_cn_gmjjy(os.path.join(macro_cn_data_path, '国民经济运行状况数据'))
+    fetch_macro_cn_gmjjy(os.path.join(macro_cn_data_path, '国民经济运行状况数据'), scheduler)
 
     # 获取贸易状况数据
-    fetch_macro_cn_myzk(os.path.join(macro_cn_data_path, '贸易状况数据'))
+    fetch_macro_cn_myzk(os.path.join(macro_cn_data_path, '贸易状况数据'), scheduler)
 
     # 获取产业指标
-    fetch_macro_cn_cyzb(os.path.join(macro_cn_data_path, '产业指标'))
+    fetch_macro_cn_cyzb(os.path.join(macro_cn_data_path, '产业指标'), scheduler)
 
     # 获取金融指标
-    fetch_macro_cn_jrzb(os.path.join(macro_cn_data_path, '金融指标'))
+    fetch_macro_cn_jrzb(os.path.join(macro_cn_data_path, '金融指标'), scheduler)
+
+    results = scheduler.run()
+
+    # 拉取完成后更新最新值快照，智能体读取时只需查询
+    refreshed = get_macro_snapshot_store(macro_cn_data_path).sync()
+    print(f'✅ 宏观数据快照已更新 {refreshed} 个数据集')
+    return results
 
 
 def fetch_macro_cnbs_data(macro_cnbs_data_path: str):
@@ -410,42 +640,42 @@ def fetch_macro_cnbs_data(macro_cnbs_data_path: str):
     获取中国宏观杠杆率数据
     """
     print('🔍 正在获取中国宏观杠杆率数据...')
-    fetch_with_cache(ak.macro_cnbs, macro_cnbs_data_path)
+    return fetch_with_cache(ak.macro_cnbs, macro_cnbs_data_path)
 
 
-def fetch_macro_cn_gmjjy(macro_cn_gmjjy_data_path: str):
+def fetch_macro_cn_gmjjy(macro_cn_gmjjy_data_path: str, scheduler: FetchScheduler = None):
     """
     获取国民经济运行状况数据
     """
     create_path(macro_cn_gmjjy_data_path)
     print('🔍 正在获取国民经济运行状况数据...')
     # 获取企业商品价格指数数据
-    fetch_macro_china_qyspjg(macro_cn_gmjjy_data_path + '/企业商品价格指数数据.csv')
+    schedule_fetch(scheduler, fetch_macro_china_qyspjg, macro_cn_gmjjy_data_path + '/企业商品价格指数数据.csv')
 
     # 获取外商直接投资数据
-    fetch_macro_china_fdi(macro_cn_gmjjy_data_path + '/外商直接投资数据.csv')
+    schedule_fetch(scheduler, fetch_macro_china_fdi, macro_cn_gmjjy_data_path + '/外商直接投资数据.csv')
 
     # 获取LPR品种数据
-    fetch_macro_china_lpr(macro_cn_gmjjy_data_path + '/LPR品种数据.csv')
+    schedule_fetch(scheduler, fetch_macro_china_lpr, macro_cn_gmjjy_data_path + '/LPR品种数据.csv')
 
     # 获取城镇调查失业率
-    fetch_macro_china_urban_unemployment(macro_cn_gmjjy_data_path + '/城镇调查失业率.csv')
+    schedule_fetch(scheduler, fetch_macro_china_urban_unemployment, macro_cn_gmjjy_data_path + '/城镇调查失业率.csv')
 
     # 获取社会融资规模增量统计
-    fetch_macro_china_shrzgm(macro_cn_gmjjy_data_path + '/社会融资规模增量统计.csv')
+    schedule_fetch(scheduler, fetch_macro_china_shrzgm, macro_cn_gmjjy_data_path + '/社会融资规模增量统计.csv')
 
     # 获取中国GDP年率
-    fetch_macro_china_gdp_yearly(macro_cn_gmjjy_data_path + '/中国GDP年率.csv')
+    schedule_fetch(scheduler, fetch_macro_china_gdp_yearly, macro_cn_gmjjy_data_path + '/中国GDP年率.csv')
 
     # 获取物价水平
-    fetch_macro_china_wjsp(macro_cn_gmjjy_data_path + '/物价水平')
+    fetch_macro_china_wjsp(macro_cn_gmjjy_data_path + '/物价水平', scheduler)
 
 def fetch_macro_china_qyspjg(macro_china_qyspjg_data_path: str):
     """
     获取企业商品价格指数数据
     """
     print('🔍 正在获取企业商品价格指数数据...')
-    fetch_with_cache(ak.macro_china_qyspjg, macro_china_qyspjg_data_path)
+    return fetch_with_cache(ak.macro_china_qyspjg, macro_china_qyspjg_data_path)
 
 
 def fetch_macro_china_fdi(macro_china_fdi_data_path: str):
@@ -453,7 +683,7 @@ def fetch_macro_china_fdi(macro_china_fdi_data_path: str):
     获取外商直接投资数据
     """
     print('🔍 正在获取外商直接投资数据...')
-    fetch_with_cache(ak.macro_china_fdi, macro_china_fdi_data_path)
+    return fetch_with_cache(ak.macro_china_fdi, macro_china_fdi_data_path)
 
 
 def fetch_macro_china_lpr(macro_china_lpr_data_path: str):
@@ -461,7 +691,7 @@ def fetch_macro_china_lpr(macro_china_lpr_data_path: str):
     获取LPR品种数据
     """
     print('🔍 正在获取LPR品种数据...')
-    fetch_with_cache(ak.macro_china_lpr, macro_china_lpr_data_path)
+    return fetch_with_cache(ak.macro_china_lpr, macro_china_lpr_data_path)
 
 
 def fetch_macro_china_urban_unemployment(macro_china_urban_unemployment_data_path: str):
@@ -469,7 +699,7 @@ def fetch_macro_china_urban_unemployment(macro_china_urban_unemployment_data_pat
     获取城镇调查失业率
     """
     print('🔍 正在获取城镇调查失业率...')
-    fetch_with_cache(ak.macro_china_urban_unemployment, macro_china_urban_unemployment_data_path)
+    return fetch_with_cache(ak.macro_china_urban_unemployment, macro_china_urban_unemployment_data_path)
 
 
 def fetch_macro_china_shrzgm(macro_china_shrzgm_data_path: str):
@@ -477,7 +707,7 @@ def fetch_macro_china_shrzgm(macro_china_shrzgm_data_path: str):
     获取社会融资规模增量统计
     """
     print('🔍 正在获取社会融资规模增量统计...')
-    fetch_with_cache(ak.macro_china_shrzgm, macro_china_shrzgm_data_path)
+    return fetch_with_cache(ak.macro_china_shrzgm, macro_china_shrzgm_data_path)
 
 
 def fetch_macro_china_gdp_yearly(macro_china_gdp_yearly_data_path: str):
@@ -485,10 +715,10 @@ def fetch_macro_china_gdp_yearly(macro_china_gdp_yearly_data_path: str):
     获取中国GDP年率
     """
     print('🔍 正在获取中国GDP年率...')
-    fetch_with_cache(ak.macro_china_gdp_yearly, macro_china_gdp_yearly_data_path)
+    return fetch_with_cache(ak.macro_china_gdp_yearly, macro_china_gdp_yearly_data_path)
 
 
-def fetch_macro_china_wjsp(macro_china_wjsp_data_path: str):
+def fetch_macro_china_wjsp(macro_china_wjsp_data_path: str, scheduler: FetchScheduler = None):
     """
     获取物价水平
     """
@@ -496,13 +726,13 @@ def fetch_macro_china_wjsp(macro_china_wjsp_data_path: str):
     create_path(macro_china_wjsp_data_path)
 
     # 获取中国CPI年率报告
-    fetch_macro_china_cpi_yearly(macro_china_wjsp_data_path + '/中国CPI年率报告.csv')
+    schedule_fetch(scheduler, fetch_macro_china_cpi_yearly, macro_china_wjsp_data_path + '/中国CPI年率报告.csv')
 
     # 获取中国CPI月率报告
-    fetch_macro_china_cpi_monthly(macro_china_wjsp_data_path + '/中国CPI月率报告.csv')
+    schedule_fetch(scheduler, fetch_macro_china_cpi_monthly, macro_china_wjsp_data_path + '/中国CPI月率报告.csv')
 
     # 获取中国PPI年率报告
-    fetch_macro_china_ppi_yearly(macro_china_wjsp_data_path + '/中国PPI年率报告.csv')
+    schedule_fetch(scheduler, fetch_macro_china_ppi_yearly, macro_china_wjsp_data_path + '/中国PPI年率报告.csv')
 
 
 def fetch_macro_china_cpi_yearly(macro_china_cpi_yearly_data_path: str):
@@ -510,7 +740,7 @@ def fetch_macro_china_cpi_yearly(macro_china_cpi_yearly_data_path: str):
     获取中国CPI年率报告
     """
     print('🔍 正在获取中国CPI年率报告...')
-    fetch_with_cache(ak.macro_china_cpi_yearly, macro_china_cpi_yearly_data_path)
+    return fetch_with_cache(ak.macro_china_cpi_yearly, macro_china_cpi_yearly_data_path)
 
 
 def fetch_macro_china_cpi_monthly(macro_china_cpi_monthly_data_path: str):
@@ -518,7 +748,7 @@ def fetch_macro_china_cpi_monthly(macro_china_cpi_monthly_data_path: str):
     获取中国CPI月率报告
     """
     print('🔍 正在获取中国CPI月率报告...')
-    fetch_with_cache(ak.macro_china_cpi_monthly, macro_china_cpi_monthly_data_path)
+    return fetch_with_cache(ak.macro_china_cpi_monthly, macro_china_cpi_monthly_data_path)
 
 
 def fetch_macro_china_ppi_yearly(macro_china_ppi_yearly_data_path: str):
@@ -526,10 +756,10 @@ def fetch_macro_china_ppi_yearly(macro_china_ppi_yearly_data_path: str):
     获取中国PPI年率报告
     """
     print('🔍 正在获取中国PPI年率报告...')
-    fetch_with_cache(ak.macro_china_ppi_yearly, macro_china_ppi_yearly_data_path)
+    return fetch_with_cache(ak.macro_china_ppi_yearly, macro_china_ppi_yearly_data_path)
 
 
-def fetch_macro_cn_myzk(macro_cn_myzk_data_path: str):
+def fetch_macro_cn_myzk(macro_cn_myzk_data_path: str, scheduler: FetchScheduler = None):
     """
     获取贸易状况数据
     """
@@ -537,13 +767,13 @@ def fetch_macro_cn_myzk(macro_cn_myzk_data_path: str):
     print('🔍 正在获取贸易状况数据...')
 
     # 获取以美元计算的出口年率
-    fetch_macro_china_exports_yoy(macro_cn_myzk_data_path + '/以美元计算的出口年率.csv')
+    schedule_fetch(scheduler, fetch_macro_china_exports_yoy, macro_cn_myzk_data_path + '/以美元计算的出口年率.csv')
 
     # 获取以美元计算的进口年率
-    fetch_macro_china_imports_yoy(macro_cn_myzk_data_path + '/以美元计算的进口年率.csv')
+    schedule_fetch(scheduler, fetch_macro_china_imports_yoy, macro_cn_myzk_data_path + '/以美元计算的进口年率.csv')
 
     # 获取以美元计算的贸易帐（亿美元）
-    fetch_macro_china_trade_balance(macro_cn_myzk_data_path + '/以美元计算的贸易帐（亿美元）.csv')
+    schedule_fetch(scheduler, fetch_macro_china_trade_balance, macro_cn_myzk_data_path + '/以美元计算的贸易帐（亿美元）.csv')
 
 
 def fetch_macro_china_exports_yoy(macro_china_exports_yoy_data_path: str):
@@ -551,7 +781,7 @@ def fetch_macro_china_exports_yoy(macro_china_exports_yoy_data_path: str):
     获取以美元计算的出口年率
     """
     print('🔍 正在获取以美元计算的出口年率...')
-    fetch_with_cache(ak.macro_china_exports_yoy, macro_china_exports_yoy_data_path)
+    return fetch_with_cache(ak.macro_china_exports_yoy, macro_china_exports_yoy_data_path)
 
 
 def fetch_macro_china_imports_yoy(macro_china_imports_yoy_data_path: str):
@@ -559,7 +789,7 @@ def fetch_macro_china_imports_yoy(macro_china_imports_yoy_data_path: str):
     获取以美元计算的进口年率
     """
     print('🔍 正在获取以美元计算的进口年率...')
-    fetch_with_cache(ak.macro_china_imports_yoy, macro_china_imports_yoy_data_path)
+    return fetch_with_cache(ak.macro_china_imports_yoy, macro_china_imports_yoy_data_path)
 
 
 def fetch_macro_china_trade_balance(macro_china_trade_balance_data_path: str):
@@ -567,23 +797,23 @@ def fetch_macro_china_trade_balance(macro_china_trade_balance_data_path: str):
     获取以美元计算的贸易帐（亿美元）
     """
     print('🔍 正在获取以美元计算的贸易帐（亿美元）...')
-    fetch_with_cache(ak.macro_china_trade_balance, macro_china_trade_balance_data_path)
+    return fetch_with_cache(ak.macro_china_trade_balance, macro_china_trade_balance_data_path)
 
 
-def fetch_macro_cn_cyzb(macro_cn_cyzb_data_path: str):
+def fetch_macro_cn_cyzb(macro_cn_cyzb_data_path: str, scheduler: FetchScheduler = None):
     """
     获取产业指标
     """
     create_path(macro_cn_cyzb_data_path)
 
     # 获取工业增加值增长
-    fetch_macro_china_gyzjz(macro_cn_cyzb_data_path + '/工业增加值增长.csv')
+    schedule_fetch(scheduler, fetch_macro_china_gyzjz, macro_cn_cyzb_data_path + '/工业增加值增长.csv')
 
     # 获取官方制造业PMI
-    fetch_macro_china_pmi_yearly(macro_cn_cyzb_data_path + '/制造业PMI.csv')
+    schedule_fetch(scheduler, fetch_macro_china_pmi_yearly, macro_cn_cyzb_data_path + '/制造业PMI.csv')
 
     # 获取官方非制造业PMI
-    fetch_macro_china_non_man_pmi(macro_cn_cyzb_data_path + '/非制造业PMI.csv')
+    schedule_fetch(scheduler, fetch_macro_china_non_man_pmi, macro_cn_cyzb_data_path + '/非制造业PMI.csv')
 
 
 def fetch_macro_china_gyzjz(macro_china_gyzjz_data_path: str):
@@ -591,7 +821,7 @@ def fetch_macro_china_gyzjz(macro_china_gyzjz_data_path: str):
     获取工业增加值增长
     """
     print('🔍 正在获取工业增加值增长...')
-    fetch_with_cache(ak.macro_china_gyzjz, macro_china_gyzjz_data_path)
+    return fetch_with_cache(ak.macro_china_gyzjz, macro_china_gyzjz_data_path)
 
 
 def fetch_macro_china_pmi_yearly(macro_china_pmi_yearly_data_path: str):
@@ -599,7 +829,7 @@ def fetch_macro_china_pmi_yearly(macro_china_pmi_yearly_data_path: str):
     获取官方制造业PMI
     """
     print('🔍 正在获取官方制造业PMI...')
-    fetch_with_cache(ak.macro_china_pmi_yearly, macro_china_pmi_yearly_data_path)
+    return fetch_with_cache(ak.macro_china_pmi_yearly, macro_china_pmi_yearly_data_path)
 
 
 def fetch_macro_china_non_man_pmi(macro_china_non_man_pmi_data_path: str):
@@ -607,10 +837,10 @@ def fetch_macro_china_non_man_pmi(macro_china_non_man_pmi_data_path: str):
     获取官方非制造业PMI
     """
     print('🔍 正在获取官方非制造业PMI...')
-    fetch_with_cache(ak.macro_china_non_man_pmi, macro_china_non_man_pmi_data_path)
+    return fetch_with_cache(ak.macro_china_non_man_pmi, macro_china_non_man_pmi_data_path)
 
 
-def fetch_macro_cn_jrzb(macro_cn_jrzb_data_path: str):
+def fetch_macro_cn_jrzb(macro_cn_jrzb_data_path: str, scheduler: FetchScheduler = None):
     """
     获取金融指标
     """
@@ -618,25 +848,25 @@ def fetch_macro_cn_jrzb(macro_cn_jrzb_data_path: str):
     print('🔍 正在获取金融指标...')
 
     # 获取外汇储备（亿美元）
-    fetch_macro_china_fx_reserves_yearly(macro_cn_jrzb_data_path + '/外汇储备（亿美元）.csv')
+    schedule_fetch(scheduler, fetch_macro_china_fx_reserves_yearly, macro_cn_jrzb_data_path + '/外汇储备（亿美元）.csv')
 
     # 获取M2货币供应年率
-    fetch_macro_china_m2_yearly(macro_cn_jrzb_data_path + '/M2货币供应年率.csv')
+    schedule_fetch(scheduler, fetch_macro_china_m2_yearly, macro_cn_jrzb_data_path + '/M2货币供应年率.csv')
 
     # 获取企业景气及企业家信心指数
-    fetch_macro_china_enterprise_boom_index(macro_cn_jrzb_data_path + '/企业景气及企业家信心指数.csv')
+    schedule_fetch(scheduler, fetch_macro_china_enterprise_boom_index, macro_cn_jrzb_data_path + '/企业景气及企业家信心指数.csv')
 
     # 获取居民消费价格指数
-    fetch_macro_china_cpi(macro_cn_jrzb_data_path + '/居民消费价格指数.csv')
+    schedule_fetch(scheduler, fetch_macro_china_cpi, macro_cn_jrzb_data_path + '/居民消费价格指数.csv')
 
     # 获取国内生产总值
-    fetch_macro_china_gdp(macro_cn_jrzb_data_path + '/国内生产总值.csv')
+    schedule_fetch(scheduler, fetch_macro_china_gdp, macro_cn_jrzb_data_path + '/国内生产总值.csv')
 
     # 获取货币供应量
-    fetch_macro_china_supply_of_money(macro_cn_jrzb_data_path + '/货币供应量.csv')
+    schedule_fetch(scheduler, fetch_macro_china_supply_of_money, macro_cn_jrzb_data_path + '/货币供应量.csv')
 
     # 获取人民币汇率中间价
-    fetch_macro_china_rmb(macro_cn_jrzb_data_path + '/人民币汇率中间价.csv')
+    schedule_fetch(scheduler, fetch_macro_china_rmb, macro_cn_jrzb_data_path + '/人民币汇率中间价.csv')
 
 
 def fetch_macro_china_fx_reserves_yearly(macro_china_fx_reserves_yearly_data_path: str):
@@ -644,7 +874,7 @@ def fetch_macro_china_fx_reserves_yearly(macro_china_fx_reserves_yearly_data_pat
     获取外汇储备（亿美元）
     """
     print('🔍 正在获取外汇储备（亿美元）...')
-    fetch_with_cache(ak.macro_china_fx_reserves_yearly, macro_china_fx_reserves_yearly_data_path)
+    return fetch_with_cache(ak.macro_china_fx_reserves_yearly, macro_china_fx_reserves_yearly_data_path)
 
 
 def fetch_macro_china_m2_yearly(macro_china_m2_yearly_data_path: str):
@@ -652,7 +882,7 @@ def fetch_macro_china_m2_yearly(macro_china_m2_yearly_data_path: str):
     获取M2货币供应年率
     """
     print('🔍 正在获取M2货币供应年率...')
-    fetch_with_cache(ak.macro_china_m2_yearly, macro_china_m2_yearly_data_path)
+    return fetch_with_cache(ak.macro_china_m2_yearly, macro_china_m2_yearly_data_path)
 
 
 def fetch_macro_china_enterprise_boom_index(macro_china_enterprise_boom_index_data_path: str):
@@ -660,7 +890,7 @@ def fetch_macro_china_enterprise_boom_index(macro_china_enterprise_boom_index_da
     获取企业景气及企业家信心指数
     """
     print('🔍 正在获取企业景气及企业家信心指数...')
-    fetch_with_cache(ak.macro_china_enterprise_boom_index, macro_china_enterprise_boom_index_data_path)
+    return fetch_with_cache(ak.macro_china_enterprise_boom_index, macro_china_enterprise_boom_index_data_path)
 
 
 def fetch_macro_china_cpi(macro_china_cpi_data_path: str):
@@ -668,7 +898,7 @@ def fetch_macro_china_cpi(macro_china_cpi_data_path: str):
     获取居民消费价格指数
     """
     print('🔍 正在获取居民消费价格指数...')
-    fetch_with_cache(ak.macro_china_cpi, macro_china_cpi_data_path)
+    return fetch_with_cache(ak.macro_china_cpi, macro_china_cpi_data_path)
 
 
 def fetch_macro_china_gdp(macro_china_gdp_data_path: str):
@@ -676,7 +906,7 @@ def fetch_macro_china_gdp(macro_china_gdp_data_path: str):
     获取国内生产总值
     """
     print('🔍 正在获取国内生产总值...')
-    fetch_with_cache(ak.macro_china_gdp, macro_china_gdp_data_path)
+    return fetch_with_cache(ak.macro_china_gdp, macro_china_gdp_data_path)
 
 
 def fetch_macro_china_supply_of_money(macro_china_supply_of_money_data_path: str):
@@ -684,7 +914,7 @@ def fetch_macro_china_supply_of_money(macro_china_supply_of_money_data_path: str
     获取货币供应量
     """
     print('🔍 正在获取货币供应量...')
-    fetch_with_cache(ak.macro_china_supply_of_money, macro_china_supply_of_money_data_path)
+    return fetch_with_cache(ak.macro_china_supply_of_money, macro_china_supply_of_money_data_path)
 
 
 def fetch_macro_china_rmb(macro_china_rmb_data_path: str):
@@ -692,7 +922,7 @@ def fetch_macro_china_rmb(macro_china_rmb_data_path: str):
     获取人民币汇率中间价
     """
     print('🔍 正在获取人民币汇率中间价...')
-    fetch_with_cache(ak.macro_china_rmb, macro_china_rmb_data_path)
+    return fetch_with_cache(ak.macro_china_rmb, macro_china_rmb_data_path)
 
 
 def fetch_macro_us(macro_us_data_path: str):
@@ -772,11 +1002,186 @@ def parse_diverse_date(date_str: str, date_column: str) -> Optional[datetime]:
     return None
 
 
+# 日期列识别关键字
+DATE_COLUMN_KEYWORDS = ['日期', '月份', 'TRADE_DATE', 'date', '季度', '统计时间', '年份', '报告期', '发布时间']
+
+
+def find_date_columns(df: pd.DataFrame) -> List[str]:
+    """
+    按列名关键字查找日期列
+    
+    Args:
+        df: 数据表
+    
+    Returns:
+        List[str]: 日期列名列表
+    """
+    return [col for col in df.columns 
+            if any(keyword in col for keyword in DATE_COLUMN_KEYWORDS) 
+            and col != '最新公告日期']
+
+
+def _quarter_end_dates(values: pd.Series) -> pd.Series:
+    """
+    将"2024年第4季度"格式转换为季度末日期
+    """
+    parts = values.str.extract(r'(\d{4})年第([1-4])季度').astype(int)
+    month = parts[1] * 3
+    day = month.isin([3, 12]).map({True: 31, False: 30})
+    return pd.to_datetime(pd.DataFrame({'year': parts[0], 'month': month, 'day': day}), errors='coerce')
+
+
+def _year_end_dates(values: pd.Series) -> pd.Series:
+    """
+    将"2024年第1-4季度"格式转换为当年年末日期
+    """
+    year = values.str.slice(0, 4).astype(int)
+    return pd.to_datetime(pd.DataFrame({'year': year, 'month': 12, 'day': 31}), errors='coerce')
+
+
+def _strptime_converter(fmt: str):
+    return lambda values: pd.to_datetime(values, format=fmt, errors='coerce')
+
+
+# 日期格式规则: (整串匹配的正则, 列名判断, 整列转换函数)，与 parse_diverse_date 的逐个判断保持一致
+DATE_FORMAT_RULES = [
+    # 2023-05-31
+    (r'\d{4}-\d{1,2}-\d{1,2}', lambda col: True, _strptime_converter('%Y-%m-%d')),
+    # 2008年02月份
+    (r'\d{4}年\d{1,2}月份', lambda col: '月份' in col, _strptime_converter('%Y年%m月份')),
+    # 202011 (date列 / 月份列)
+    (r'\d{6}', lambda col: 'date' in col.lower() or '月份' in col, _strptime_converter('%Y%m')),
+    # 2024年第4季度
+    (r'\d{4}年第[1-4]季度', lambda col: '季度' in col, _quarter_end_dates),
+    # 2024年第1-4季度
+    (r'\d{4}年第[1-4]-[1-4]季度', lambda col: '季度' in col, _year_end_dates),
+    # 2025.2 (统计时间列)
+    (r'\d{4}\.\d{1,2}', lambda col: '统计时间' in col, _strptime_converter('%Y.%m')),
+    # 2005-03 (年份列)
+    (r'\d{4}-\d{1,2}', lambda col: '年份' in col, _strptime_converter('%Y-%m')),
+    # 2025-04-01 11:33:01
+    (r'\d{4}-\d{1,2}-\d{1,2} \d{1,2}:\d{1,2}:\d{1,2}', lambda col: True, _strptime_converter('%Y-%m-%d %H:%M:%S')),
+]
+
+
+def detect_date_rules(values: pd.Series, date_col: str, sample_size: int = 20) -> list:
+    """
+    根据列名和样本值确定日期列适用的格式规则，样本命中的规则排在最前
+    
+    Args:
+        values: 已转换为字符串的日期列
+        date_col: 日期列名
+        sample_size: 样本大小
+    
+    Returns:
+        list: 按尝试顺序排列的规则
+    """
+    rules = [rule for rule in DATE_FORMAT_RULES if rule[1](date_col)]
+    sample = values.head(sample_size)
+    matched = [rule for rule in rules if sample.str.fullmatch(rule[0]).any()]
+    return matched + [rule for rule in rules if rule not in matched]
+
+
+def parse_date_column(series: pd.Series, date_col: str) -> pd.Series:
+    """
+    向量化解析整个日期列，格式识别只做一次，每种格式整列转换一次
+    结果与逐个单元格调用 parse_diverse_date 一致
+    
+    Args:
+        series: 日期列数据
+        date_col: 日期列名（用于判断格式）
+    
+    Returns:
+        pd.Series: 解析后的日期，解析失败为 NaT
+    """
+    values = series.astype(str).str.strip().where(series.notna(), '')
+    result = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    remaining = values.ne('').to_numpy(copy=True)
+    
+    for pattern, _, converter in detect_date_rules(values, date_col):
+        if not remaining.any():
+            break
+        # 只在尚未解析的行上匹配，通常第一条规则即可覆盖整列
+        mask = remaining.copy()
+        mask[remaining] = values[remaining].str.fullmatch(pattern).to_numpy(dtype=bool)
+        if mask.any():
+            result[mask] = converter(values[mask]).to_numpy()
+            remaining &= ~mask
+    
+    return result
+
+
+_parsed_dates_cache = {}
+
+
+def get_parsed_date_columns(file_path: str, df: pd.DataFrame, max_entries: int = 512) -> dict:
+    """
+    获取文件所有日期列的解析结果，按 (路径, 修改时间, 大小) 缓存
+    
+    Args:
+        file_path: CSV文件路径
+        df: 该文件读取出的数据表
+        max_entries: 缓存的最大文件数
+    
+    Returns:
+        dict: {日期列名: 解析后的日期}
+    """
+    stat = os.stat(file_path)
+    cache_key = (os.path.abspath(file_path), stat.st_mtime, stat.st_size)
+    parsed_dates = _parsed_dates_cache.get(cache_key)
+    if parsed_dates is None:
+        parsed_dates = {date_col: parse_date_column(df[date_col], date_col) for date_col in find_date_columns(df)}
+        if len(_parsed_dates_cache) >= max_entries:
+            _parsed_dates_cache.pop(next(iter(_parsed_dates_cache)))
+        _parsed_dates_cache[cache_key] = parsed_dates
+    return parsed_dates
+
+
+def filter_df_by_date_range(df: pd.DataFrame,
+                            start_dt: datetime,
+                            end_dt: datetime,
+                            parsed_dates: dict = None) -> Optional[pd.DataFrame]:
+    """
+    按日期范围筛选数据表，任意一个日期列落在范围内的行都会保留
+    
+    Args:
+        df: 数据表
+        start_dt: 开始时间 (包含)
+        end_dt: 结束时间 (包含)
+        parsed_dates: {日期列名: 已解析的日期列}，为 None 时现场解析
+    
+    Returns:
+        筛选后的数据表；没有日期列时返回原表；范围内无数据时返回 None
+    """
+    date_columns = find_date_columns(df)
+    if not date_columns:
+        return df
+    
+    filtered_dfs = []
+    for date_col in date_columns:
+        # 解析日期列
+        if parsed_dates is not None and date_col in parsed_dates:
+            parsed = parsed_dates[date_col]
+        else:
+            parsed = parse_date_column(df[date_col], date_col)
+        # 筛选日期范围内的数据
+        mask = (parsed >= start_dt) & (parsed <= end_dt)
+        filtered_df = df.loc[mask].copy()
+        
+        if not filtered_df.empty:
+            filtered_dfs.append(filtered_df)
+    
+    if not filtered_dfs:
+        return None
+    return pd.concat(filtered_dfs).drop_duplicates()
+
+
 def filter_csv_by_date_range(input_path: str, 
                             output_path: str,
                             start_date: str, 
                             end_date: str,
-                            backup_dir: str = None):
+                            backup_dir: str = None,
+                            verbose: bool = True) -> int:
     """
     处理单个CSV文件，按日期范围筛选数据并保存，同时备份原始文件
     
@@ -786,25 +1191,32 @@ def filter_csv_by_date_range(input_path: str,
         start_date: 开始日期 (格式: %Y%m%d) (包含)
         end_date: 结束日期 (格式: %Y%m%d) (包含)
         backup_dir: 备份目录路径，如果为None，则不备份
+        verbose: 是否打印单个文件的处理结果
+    
+    Returns:
+        int: 写入输出文件的行数，范围内无数据时为0
     """
     # 转换日期范围
     start_dt = datetime.strptime(start_date, '%Y%m%d')
     end_dt = datetime.strptime(end_date, '%Y%m%d').replace(hour=23, minute=59, second=59)
     
+    # 有日期索引时二分查找定位范围，只读取文件中对应的一段
+    date_index = get_date_index(input_path)
+    if date_index is not None:
+        if backup_dir:
+            os.makedirs(backup_dir, exist_ok=True)
+            shutil.copy2(input_path, os.path.join(backup_dir, os.path.basename(input_path)))
+        return save_filtered_csv(date_index.read_range(input_path, start_dt, end_dt), input_path, output_path, verbose)
+    
     # 读取CSV文件
     df = pd.read_csv(input_path, encoding='utf-8', low_memory=False)
     
-    # 查找日期列
-    date_columns = [col for col in df.columns 
-                   if any(keyword in col for keyword in 
-                         ['日期', '月份', 'TRADE_DATE', 'date', '季度', '统计时间', '年份', '报告期', '发布时间']) 
-                         and col != '最新公告日期']
-    
-    if not date_columns:
+    if not find_date_columns(df):
         # 如果没有找到日期列，直接复制文件到输出路径
-        shutil.copy2(input_path, output_path)
-        print(f"提示: 文件 {os.path.basename(input_path)} 未找到日期列，已直接复制到输出路径")
-        return
+        write_atomic(lambda tmp_path: shutil.copy2(input_path, tmp_path), output_path)
+        if verbose:
+            print(f"提示: 文件 {os.path.basename(input_path)} 未找到日期列，已直接复制到输出路径")
+        return len(df)
     
     # 备份原始文件
     if backup_dir:
@@ -813,36 +1225,58 @@ def filter_csv_by_date_range(input_path: str,
         shutil.copy2(input_path, backup_path)
     
     # 筛选数据
-    filtered_dfs = []
-    for date_col in date_columns:
-        # 解析日期列
-        df['parsed_date'] = df[date_col].apply(
-            lambda x: parse_diverse_date(x, date_col))
-        # 筛选日期范围内的数据
-        mask = (df['parsed_date'] >= start_dt) & (df['parsed_date'] <= end_dt)
-        filtered_df = df.loc[mask].copy()
-        
-        if not filtered_df.empty:
-            filtered_df.drop(columns=['parsed_date'], inplace=True)
-            filtered_dfs.append(filtered_df)
+    result_df = filter_df_by_date_range(df, start_dt, end_dt, get_parsed_date_columns(input_path, df))
+    rows = save_filtered_csv(result_df, input_path, output_path, verbose)
     
-    # 合并并保存结果
-    if filtered_dfs:
-        result_df = pd.concat(filtered_dfs).drop_duplicates()
-        result_df.to_csv(output_path, index=False, encoding='utf-8-sig')
-        print(f"处理完成: {os.path.basename(input_path)} -> 保存 {len(result_df)} 行数据")
-    else:
+    # 为后续切片建立日期索引
+    build_date_index(input_path, df)
+    return rows
+
+
+def save_filtered_csv(result_df: Optional[pd.DataFrame], input_path: str, output_path: str, verbose: bool = True) -> int:
+    """
+    保存筛选结果
+    
+    Returns:
+        int: 写入的行数
+    """
+    if result_df is not None:
+        to_csv_atomic(result_df, output_path)
+        if verbose:
+            print(f"处理完成: {os.path.basename(input_path)} -> 保存 {len(result_df)} 行数据")
+        return len(result_df)
+    if verbose:
         print(f"警告: 文件 {os.path.basename(input_path)} 在指定日期范围内无数据")
+    return 0
+
+
+def process_csv_task(input_path: str, output_path: str, start_date: str, end_date: str, backup_dir: str = None) -> dict:
+    """
+    处理单个CSV文件的任务，在进程池中执行，异常不会向外抛出
+    
+    Returns:
+        dict: {'file', 'rows', 'bytes', 'seconds', 'error'}
+    """
+    start_time = time.time()
+    result = {'file': input_path, 'rows': 0, 'bytes': 0, 'seconds': 0.0, 'error': None}
+    try:
+        result['bytes'] = os.path.getsize(input_path)
+        result['rows'] = filter_csv_by_date_range(input_path, output_path, start_date, end_date, backup_dir, verbose=False)
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.time() - start_time
+    return result
 
 
 def process_all_csvs_in_directory(root_dir: str,
                                  output_dir: str,
                                  start_date: str,
                                  end_date: str,
-                                 backup_dir: str = None):
+                                 backup_dir: str = None,
+                                 max_workers: int = None) -> List[dict]:
     """
     截取日期范围内的数据
-    递归处理目录下所有CSV文件
+    递归处理目录下所有CSV文件，多个文件在进程池中并行处理
     
     Args:
         root_dir: 要处理的根目录
@@ -850,39 +1284,59 @@ def process_all_csvs_in_directory(root_dir: str,
         start_date: 开始日期 (格式: %Y%m%d) 包含
         end_date: 结束日期 (格式: %Y%m%d) 包含
         backup_dir: 备份目录路径，如果为None，则不备份
+        max_workers: 进程数，默认取环境变量 CSV_PROCESS_WORKERS，未设置时为CPU核数；为1时在当前进程中顺序处理
+    
+    Returns:
+        List[dict]: 每个文件的 {'file', 'rows', 'bytes', 'seconds', 'error'}
     """
     print(f"🔍 开始处理目录: {root_dir}")
+    start_time = time.time()
     # 创建输出目录
     os.makedirs(output_dir, exist_ok=True)
     
-    # 遍历所有CSV文件
+    # 收集所有CSV文件，保持原始目录结构
+    tasks = []
     for root, _, files in os.walk(root_dir):
+        rel_path = os.path.relpath(root, root_dir)
+        if rel_path == '.':
+            rel_path = ''
         for file in files:
             if file.lower().endswith('.csv'):
-                input_path = os.path.join(root, file)
-                # 保持原始目录结构
-                rel_path = os.path.relpath(root, root_dir)
-                if rel_path == '.':
-                    rel_path = ''
-                print(f"root: {root}, rel_path: {rel_path}")
-                
                 output_subdir = os.path.join(output_dir, rel_path)
                 os.makedirs(output_subdir, exist_ok=True)
-                
-                output_path = os.path.join(output_subdir, file)
-                
-                # 处理文件
-                try:
-                    filter_csv_by_date_range(
-                        input_path=input_path,
-                        output_path=output_path,
-                        start_date=start_date,
-                        end_date=end_date,
-                        backup_dir=os.path.join(backup_dir, rel_path) if backup_dir else None
-                    )
-                except Exception as e:
-                    print(f"处理文件 {input_path} 时出错: {str(e)}")
+                tasks.append((
+                    os.path.join(root, file),
+                    os.path.join(output_subdir, file),
+                    start_date,
+                    end_date,
+                    os.path.join(backup_dir, rel_path) if backup_dir else None,
+                ))
+    
+    if max_workers is None:
+        max_workers = int(os.environ.get('CSV_PROCESS_WORKERS', 0)) or os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(tasks)))
+    
+    # 处理文件
+    if max_workers == 1:
+        results = [process_csv_task(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(process_csv_task, *zip(*tasks), chunksize=max(1, len(tasks) // (max_workers * 4))))
+    
+    # 汇总结果
+    total_time = time.time() - start_time
+    failed = [result for result in results if result['error']]
+    empty = [result for result in results if not result['error'] and result['rows'] == 0]
+    total_rows = sum(result['rows'] for result in results)
+    total_mb = sum(result['bytes'] for result in results) / (1024 * 1024)
+    print(f"📊 处理 {len(results)} 个文件（{max_workers} 个进程）: 成功 {len(results) - len(failed)} 个, "
+          f"范围内无数据 {len(empty)} 个, 失败 {len(failed)} 个, 共保存 {total_rows} 行")
+    if total_time > 0:
+        print(f"📊 总耗时 {total_time:.2f}秒, 吞吐 {len(results) / total_time:.1f} 文件/秒, {total_mb / total_time:.1f} MB/秒")
+    for result in failed:
+        print(f"❌ 处理文件 {result['file']} 时出错: {result['error']}")
     print(f"✅ 处理目录完成: {root_dir}")
+    return results
 
 
 if __name__ == "__main__":
@@ -1,15 +1,65 @@
 import os
 import pandas as pd
 from typing import List, Dict, Any, Optional
-from .data_api import get_latest_quarter_date
+from .data_api import get_latest_quarter_date, find_date_columns
+from .frame_cache import read_frame
+from .macro_snapshot import get_macro_snapshot_store
+from .prompt_format import PromptFormatter, LEGACY_FORMATTER, format_kv_rows
+from .token_budget import PromptSection
+from .indicators import add_technical_indicators
+from .feature_store import add_stored_features
+from .news_dedup import deduplicate_news
+from .text_index import get_index_key, get_retrieval_top_k, retrieve_relevant
 from datetime import datetime
 
-def read_csv_files(directory: str) -> str:
+
+def load_csv(file_path: str, data_view=None) -> pd.DataFrame:
+    """
+    读取数据文件，传入数据视图时从内存视图中读取，否则通过进程内缓存读取（优先读取列式文件）
+    
+    Args:
+        file_path: CSV文件路径
+        data_view: 按日期切片的数据视图（AsOfDataView），为None时直接读取磁盘
+        
+    Returns:
+        pd.DataFrame: 文件内容
+    """
+    if data_view is not None:
+        return data_view.read_csv(file_path)
+    return read_frame(file_path)
+
+
+def path_exists(path: str, data_view=None) -> bool:
+    """
+    判断文件或目录是否存在，传入数据视图时以视图为准
+    """
+    if data_view is not None:
+        return data_view.exists(path)
+    return os.path.exists(path)
+
+
+def list_csv_files(directory: str, data_view=None) -> List[str]:
+    """
+    递归列出目录下所有CSV文件路径，传入数据视图时只列出视图中有数据的文件
+    """
+    if data_view is not None:
+        return data_view.list_csv_files(directory)
+    csv_files = []
+    for root, dirs, files in os.walk(directory):
+        for file in files:
+            if file.endswith('.csv'):
+                csv_files.append(os.path.join(root, file))
+    return csv_files
+
+
+def read_csv_files(directory: str, data_view=None, formatter: PromptFormatter = None) -> str:
     """
     读取指定目录下所有CSV文件并拼接内容
     
     Args:
         directory: 要读取的目录路径
+        data_view: 按日期切片的数据视图，为None时直接读取磁盘
+        formatter: 提示词序列化方式，为None时保持原有输出
         
     Returns:
         str: 拼接后的字符串，格式为"文件名: 文件内容"
@@ -17,65 +67,98 @@ def read_csv_files(directory: str) -> str:
     result = []
     
     # 确保目录存在
-    if not os.path.exists(directory):
+    if not path_exists(directory, data_view):
         print(f"❌ 目录不存在: {directory}")
         return ""
     
     # 遍历目录下所有文件
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.csv'):
-                file_path = os.path.join(root, file)
-                try:
-                    # 读取CSV文件
-                    df = pd.read_csv(file_path, encoding='utf-8-sig')
-                    
-                    # 将DataFrame转换为字符串
-                    df_str = df.to_string()
-                    
-                    # 拼接文件名和内容
-                    result.append(f"{file}:\n{df_str}\n")
-                except Exception as e:
-                    print(f"❌ 读取文件 {file} 时出错: {str(e)}")
+    for file_path in list_csv_files(directory, data_view):
+        file = os.path.basename(file_path)
+        try:
+            # 读取CSV文件
+            df = load_csv(file_path, data_view)
+            
+            # 将DataFrame转换为字符串
+            df_str = (formatter or LEGACY_FORMATTER).frame(df, title=file)
+            
+            # 拼接文件名和内容
+            result.append(f"{file}:\n{df_str}\n")
+        except Exception as e:
+            print(f"❌ 读取文件 {file} 时出错: {str(e)}")
     
     # 将所有内容拼接成一个字符串
     return "\n".join(result)
 
-def read_specific_csv(file_path: str) -> str:
+def read_specific_csv(file_path: str, data_view=None, formatter: PromptFormatter = None) -> str:
     """
     读取指定的CSV文件
     
     Args:
         file_path: CSV文件路径
+        data_view: 按日期切片的数据视图，为None时直接读取磁盘
+        formatter: 提示词序列化方式，为None时保持原有输出
         
     Returns:
         str: 文件内容字符串
     """
     try:
-        df = pd.read_csv(file_path, encoding='utf-8-sig')
-        return df.to_string()
+        df = load_csv(file_path, data_view)
+        return (formatter or LEGACY_FORMATTER).frame(df, title=os.path.basename(file_path))
     except Exception as e:
         print(f"❌ 读取文件 {file_path} 时出错: {str(e)}")
         return ""
 
 
-def read_stock_news_csv_by_date(file_path: str, target_date: str = None) -> str:
+# 检索时作为查询的主营介绍列
+PROFILE_COLUMNS = ('股票简称', '主营业务', '产品类型', '产品名称')
+# 新闻中参与检索的文本列
+NEWS_TEXT_COLUMNS = ('新闻标题', '新闻内容')
+
+
+def load_company_profile(file_path: str, data_view=None) -> str:
+    """
+    读取主营介绍，拼接为检索新闻和研报时使用的查询文本
+
+    Args:
+        file_path: 主营介绍CSV文件路径
+        data_view: 按日期切片的数据视图，为None时直接读取磁盘
+
+    Returns:
+        str: 主营业务、产品类型、产品名称等文本，读取失败时为空字符串
+    """
+    try:
+        df = load_csv(file_path, data_view)
+    except Exception as e:
+        print(f"❌ 读取文件 {file_path} 时出错: {str(e)}")
+        return ""
+    columns = [column for column in PROFILE_COLUMNS if column in df.columns]
+    if df.empty or not columns:
+        return ""
+    return ' '.join(str(value) for value in df[columns].iloc[-1] if pd.notna(value))
+
+
+def read_stock_news_csv_by_date(file_path: str, target_date: str = None, data_view=None,
+                                formatter: PromptFormatter = None, query: str = None) -> str:
     """
     读取股票新闻数据，返回指定日期前的新闻
     
     Args:
         file_path: CSV文件路径
         target_date: 目标日期，如果为None则返回所有新闻
+        data_view: 按日期切片的数据视图，为None时直接读取磁盘
+        formatter: 提示词序列化方式，为None时保持原有输出
+        query: 检索查询（如公司主营业务），不为空时只返回相关度最高的若干条新闻
         
     Returns:
         str: 指定日期前的新闻数据，格式为"新闻标题: 新闻内容 (发布时间)"
     """
     try:
         # 读取CSV文件
-        df = pd.read_csv(file_path, encoding='utf-8-sig')
+        all_news = load_csv(file_path, data_view)
         
         # 将发布时间列转换为datetime类型
-        df['发布时间'] = pd.to_datetime(df['发布时间'], format='%Y-%m-%d %H:%M:%S')
+        all_news['发布时间'] = pd.to_datetime(all_news['发布时间'], format='%Y-%m-%d %H:%M:%S')
+        df = all_news
         
         # 如果指定了日期，筛选日期前的新闻
         if target_date:
@@ -91,48 +174,56 @@ def read_stock_news_csv_by_date(file_path: str, target_date: str = None) -> str:
         if df.empty:
             print(f"❌ 没有找到相关新闻")
             return ""
-        return df.to_string()
+
+        top_k = get_retrieval_top_k('news')
+        if query and top_k and len(df) > top_k:
+            # 在完整的新闻索引上按截止时间检索，候选多取一些，去重后保留 top_k 条，按发布时间倒序输出
+            candidates = retrieve_relevant(all_news, get_index_key(file_path, data_view), 'news', query,
+                                           NEWS_TEXT_COLUMNS, date_column='发布时间',
+                                           as_of=target_date or None, limit=top_k * 3)
+            df = deduplicate_news(candidates).head(top_k).sort_values('发布时间', ascending=False, kind='stable')
+            print(f"🔍 新闻检索: 从 {len(all_news)} 条中选出 {len(df)} 条相关新闻")
+        else:
+            # 合并转载等近似重复的新闻，每类只保留一条并记录条数
+            df = deduplicate_news(df)
+        return (formatter or LEGACY_FORMATTER).frame(df, title='股票新闻', date_column='发布时间',
+                                                      key_columns=('新闻标题', '发布时间'))
     except Exception as e:
         print(f"❌ 读取新闻数据时出错: {str(e)}")
         return ""
     
 
-def get_csv_files(directory: str) -> List[str]:
+def get_csv_files(directory: str, data_view=None) -> List[str]:
     """
     获取指定目录下所有CSV文件的路径
     
     Args:
         directory: 要搜索的目录路径
+        data_view: 按日期切片的数据视图，为None时直接读取磁盘
         
     Returns:
         List[str]: CSV文件路径列表
     """
-    csv_files = []
-    
-    if not os.path.exists(directory):
+    if not path_exists(directory, data_view):
         print(f"❌ 目录不存在: {directory}")
-        return csv_files
-    
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.csv'):
-                csv_files.append(os.path.join(root, file))
+        return []
     
-    return csv_files
+    return list_csv_files(directory, data_view)
 
-def get_csv_first_or_last_row(file_path: str, position: str = 'last') -> str:
+def get_csv_first_or_last_row(file_path: str, position: str = 'last', data_view=None) -> str:
     """
     获取指定CSV文件的第一行或最后一行数据
     
     Args:
         file_path: CSV文件路径
         position: 获取位置，'first' 表示第一行，'last' 表示最后一行
+        data_view: 按日期切片的数据视图，为None时直接读取磁盘
         
     Returns:
         str: 指定行的数据字符串
     """
     try:
-        df = pd.read_csv(file_path, encoding='utf-8-sig')
+        df = load_csv(file_path, data_view)
         
         if position.lower() == 'first':
             row = df.iloc[0]
@@ -142,150 +233,92 @@ def get_csv_first_or_last_row(file_path: str, position: str = 'last') -> str:
             raise ValueError("position 参数必须是 'first' 或 'last'")
             
         # 将行数据转换为字符串，格式为 "列名: 值"
-        result = []
-        for column in df.columns:
-            result.append(f"{column}: {row[column]}")
-            
-        return "\n".join(result)
+        return format_kv_rows(row.to_frame().T, decimals=None, skip_na=False)[0]
         
     except Exception as e:
         print(f"❌ 读取文件 {file_path} 时出错: {str(e)}")
         return ""
 
 
-def get_stock_fundamentals_main_business(file_path: str, target_date: str = None) -> str:
+def load_stock_fundamentals_main_business(file_path: str, target_date: str = None, data_view=None) -> pd.DataFrame:
+    """
+    读取指定股票的主营构成（目标日期所在季度）
+    """
+    df = load_csv(file_path, data_view)
+    if target_date:
+        target_date = datetime.strptime(target_date, '%Y%m%d')
+        latest_date = get_latest_quarter_date(target_date, target_date.year)
+        df = df[df['报告日期'] == latest_date]
+    return df
+
+
+def load_stock_fundamentals_key_metrics(file_path: str, target_date: str = None, data_view=None) -> pd.Series:
+    """
+    读取指定股票目标日期前最近一期的基本面关键指标
+    """
+    df = load_csv(file_path, data_view)
+    df['报告期'] = pd.to_datetime(df['报告期'], format='%Y-%m-%d')
+    if target_date:
+        target_date = datetime.strptime(target_date, '%Y%m%d')
+        df = df[df['报告期'] <= target_date]
+    # 返回最后一行
+    return df.iloc[-1]
+
+
+def get_stock_fundamentals_main_business(file_path: str, target_date: str = None, data_view=None,
+                                         formatter: PromptFormatter = None) -> str:
     """
     获取指定股票的主营构成
     """
     try:
-        df = pd.read_csv(file_path, encoding='utf-8-sig')
-        if target_date:
-            target_date = datetime.strptime(target_date, '%Y%m%d')
-            latest_date = get_latest_quarter_date(target_date, target_date.year)
-            df = df[df['报告日期'] == latest_date]
-        return df.to_string()
+        df = load_stock_fundamentals_main_business(file_path, target_date, data_view)
+        return (formatter or LEGACY_FORMATTER).frame(df, title='主营构成')
     except Exception as e:
         print(f"❌ 读取文件 {file_path} 时出错: {str(e)}")
         return ""
 
 
-def get_stock_fundamentals_key_metrics(file_path: str, target_date: str = None) -> str:
+def get_stock_fundamentals_key_metrics(file_path: str, target_date: str = None, data_view=None,
+                                       formatter: PromptFormatter = None) -> str:
     """
     获取指定股票的基本面关键指标
     """
     try:
-        df = pd.read_csv(file_path, encoding='utf-8-sig')
-        df['报告期'] = pd.to_datetime(df['报告期'], format='%Y-%m-%d')
-        if target_date:
-            target_date = datetime.strptime(target_date, '%Y%m%d')
-            df = df[df['报告期'] <= target_date]
-        # 返回最后一行
-        return df.iloc[-1].to_string()
+        row = load_stock_fundamentals_key_metrics(file_path, target_date, data_view)
+        return (formatter or LEGACY_FORMATTER).row(row, title='基本面数据关键指标')
     except Exception as e:
         print(f"❌ 读取文件 {file_path} 时出错: {str(e)}")
         return ""
 
 
-def get_latest_data_from_directory(directory: str) -> str:
+def get_latest_data_from_directory(directory: str, data_view=None, formatter: PromptFormatter = None) -> str:
     """
     读取指定目录下所有CSV文件的最新数据并拼接
     
+    各文件每个日期的首行在拉取后已物化到快照（见 macro_snapshot），
+    这里只需按数据视图的日期范围做一次 as-of 查询。
+    
     Args:
         directory: 要读取的目录路径
+        data_view: 按日期切片的数据视图，为None时取全部数据中的最新值
+        formatter: 提示词序列化方式，用于 token 预算和统计（快照内容已格式化，超出预算时整段丢弃）
         
     Returns:
         str: 所有文件最新数据的拼接字符串
     """
-    result = []
-    
     # 确保目录存在
-    if not os.path.exists(directory):
+    if not os.path.isdir(directory):
         print(f"❌ 目录不存在: {directory}")
         return ""
     
-    # 遍历目录下所有文件
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.csv'):
-                file_path = os.path.join(root, file)
-                try:
-                    # 读取CSV文件
-                    df = pd.read_csv(file_path, encoding='utf-8-sig')
-                    
-                    # 获取文件名（不含扩展名）作为标题
-                    file_title = os.path.splitext(file)[0]
-                    
-                    # 检查是否有日期列
-                    date_columns = [col for col in df.columns if '日期' in col or '时间' in col or '月份' in col or '季度' in col or '年份' in col]
-                    
-                    if date_columns:
-                        # 如果有日期列，使用日期列判断最新数据
-                        date_col = date_columns[0]
-                        latest_row = df.iloc[-1]  # 默认使用最后一行
-                        
-                        # 如果日期列是字符串，尝试转换为日期
-                        if df[date_col].dtype == 'object':
-                            try:
-                                # 创建临时日期列
-                                df['temp_date'] = pd.NaT
-                                
-                                # 处理不同的日期格式
-                                for idx, date_str in enumerate(df[date_col]):
-                                    if pd.isna(date_str):
-                                        continue
-                                        
-                                    try:
-                                        # 处理年份格式（如"2024年第1-4季度"）
-                                        if '年第' in date_str and '季度' in date_str:
-                                            year = int(date_str.split('年第')[0])
-                                            quarter = int(date_str.split('年第')[1].split('季度')[0])
-                                            df.at[idx, 'temp_date'] = pd.Timestamp(year=year, month=quarter*3, day=1)
-                                            
-                                        # 处理年月格式（如"2024年12月份"）
-                                        elif '年' in date_str and '月份' in date_str:
-                                            year = int(date_str.split('年')[0])
-                                            month = int(date_str.split('年')[1].split('月份')[0])
-                                            df.at[idx, 'temp_date'] = pd.Timestamp(year=year, month=month, day=1)
-                                            
-                                        # 处理标准日期格式（如"2024-12-07"）
-                                        else:
-                                            df.at[idx, 'temp_date'] = pd.to_datetime(date_str)
-                                    except:
-                                        continue
-                                
-                                # 获取最新日期对应的行
-                                if not df['temp_date'].isna().all():
-                                    latest_date = df['temp_date'].max()
-                                    latest_row = df[df['temp_date'] == latest_date].iloc[0]
-                                else:
-                                    # 如果日期转换全部失败，使用最后一行
-                                    latest_row = df.iloc[-1]
-                            except Exception as e:
-                                print(f"❌ 读取文件 {file} 时出错: {str(e)}")
-                                latest_row = df.iloc[-1]
-                    else:
-                        # 如果没有日期列，使用最后一行
-                        latest_row = df.iloc[-1]
-                    
-                    # 将行数据转换为字符串，格式为 "列名: 值"
-                    row_data = []
-                    for column in df.columns:
-                        if column != 'temp_date':  # 排除临时日期列
-                            value = latest_row[column]
-                            if pd.notna(value):  # 只添加非空值
-                                # 格式化数值，如果是浮点数则保留2位小数
-                                if isinstance(value, float):
-                                    value = f"{value:.2f}"
-                                row_data.append(f"{column}: {value}")
-                    
-                    # 拼接文件名和数据
-                    result.append(f"{file_title}:\n" + "\n".join(row_data) + "\n")
-                    
-                except Exception as e:
-                    print(f"❌ 读取文件 {file} 时出错: {str(e)}")
-    
-    # 将所有内容拼接成一个字符串
-    return "\n".join(result)
+    store = get_macro_snapshot_store(directory)
+    if data_view is None:
+        rows = store.get_latest_rows()
+    else:
+        rows = store.get_latest_rows(end_dt=data_view.end_dt, start_dt=data_view.start_dt)
+    sections = [PromptSection(title, text=content) for title, content in rows]
+    texts = (formatter or LEGACY_FORMATTER).sections(sections)
+    return "\n".join(f"{section.title}:\n{text}\n" for section, text in zip(sections, texts) if not section.dropped)
 
 
 def get_macro_data_by_date(file_path: str, target_date: str = None) -> str:
@@ -303,100 +336,127 @@ def get_macro_data_by_date(file_path: str, target_date: str = None) -> str:
         for file in files:
             if file.endswith('.csv'):
                 file_path = os.path.join(root, file)
-                df = pd.read_csv(file_path, encoding='utf-8-sig')
+                df = read_frame(file_path)
 
 
     
 
-def get_stock_fundamentals_data(stock_code: str, target_date: str = None, data_path: str = None) -> str:
+# 研报中参与检索的文本列
+REPORT_TEXT_COLUMNS = ('报告名称', '股票简称', '东财评级', '机构', '行业')
+
+# 基本面各文件在提示词中的优先级，超出 token 预算时先丢弃优先级低的
+FUNDAMENTAL_SECTION_PRIORITIES = {
+    '个股研报.csv': 0,
+    '主营介绍.csv': 1,
+    '业绩报表.csv': 2,
+    '主营构成.csv': 2,
+    '基本面数据关键指标.csv': 3,
+}
+
+
+def select_relevant_reports(df: pd.DataFrame, file_path: str, fundamentals_data_path: str, target_date: str = None,
+                            data_view=None, date_column: str = None) -> pd.DataFrame:
     """
-    获取指定股票的基本面数据
+    按公司主营业务检索相关度最高的若干篇研报，按日期倒序输出；未配置检索或缺少主营介绍时原样返回
     """
-    result = []
+    top_k = get_retrieval_top_k('report')
+    if not top_k or len(df) <= top_k:
+        return df
+    query = load_company_profile(fundamentals_data_path + '/' + '主营介绍.csv', data_view)
+    if not query:
+        return df
+    # 与新闻一致，只使用目标日期开盘以前发布的研报
+    as_of = datetime.strptime(target_date, '%Y%m%d').replace(hour=9, minute=30) if target_date else None
+    result = retrieve_relevant(df, get_index_key(file_path, data_view), 'report', query, REPORT_TEXT_COLUMNS,
+                               date_column=date_column, as_of=as_of, limit=top_k)
+    if date_column is not None:
+        result = result.sort_values(date_column, ascending=False, kind='stable')
+    print(f"🔍 研报检索: 从 {len(df)} 篇中选出 {len(result)} 篇相关研报")
+    return result
 
+
+def get_stock_fundamentals_data(stock_code: str, target_date: str = None, data_path: str = None, data_view=None,
+                                formatter: PromptFormatter = None) -> str:
+    """
+    获取指定股票的基本面数据
+    """
+    formatter = formatter or LEGACY_FORMATTER
     fundamentals_data_path = ('data' if data_path is None else data_path) + '/' + str(stock_code) + '/' + '股票基本面数据'
-    for root, dirs, files in os.walk(fundamentals_data_path):
-        for file in files:
-            if file.endswith('.csv'):
-                if file == '基本面数据关键指标.csv' or file == '主营构成.csv':
-                    continue
-                try:
-                    file_path = os.path.join(root, file)
-                    
-                    df = pd.read_csv(file_path, encoding='utf-8-sig')
-                    df_str = df.to_string()
-
-                    result.append(f'{file}:\n{df_str}\n')
-                except Exception as e:
-                    print(f"❌ 读取文件 {file} 时出错: {str(e)}")
-    answer = '\n'.join(result)
+
+    # 各文件作为独立的数据段，在 token 预算内统一裁剪
+    sections = []
+    for file_path in list_csv_files(fundamentals_data_path, data_view):
+        file = os.path.basename(file_path)
+        if file == '基本面数据关键指标.csv' or file == '主营构成.csv':
+            continue
+        try:
+            df = load_csv(file_path, data_view)
+            date_columns = find_date_columns(df)
+            if file == '个股研报.csv':
+                df = select_relevant_reports(df, file_path, fundamentals_data_path, target_date, data_view,
+                                             date_columns[0] if date_columns else None)
+            sections.append(PromptSection(file, df, priority=FUNDAMENTAL_SECTION_PRIORITIES.get(file, 1),
+                                          date_column=date_columns[0] if date_columns else None))
+        except Exception as e:
+            print(f"❌ 读取文件 {file} 时出错: {str(e)}")
+    file_count = len(sections)
 
     # 获取主营构成
+    indicator_path = fundamentals_data_path + '/' + '主营构成.csv'
     try:
-        indicator_path = fundamentals_data_path + '/' + '主营构成.csv'
-        answer += '\n' + '主营构成:\n' + get_stock_fundamentals_main_business(indicator_path, target_date)
+        main_business = load_stock_fundamentals_main_business(indicator_path, target_date, data_view)
+        sections.append(PromptSection('主营构成', main_business, priority=FUNDAMENTAL_SECTION_PRIORITIES['主营构成.csv']))
     except Exception as e:
         print(f"❌ 读取文件 {indicator_path} 时出错: {str(e)}")
+        sections.append(PromptSection('主营构成', text=''))
 
     # 获取基本面数据关键指标
+    indicator_path = fundamentals_data_path + '/' + '基本面数据关键指标.csv'
     try:
-        indicator_path = fundamentals_data_path + '/' + '基本面数据关键指标.csv'
-        answer += '\n' + '基本面数据关键指标:\n' + get_stock_fundamentals_key_metrics(indicator_path, target_date)
+        key_metrics = load_stock_fundamentals_key_metrics(indicator_path, target_date, data_view)
+        sections.append(PromptSection('基本面数据关键指标', key_metrics.to_frame().T, single_row=True,
+                                      priority=FUNDAMENTAL_SECTION_PRIORITIES['基本面数据关键指标.csv'],
+                                      legacy_render=lambda frame: frame.iloc[0].to_string()))
     except Exception as e:
         print(f"❌ 读取文件 {indicator_path} 时出错: {str(e)}")
+        sections.append(PromptSection('基本面数据关键指标', text=''))
+
+    texts = formatter.sections(sections)
+    answer = '\n'.join(f'{section.title}:\n{text}\n' for section, text in zip(sections[:file_count], texts[:file_count])
+                        if not section.dropped)
+    for section, text in zip(sections[file_count:], texts[file_count:]):
+        if not section.dropped:
+            answer += '\n' + f'{section.title}:\n' + text
 
     print(f'✅ 基本面数据获取完成 {stock_code}')
     return answer
 
 
 def calculate_technical_indicators(df):
-    """计算技术指标"""
-    # 计算5日、10日、20日移动平均线
-    df['MA5'] = df['收盘'].rolling(window=5).mean()
-    df['MA10'] = df['收盘'].rolling(window=10).mean()
-    df['MA20'] = df['收盘'].rolling(window=20).mean()
-    
-    # 计算RSI
-    delta = df['收盘'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df['RSI'] = 100 - (100 / (1 + rs))
-    
-    # 计算MACD
-    exp1 = df['收盘'].ewm(span=12, adjust=False).mean()
-    exp2 = df['收盘'].ewm(span=26, adjust=False).mean()
-    df['MACD'] = exp1 - exp2
-    df['Signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-    
-    # 计算布林带
-    df['BB_middle'] = df['收盘'].rolling(window=20).mean()
-    df['BB_upper'] = df['BB_middle'] + 2 * df['收盘'].rolling(window=20).std()
-    df['BB_lower'] = df['BB_middle'] - 2 * df['收盘'].rolling(window=20).std()
-    
-    # 计算价格变化率
-    df['Price_Change'] = df['收盘'].pct_change()
-    
-    # 计算成交量变化率
-    df['Volume_Change'] = df['成交量'].pct_change()
-    
-    # 计算波动率
-    df['Volatility'] = df['收盘'].rolling(window=20).std()
-    
-    # 计算价格动量
-    df['Momentum'] = df['收盘'].pct_change(periods=10)
-    
-    # 计算VWAP（成交量加权平均价格）
-    df['VWAP'] = (df['收盘'] * df['成交量']).cumsum() / df['成交量'].cumsum()
-    
-    # 计算市场情绪指标
-    df['Price_MA_Ratio'] = df['收盘'] / df['MA20']  # 价格与20日均线比率
-    df['Volume_MA_Ratio'] = df['成交量'] / df['成交量'].rolling(window=20).mean()  # 成交量比率
-    
-    return df
+    """
+    计算技术指标（逐根K线推进滚动状态，见 indicators.add_technical_indicators）
+    """
+    return add_technical_indicators(df)
+
 
+# 日线数据中不会因 token 预算被删除的列
+PRICE_KEY_COLUMNS = ('日期', '开盘', '收盘', '最高', '最低', '成交量')
 
-def get_stock_price_data(stock_code: str, target_date: str = None, data_path: str = None) -> str:
+
+def format_price_rows(df: pd.DataFrame) -> str:
+    """
+    将日线数据逐行格式化为 "列名: 值"，交易日之间以空行分隔
+    """
+    # 按列整块格式化，跳过空值，浮点数保留2位小数
+    rows = format_kv_rows(df, decimals=2, date_format='%Y-%m-%d')
+    if not rows:
+        return ""
+    # 每个交易日之后添加空行分隔
+    return "\n\n".join(rows) + "\n"
+
+
+def get_stock_price_data(stock_code: str, target_date: str = None, data_path: str = None, data_view=None,
+                         formatter: PromptFormatter = None) -> str:
     """
     获取指定股票的价格数据和技术指标
     
@@ -404,6 +464,8 @@ def get_stock_price_data(stock_code: str, target_date: str = None, data_path: st
         stock_code: 股票代码，如 '600415'
         target_date: 目标日期, 格式%Y%m%d, 如果为None则使用最新数据
         data_path: 数据路径，如果为None则使用默认路径
+        data_view: 按日期切片的数据视图，为None时直接读取磁盘
+        formatter: 提示词序列化方式，为None时保持原有的 "列名: 值" 输出
 
     Returns:
         str: 指定日期前的20行价格数据和技术指标的格式化字符串
@@ -412,12 +474,12 @@ def get_stock_price_data(stock_code: str, target_date: str = None, data_path: st
         price_data_path = os.path.join('data' if data_path is None else data_path, stock_code, '股票日线数据.csv')
         
         # 检查文件是否存在
-        if not os.path.exists(price_data_path):
+        if not path_exists(price_data_path, data_view):
             print(f"❌ 文件不存在: {price_data_path}")
             return ""
             
         # 读取CSV文件
-        df = pd.read_csv(price_data_path, encoding='utf-8-sig')
+        df = load_csv(price_data_path, data_view)
         
         # 将日期列转换为datetime类型
         df['日期'] = pd.to_datetime(df['日期'])
@@ -430,8 +492,8 @@ def get_stock_price_data(stock_code: str, target_date: str = None, data_path: st
             except Exception as e:
                 print(f"❌ 日期格式错误: {str(e)}")
 
-        # 计算技术指标
-        df = calculate_technical_indicators(df)
+        # 从特征存储中取技术指标
+        df = add_stored_features(df, price_data_path)
          
         # 获取数据行数
         total_rows = len(df)
@@ -445,20 +507,9 @@ def get_stock_price_data(stock_code: str, target_date: str = None, data_path: st
         target_date = (str(target_date.strftime('%Y-%m-%d')) + '前') if target_date else "最新"
         result.append(f"=== {stock_code} {target_date} 的{rows_to_get}个交易日数据 ===")
         
-        # 遍历每一行数据
-        for _, row in last_rows.iterrows():
-            row_data = []
-            for column in df.columns:
-                value = row[column]
-                if pd.notna(value):  # 只添加非空值
-                    if isinstance(value, float):
-                        value = f"{value:.2f}"
-                    elif isinstance(value, pd.Timestamp):
-                        value = value.strftime('%Y-%m-%d')
-                    row_data.append(f"{column}: {value}")
-            result.append("\n".join(row_data))
-            result.append("")  # 添加空行分隔不同交易日
-        
+        result.append((formatter or LEGACY_FORMATTER).frame(
+            last_rows, legacy_render=format_price_rows, title='股票日线数据',
+            date_column='日期', key_columns=PRICE_KEY_COLUMNS))
         return "\n".join(result)
         
     except Exception as e:
@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+import pandas as pd
+from .resilience import ResilientCaller, parse_endpoint_timeouts
+from .metrics import get_metrics_registry
+
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATA_SOURCE_MODES = ('live', 'record', 'replay')
+
+
+class DataSourceReplayError(Exception):
+    """
+    回放模式下注入的模拟故障，或请求的录制数据不存在
+    """
+
+
+class DataSource:
+    """
+    akshare 数据源的可插拔封装
+
+    - live: 直接调用 akshare（默认）
+    - record: 调用 akshare 并把返回结果录制到本地
+    - replay: 只从本地录制数据中返回结果，可配置延迟和故障注入，无需网络和 akshare
+
+    使用方式与 akshare 模块一致，如 ``ak.stock_zh_a_hist(symbol=...)``。
+    """
+
+    def __init__(self, mode: str = 'live', fixture_dir: str = None,
+                 latency_ms: float = 0.0, latency_jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, seed: int = None, caller: ResilientCaller = None) -> None:
+        """
+        Args:
+            mode: 'live' / 'record' / 'replay'
+            fixture_dir: 录制数据目录，默认 stock_prediction/fixtures/akshare
+            latency_ms: 回放时每次请求的基础延迟（毫秒）
+            latency_jitter_ms: 回放延迟的随机浮动范围（毫秒）
+            error_rate: 回放时每次请求抛出异常的概率
+            seed: 随机种子，便于压测结果复现
+            caller: 接口调用的超时、重试和熔断策略，为 None 时直接调用
+        """
+        if mode not in DATA_SOURCE_MODES:
+            raise ValueError(f"mode 参数必须是 {DATA_SOURCE_MODES} 之一: {mode}")
+        self.mode = mode
+        self.fixture_dir = fixture_dir or os.path.join(root_dir, 'fixtures', 'akshare')
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._akshare = None
+        self.caller = caller
+
+    def _get_akshare(self):
+        # 延迟导入，回放模式下不依赖 akshare
+        if self._akshare is None:
+            import akshare
+            self._akshare = akshare
+        return self._akshare
+
+    @staticmethod
+    def make_key(name: str, args: tuple, kwargs: dict) -> str:
+        """
+        计算一次接口调用的录制键
+        """
+        payload = json.dumps([name, list(args), kwargs], ensure_ascii=False, sort_keys=True, default=str)
+        return f"{name}_{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]}"
+
+    def _fixture_path(self, key: str) -> str:
+        return os.path.join(self.fixture_dir, f'{key}.pkl')
+
+    def _record(self, key: str, name: str, args: tuple, kwargs: dict, result) -> None:
+        os.makedirs(self.fixture_dir, exist_ok=True)
+        fixture_path = self._fixture_path(key)
+        tmp_path = f'{fixture_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        pd.to_pickle(result, tmp_path)
+        os.replace(tmp_path, fixture_path)
+        # 记录调用参数，便于查看录制了哪些请求
+        with open(os.path.join(self.fixture_dir, f'{key}.json'), 'w', encoding='utf-8') as f:
+            json.dump({'name': name, 'args': list(args), 'kwargs': kwargs, 'recorded_at': time.time()},
+                      f, ensure_ascii=False, default=str)
+
+    def _replay(self, key: str, name: str):
+        with self._random_lock:
+            delay = self.latency_ms + self._random.uniform(0, self.latency_jitter_ms)
+            failed = self._random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if failed:
+            raise DataSourceReplayError(f"回放模式注入的模拟故障: {name}")
+
+        result = pd.read_pickle(self._fixture_path(key))
+        # 返回副本，调用方修改结果不会影响后续回放
+        return result.copy() if hasattr(result, 'copy') else result
+
+    def _invoke(self, name: str, func):
+        metrics = get_metrics_registry()
+        duration_histogram = metrics.histogram('akshare_call_duration_seconds', 'akshare 接口调用耗时（含重试）', ('endpoint',))
+        error_counter = metrics.counter('akshare_call_errors_total', 'akshare 接口调用最终失败的次数', ('endpoint',))
+        try:
+            with duration_histogram.time(endpoint=name):
+                if self.caller is None:
+                    return func()
+                return self.caller.call(name, func)
+        except Exception:
+            error_counter.inc(endpoint=name)
+            raise
+
+    def call(self, name: str, *args, **kwargs):
+        """
+        调用指定的 akshare 接口
+        """
+        if self.mode == 'live':
+            return self._invoke(name, lambda: getattr(self._get_akshare(), name)(*args, **kwargs))
+
+        key = self.make_key(name, args, kwargs)
+        if self.mode == 'replay':
+            # 录制数据不存在时重试没有意义，直接失败
+            if not os.path.exists(self._fixture_path(key)):
+                raise DataSourceReplayError(f"没有找到录制数据: {name} ({key})")
+            return self._invoke(name, lambda: self._replay(key, name))
+
+        result = self._invoke(name, lambda: getattr(self._get_akshare(), name)(*args, **kwargs))
+        self._record(key, name, args, kwargs, result)
+        return result
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def method(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+        method.__name__ = name
+        return method
+
+
+def create_data_source_from_env() -> DataSource:
+    """
+    根据环境变量创建数据源
+
+    DATA_SOURCE_MODE: live / record / replay，默认 live
+    DATA_SOURCE_FIXTURE_DIR: 录制数据目录
+    DATA_SOURCE_LATENCY_MS / DATA_SOURCE_LATENCY_JITTER_MS: 回放延迟
+    DATA_SOURCE_ERROR_RATE: 回放故障注入概率
+    DATA_SOURCE_SEED: 随机种子
+    AKSHARE_TIMEOUT_SECONDS: 单次接口调用的默认截止时间，默认30秒
+    AKSHARE_ENDPOINT_TIMEOUTS: 按接口覆盖截止时间，如 "stock_yjbb_em=300,stock_news_em=20"
+    AKSHARE_MAX_RETRIES: 失败后的最大重试次数，默认3次
+    AKSHARE_BACKOFF_BASE_SECONDS / AKSHARE_BACKOFF_MAX_SECONDS: 指数退避的基础和上限等待时间
+    AKSHARE_CIRCUIT_FAILURES / AKSHARE_CIRCUIT_RESET_SECONDS: 熔断阈值和熔断持续时间
+    """
+    seed = os.environ.get('DATA_SOURCE_SEED')
+    caller = ResilientCaller(
+        timeout=float(os.environ.get('AKSHARE_TIMEOUT_SECONDS', 30)),
+        max_retries=int(os.environ.get('AKSHARE_MAX_RETRIES', 3)),
+        backoff_base=float(os.environ.get('AKSHARE_BACKOFF_BASE_SECONDS', 1.0)),
+        backoff_max=float(os.environ.get('AKSHARE_BACKOFF_MAX_SECONDS', 30)),
+        failure_threshold=int(os.environ.get('AKSHARE_CIRCUIT_FAILURES', 5)),
+        reset_timeout=float(os.environ.get('AKSHARE_CIRCUIT_RESET_SECONDS', 60)),
+        endpoint_timeouts=parse_endpoint_timeouts(os.environ.get('AKSHARE_ENDPOINT_TIMEOUTS')),
+    )
+    return DataSource(
+        mode=os.environ.get('DATA_SOURCE_MODE', 'live'),
+        fixture_dir=os.environ.get('DATA_SOURCE_FIXTURE_DIR'),
+        latency_ms=float(os.environ.get('DATA_SOURCE_LATENCY_MS', 0)),
+        latency_jitter_ms=float(os.environ.get('DATA_SOURCE_LATENCY_JITTER_MS', 0)),
+        error_rate=float(os.environ.get('DATA_SOURCE_ERROR_RATE', 0)),
+        seed=int(seed) if seed else None,
+        caller=caller,
+    )
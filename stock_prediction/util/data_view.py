@@ -0,0 +1,167 @@
+import os
+import threading
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional
+from .data_api import find_date_columns, parse_date_column, filter_df_by_date_range
+from .frame_cache import get_frame_cache
+from .date_index import DateIndex
+from .metrics import get_metrics_registry
+
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class DataStore:
+    """
+    数据目录的内存镜像
+
+    数据表本身存放在进程内的 FrameCache 中，每个CSV只在首次访问或文件发生变化时解析一次；
+    日期列的解析结果和日期索引作为派生结果挂在同一条缓存上，供按日期范围切片时复用，
+    占用的内存计入 FRAME_CACHE_MAX_MB 上限，并随数据表一起淘汰。
+    """
+
+    def __init__(self, data_root: str) -> None:
+        self.data_root = os.path.abspath(data_root)
+
+    def relpath(self, file_path: str) -> str:
+        """
+        将文件路径转换为相对于数据根目录的路径
+        """
+        return os.path.relpath(os.path.abspath(file_path), self.data_root)
+
+    def list_csv_files(self, directory: str = None) -> List[str]:
+        """
+        列出目录下所有CSV文件（相对路径），保持 os.walk 的遍历顺序
+        """
+        directory = self.data_root if directory is None else os.path.abspath(directory)
+        csv_files = []
+        for root, _, files in os.walk(directory):
+            for file in files:
+                if file.lower().endswith('.csv'):
+                    csv_files.append(self.relpath(os.path.join(root, file)))
+        return csv_files
+
+    def load(self, rel_path: str) -> tuple:
+        """
+        加载单个CSV文件，文件未变化时直接返回缓存中的结果
+
+        Returns:
+            (DataFrame, {日期列: 解析后的日期}, DateIndex 或 None)，DataFrame 与缓存共享内存，只能读取
+        """
+        file_path = os.path.join(self.data_root, rel_path)
+        load_counter = get_metrics_registry().counter('data_store_loads_total', '数据镜像的加载次数，hit 表示直接使用内存中的结果', ('result',))
+        built = []
+
+        def build_dates(df: pd.DataFrame) -> tuple:
+            built.append(True)
+            parsed_dates = {date_col: parse_date_column(df[date_col], date_col) for date_col in find_date_columns(df)}
+            date_index = DateIndex.build(df, parsed_dates)
+            nbytes = sum(int(parsed.memory_usage(index=True, deep=True)) for parsed in parsed_dates.values())
+            if date_index is not None:
+                nbytes += date_index.dates.nbytes + date_index.rows.nbytes
+            return (parsed_dates, date_index), nbytes
+
+        df, (parsed_dates, date_index) = get_frame_cache().get_derived(file_path, 'dates', build_dates)
+        load_counter.inc(result='miss' if built else 'hit')
+        return df, parsed_dates, date_index
+
+    def as_of(self, start_date: str, end_date: str) -> 'AsOfDataView':
+        """
+        创建 [start_date, end_date] 范围内的只读数据视图
+
+        Args:
+            start_date: 开始日期 (格式: %Y%m%d) 包含
+            end_date: 结束日期 (格式: %Y%m%d) 包含
+        """
+        return AsOfDataView(self, start_date, end_date)
+
+
+class AsOfDataView:
+    """
+    按日期范围切片的数据视图
+
+    对外提供与读取 temp_data 目录等价的接口（read_csv / list_csv_files / exists），
+    但不写任何文件，不同请求之间互不影响。
+    """
+
+    def __init__(self, store: DataStore, start_date: str, end_date: str) -> None:
+        self.store = store
+        self.root = store.data_root
+        self.start_date = start_date
+        self.end_date = end_date
+        self.start_dt = datetime.strptime(start_date, '%Y%m%d')
+        self.end_dt = datetime.strptime(end_date, '%Y%m%d').replace(hour=23, minute=59, second=59)
+        # 相对路径 -> 切片结果，None 表示范围内无数据
+        self._slices: Dict[str, Optional[pd.DataFrame]] = {}
+
+    def _slice(self, rel_path: str) -> Optional[pd.DataFrame]:
+        if rel_path not in self._slices:
+            slice_histogram = get_metrics_registry().histogram('data_slice_duration_seconds', '按日期范围切片单个文件的耗时')
+            with slice_histogram.time():
+                self._slices[rel_path] = self._build_slice(rel_path)
+        return self._slices[rel_path]
+
+    def _build_slice(self, rel_path: str) -> Optional[pd.DataFrame]:
+        try:
+            df, parsed_dates, date_index = self.store.load(rel_path)
+        except (OSError, pd.errors.EmptyDataError):
+            return None
+        if date_index is not None:
+            # 单日期列的文件用二分查找定位范围内的行
+            rows = date_index.lookup(self.start_dt, self.end_dt)
+            if len(rows) == 0:
+                return None
+            return df.iloc[rows].drop_duplicates().reset_index(drop=True)
+        result_df = filter_df_by_date_range(df, self.start_dt, self.end_dt, parsed_dates)
+        if result_df is not None:
+            result_df = result_df.reset_index(drop=True)
+        return result_df
+
+    def read_csv(self, file_path: str) -> pd.DataFrame:
+        """
+        读取视图中的CSV数据，返回副本，调用方可以随意修改
+
+        Raises:
+            FileNotFoundError: 文件不存在或范围内无数据
+        """
+        df = self._slice(self.store.relpath(file_path))
+        if df is None:
+            raise FileNotFoundError(file_path)
+        return df.copy()
+
+    def exists(self, path: str) -> bool:
+        """
+        判断文件或目录在视图中是否存在
+        """
+        abs_path = os.path.abspath(path)
+        if os.path.isdir(abs_path):
+            return len(self.list_csv_files(abs_path)) > 0
+        return self._slice(self.store.relpath(abs_path)) is not None
+
+    def list_csv_files(self, directory: str) -> List[str]:
+        """
+        列出目录下在范围内有数据的CSV文件（绝对路径）
+        """
+        if not os.path.isdir(directory):
+            return []
+        return [os.path.join(self.root, rel_path) for rel_path in self.store.list_csv_files(directory)
+                if self._slice(rel_path) is not None]
+
+
+_stores: Dict[str, DataStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_data_store(data_root: str = None) -> DataStore:
+    """
+    获取进程内共享的数据镜像，同一目录只会创建一个
+
+    Args:
+        data_root: 数据根目录，默认 stock_prediction/data
+    """
+    data_root = os.path.abspath(data_root or os.path.join(root_dir, 'data'))
+    with _stores_lock:
+        if data_root not in _stores:
+            _stores[data_root] = DataStore(data_root)
+        return _stores[data_root]
@@ -0,0 +1,229 @@
+import io
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Optional
+
+
+INDEX_SUFFIX = '.dateidx.npz'
+INDEX_VERSION = 1
+
+
+def get_index_path(csv_path: str) -> str:
+    """
+    获取CSV文件对应的日期索引文件路径
+    """
+    return os.path.splitext(csv_path)[0] + INDEX_SUFFIX
+
+
+def find_row_offsets(data: bytes) -> np.ndarray:
+    """
+    计算CSV中每一行的起始字节位置，引号内的换行不算作行结束
+
+    Returns:
+        np.ndarray: 长度为 行数+1，第 i 行（含表头）占据 [offsets[i], offsets[i+1])
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == ord('\n'))
+    # 换行符之前出现偶数个引号，说明不在引号内
+    quote_counts = np.cumsum(buf == ord('"'))
+    row_ends = newlines[quote_counts[newlines] % 2 == 0] + 1
+    offsets = np.concatenate(([0], row_ends))
+    if offsets[-1] < len(buf):
+        # 最后一行没有换行符
+        offsets = np.append(offsets, len(buf))
+    return offsets.astype(np.int64)
+
+
+class DateIndex:
+    """
+    单个数据文件的日期索引
+
+    保存选定的日期列、按日期排序后的日期和对应的行号，以及每一行在文件中的字节位置，
+    任意 [start, end] 范围的切片都可以用二分查找定位，再只读取文件中对应的一段。
+    只有一个日期列的文件才建立索引，多个日期列的文件仍按原方式逐列筛选。
+    """
+
+    def __init__(self, date_column: str, dates: np.ndarray, rows: np.ndarray,
+                 row_offsets: Optional[np.ndarray] = None, dtypes: dict = None,
+                 source_mtime_ns: int = None, source_size: int = None) -> None:
+        """
+        Args:
+            date_column: 日期列名
+            dates: 排序后的日期（datetime64[ns] 的整数表示），不含无法解析的日期
+            rows: 与 dates 对应的行号（从 0 开始，不含表头）
+            row_offsets: 每一行的起始字节位置（第 0 个为表头），为 None 时不支持按段读取
+            dtypes: 整个文件解析后的列类型，按段读取时使用，保证与读取整个文件的结果一致
+            source_mtime_ns / source_size: 建立索引时源文件的修改时间和大小
+        """
+        self.date_column = date_column
+        self.dates = dates
+        self.rows = rows
+        self.row_offsets = row_offsets
+        self.dtypes = dtypes or {}
+        self.source_mtime_ns = source_mtime_ns
+        self.source_size = source_size
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, parsed_dates: dict = None) -> Optional['DateIndex']:
+        """
+        根据数据表建立内存中的日期索引
+
+        Args:
+            df: 数据表
+            parsed_dates: {日期列名: 已解析的日期列}，为 None 时现场解析
+
+        Returns:
+            DateIndex，日期列数量不是 1 时返回 None
+        """
+        # 延迟导入，避免与 data_api 循环导入
+        from .data_api import find_date_columns, parse_date_column
+        date_columns = find_date_columns(df)
+        if len(date_columns) != 1:
+            return None
+        date_column = date_columns[0]
+        if parsed_dates is not None and date_column in parsed_dates:
+            parsed = parsed_dates[date_column]
+        else:
+            parsed = parse_date_column(df[date_column], date_column)
+
+        values = parsed.to_numpy(dtype='datetime64[ns]')
+        valid_rows = np.flatnonzero(~np.isnat(values))
+        order = np.argsort(values[valid_rows], kind='stable')
+        rows = valid_rows[order].astype(np.int64)
+        return cls(date_column, values[rows].astype(np.int64), rows,
+                   dtypes={col: str(dtype) for col, dtype in df.dtypes.items()})
+
+    @classmethod
+    def build_for_file(cls, csv_path: str, df: pd.DataFrame = None) -> Optional['DateIndex']:
+        """
+        为CSV文件建立索引，包含每一行的字节位置
+
+        Args:
+            csv_path: CSV文件路径
+            df: 该文件完整读取后的数据表，为 None 时现场读取
+        """
+        stat = os.stat(csv_path)
+        if df is None:
+            df = pd.read_csv(csv_path, encoding='utf-8-sig', low_memory=False)
+        index = cls.build(df)
+        if index is None:
+            return None
+        with open(csv_path, 'rb') as f:
+            row_offsets = find_row_offsets(f.read())
+        # 行数对不上（如存在空行）时不支持按段读取，仍可用于定位行号
+        index.row_offsets = row_offsets if len(row_offsets) == len(df) + 2 else None
+        index.source_mtime_ns = stat.st_mtime_ns
+        index.source_size = stat.st_size
+        return index
+
+    def is_valid_for(self, csv_path: str) -> bool:
+        """
+        判断索引是否与当前文件内容对应
+        """
+        try:
+            stat = os.stat(csv_path)
+        except OSError:
+            return False
+        return stat.st_mtime_ns == self.source_mtime_ns and stat.st_size == self.source_size
+
+    def lookup(self, start_dt: datetime, end_dt: datetime) -> np.ndarray:
+        """
+        二分查找日期在 [start_dt, end_dt] 内的行号，按文件中的顺序返回
+        """
+        lo = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start_dt), 'ns').astype(np.int64), side='left')
+        hi = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end_dt), 'ns').astype(np.int64), side='right')
+        return np.sort(self.rows[lo:hi])
+
+    def read_rows(self, csv_path: str, rows: np.ndarray) -> pd.DataFrame:
+        """
+        只读取文件中包含指定行的一段，返回这些行（索引为原文件中的行号）
+        """
+        if self.row_offsets is None:
+            return pd.read_csv(csv_path, encoding='utf-8-sig', low_memory=False).iloc[rows]
+        first, last = int(rows[0]), int(rows[-1])
+        with open(csv_path, 'rb') as f:
+            header = f.read(int(self.row_offsets[1]))
+            f.seek(int(self.row_offsets[first + 1]))
+            body = f.read(int(self.row_offsets[last + 2] - self.row_offsets[first + 1]))
+        df = pd.read_csv(io.BytesIO(header + body), encoding='utf-8-sig', low_memory=False,
+                         dtype={col: dtype for col, dtype in self.dtypes.items() if dtype != 'bool'})
+        df.index = pd.RangeIndex(first, last + 1)
+        return df.loc[rows]
+
+    def read_range(self, csv_path: str, start_dt: datetime, end_dt: datetime) -> Optional[pd.DataFrame]:
+        """
+        读取日期在 [start_dt, end_dt] 内的行，结果与 filter_df_by_date_range 一致
+
+        Returns:
+            筛选后的数据表，范围内无数据时返回 None
+        """
+        rows = self.lookup(start_dt, end_dt)
+        if len(rows) == 0:
+            return None
+        return self.read_rows(csv_path, rows).drop_duplicates()
+
+    def save(self, index_path: str) -> None:
+        """
+        保存索引（原子写入）
+        """
+        meta = {
+            'version': INDEX_VERSION,
+            'date_column': self.date_column,
+            'dtypes': self.dtypes,
+            'source_mtime_ns': self.source_mtime_ns,
+            'source_size': self.source_size,
+        }
+        arrays = {'dates': self.dates, 'rows': self.rows, 'meta': np.array(json.dumps(meta, ensure_ascii=False))}
+        if self.row_offsets is not None:
+            arrays['row_offsets'] = self.row_offsets
+        tmp_path = f'{index_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, index_path)
+
+    @classmethod
+    def load(cls, index_path: str) -> Optional['DateIndex']:
+        """
+        读取索引文件，不存在或版本不符时返回 None
+        """
+        try:
+            with np.load(index_path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('version') != INDEX_VERSION:
+                    return None
+                return cls(meta['date_column'], data['dates'], data['rows'],
+                           data['row_offsets'] if 'row_offsets' in data.files else None,
+                           meta['dtypes'], meta['source_mtime_ns'], meta['source_size'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def build_date_index(csv_path: str, df: pd.DataFrame = None) -> Optional[DateIndex]:
+    """
+    为CSV文件建立并保存日期索引，通常在数据写入后调用
+
+    Returns:
+        DateIndex，文件不适合建立索引时返回 None 并删除旧索引
+    """
+    index_path = get_index_path(csv_path)
+    index = DateIndex.build_for_file(csv_path, df)
+    if index is None:
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        return None
+    index.save(index_path)
+    return index
+
+
+def get_date_index(csv_path: str) -> Optional[DateIndex]:
+    """
+    获取与CSV文件当前内容对应的日期索引，不存在或已失效时返回 None
+    """
+    index = DateIndex.load(get_index_path(csv_path))
+    if index is None or not index.is_valid_for(csv_path):
+        return None
+    return index
@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+from .storage import get_dataset_lock, read_table, write_atomic, root_dir
+from .manifest import file_content_hash
+from .indicators import INDICATOR_COLUMNS, CHECKPOINT_VERSION, add_technical_indicators, get_indicator_engine
+
+
+BASE_FEATURES = ['开盘', '收盘', '最高', '最低', '成交量', '成交额', '振幅', '涨跌幅', '涨跌额', '换手率']
+TECHNICAL_FEATURES = list(INDICATOR_COLUMNS)
+FEATURE_COLUMNS = BASE_FEATURES + TECHNICAL_FEATURES
+
+# 特征集定义，任何改动（包括指标算法版本）都会得到新的版本号，旧文件不再被读取
+FEATURE_SET = {
+    'name': 'daily',
+    'base': BASE_FEATURES,
+    'technical': TECHNICAL_FEATURES,
+    'indicator_version': CHECKPOINT_VERSION,
+    'dtype': 'float64',
+}
+FEATURE_SET_VERSION = hashlib.md5(json.dumps(FEATURE_SET, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+FEATURES_SUFFIX = '.features'
+
+
+def get_feature_path(csv_path: str) -> str:
+    """
+    获取日线文件对应的特征文件路径，文件名包含特征集版本
+    """
+    return f"{os.path.splitext(csv_path)[0]}{FEATURES_SUFFIX}.{FEATURE_SET_VERSION}.npz"
+
+
+class FeatureMatrix:
+    """
+    单只股票的特征矩阵：每个交易日一行，列为 FEATURE_COLUMNS
+    """
+
+    def __init__(self, dates: np.ndarray, values: np.ndarray, columns: List[str] = None) -> None:
+        """
+        Args:
+            dates: 交易日（datetime64[ns] 的整数表示）
+            values: 特征值，形状为 (交易日数, 特征数)
+            columns: 特征名称
+        """
+        self.dates = dates
+        self.values = values
+        self.columns = list(columns or FEATURE_COLUMNS)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        转换为数据表，日期列为 '%Y-%m-%d' 字符串，与日线CSV中的格式一致
+        """
+        df = pd.DataFrame(self.values, columns=self.columns)
+        df.insert(0, '日期', pd.to_datetime(self.dates).strftime('%Y-%m-%d'))
+        return df
+
+
+class FeatureStore:
+    """
+    按股票持久化的特征矩阵
+
+    特征由日线文件计算一次后以 npz 保存，记录特征集版本和源文件的内容哈希。
+    日线文件的修改时间和大小不变时直接读取；变化后先比较内容哈希，内容确实变化时
+    才重新生成（技术指标由 IndicatorEngine 增量计算）。
+    """
+
+    def __init__(self) -> None:
+        # 特征文件路径 -> (源文件 mtime, size, FeatureMatrix)
+        self._cache: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read(feature_path: str):
+        try:
+            with np.load(feature_path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('feature_set_version') != FEATURE_SET_VERSION:
+                    return None, None
+                return meta, FeatureMatrix(data['dates'], data['values'], meta['columns'])
+        except (OSError, ValueError, KeyError):
+            return None, None
+
+    @staticmethod
+    def _write(feature_path: str, matrix: FeatureMatrix, meta: dict) -> None:
+        def write(tmp_path: str) -> None:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, dates=matrix.dates, values=matrix.values,
+                         meta=np.array(json.dumps(meta, ensure_ascii=False)))
+
+        write_atomic(write, feature_path)
+
+    @staticmethod
+    def build(csv_path: str) -> FeatureMatrix:
+        """
+        由日线文件计算特征矩阵
+        """
+        df = read_table(csv_path, columns=['日期'] + BASE_FEATURES)
+        indicators = get_indicator_engine(csv_path).lookup(df['日期'])
+        if indicators is None:
+            raise ValueError(f"技术指标检查点与日线文件不一致: {csv_path}")
+        dates = pd.to_datetime(df['日期']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        values = np.hstack([df[BASE_FEATURES].to_numpy(dtype=np.float64), indicators])
+        return FeatureMatrix(dates, values)
+
+    def load(self, csv_path: str) -> FeatureMatrix:
+        """
+        读取日线文件对应的特征矩阵，不存在或已失效时重新生成
+        """
+        csv_path = os.path.abspath(csv_path)
+        feature_path = get_feature_path(csv_path)
+        stat = os.stat(csv_path)
+        with self._lock:
+            cached = self._cache.get(feature_path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        with get_dataset_lock(feature_path):
+            meta, matrix = self._read(feature_path)
+            if meta is None or (meta['source_mtime_ns'], meta['source_size']) != (stat.st_mtime_ns, stat.st_size):
+                source_hash = file_content_hash(csv_path)
+                if meta is None or meta['source_hash'] != source_hash:
+                    print(f"🔍 正在生成特征矩阵: {csv_path}")
+                    matrix = self.build(csv_path)
+                meta = {
+                    'feature_set_version': FEATURE_SET_VERSION,
+                    'feature_set': FEATURE_SET,
+                    'columns': matrix.columns,
+                    'source_hash': source_hash,
+                    'source_mtime_ns': stat.st_mtime_ns,
+                    'source_size': stat.st_size,
+                }
+                self._write(feature_path, matrix, meta)
+
+        with self._lock:
+            self._cache[feature_path] = (stat.st_mtime_ns, stat.st_size, matrix)
+        return matrix
+
+
+_feature_store = FeatureStore()
+
+
+def get_feature_store() -> FeatureStore:
+    """
+    获取进程内共享的特征存储
+    """
+    return _feature_store
+
+
+def load_features(csv_path: str) -> pd.DataFrame:
+    """
+    读取日线文件对应的特征表（日期 + FEATURE_COLUMNS），供训练、测试和预测使用
+    """
+    return _feature_store.load(csv_path).to_frame()
+
+
+def add_stored_features(df: pd.DataFrame, csv_path: str) -> pd.DataFrame:
+    """
+    按日期为日线数据添加特征存储中的技术指标列，日期不在存储中时现场计算
+    """
+    try:
+        matrix = _feature_store.load(csv_path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ 读取特征存储失败，改为直接计算: {csv_path} ({str(e)})")
+        return add_technical_indicators(df)
+
+    keys = pd.to_datetime(df['日期']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    index = pd.Index(matrix.dates)
+    if not index.is_unique:
+        return add_technical_indicators(df)
+    positions = index.get_indexer(keys)
+    if (positions < 0).any():
+        return add_technical_indicators(df)
+    offset = len(BASE_FEATURES)
+    for i, column in enumerate(TECHNICAL_FEATURES):
+        df[column] = matrix.values[positions, offset + i]
+    return df
+
+
+def build_directory(directory: str = None) -> int:
+    """
+    为目录下所有股票的日线文件生成特征矩阵
+
+    Returns:
+        int: 处理的文件数
+    """
+    directory = directory or os.path.join(root_dir, 'data')
+    built = 0
+    for root, _, files in os.walk(directory):
+        if '股票日线数据.csv' in files:
+            _feature_store.load(os.path.join(root, '股票日线数据.csv'))
+            built += 1
+    print(f"✅ 特征矩阵已就绪: {built} 个文件 (特征集版本 {FEATURE_SET_VERSION})")
+    return built
+
+
+if __name__ == '__main__':
+    # python -m stock_prediction.util.feature_store build [目录]
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'build':
+        build_directory(sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        print("用法: python -m stock_prediction.util.feature_store build [目录]")
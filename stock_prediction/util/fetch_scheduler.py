@@ -0,0 +1,104 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+
+class TokenBucketRateLimiter:
+    """
+    令牌桶限流器，多个线程共享，用于控制对上游接口的请求频率
+    """
+
+    def __init__(self, rate: float = 1.0, capacity: float = 2.0) -> None:
+        """
+        Args:
+            rate: 每秒补充的令牌数，即长期平均请求速率
+            capacity: 桶容量，即允许的最大突发请求数
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        获取令牌，令牌不足时阻塞等待
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait_time = (tokens - self._tokens) / self.rate
+            time.sleep(wait_time)
+            waited += wait_time
+
+
+class FetchScheduler:
+    """
+    有界并发的数据拉取调度器
+
+    任务在固定大小的线程池中执行，请求频率由共享的令牌桶控制，
+    执行结束后汇总每个数据集的耗时和失败情况。
+    """
+
+    def __init__(self, max_workers: int = 4, name: str = 'fetch') -> None:
+        self.max_workers = max_workers
+        self.name = name
+        self._tasks = []
+
+    def submit(self, dataset: str, func: Callable, *args, **kwargs) -> None:
+        """
+        添加拉取任务
+
+        Args:
+            dataset: 数据集名称，用于汇总报告
+            func: 拉取函数，返回 False 视为失败，抛出异常同样视为失败
+        """
+        self._tasks.append((dataset, func, args, kwargs))
+
+    @staticmethod
+    def _run_task(dataset: str, func: Callable, args: tuple, kwargs: dict) -> dict:
+        start_time = time.time()
+        error = None
+        try:
+            ok = func(*args, **kwargs) is not False
+        except Exception as e:
+            ok = False
+            error = str(e)
+        return {
+            'dataset': dataset,
+            'ok': ok,
+            'latency': time.time() - start_time,
+            'error': error,
+        }
+
+    def run(self) -> List[dict]:
+        """
+        执行所有任务并打印汇总报告
+
+        Returns:
+            List[dict]: 每个数据集的 {'dataset', 'ok', 'latency', 'error'}，顺序与提交顺序一致
+        """
+        tasks, self._tasks = self._tasks, []
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name) as executor:
+            futures = [executor.submit(self._run_task, *task) for task in tasks]
+            results = [future.result() for future in futures]
+        total_time = time.time() - start_time
+
+        failed = [result for result in results if not result['ok']]
+        print(f"📊 {self.name} 拉取完成: {len(results)} 个数据集, 失败 {len(failed)} 个, 总耗时 {total_time:.2f}秒")
+        for result in sorted(results, key=lambda r: r['latency'], reverse=True):
+            status = '✅' if result['ok'] else '❌'
+            detail = f" ({result['error']})" if result['error'] else ''
+            print(f"  {status} {result['dataset']}: {result['latency']:.2f}秒{detail}")
+        return results
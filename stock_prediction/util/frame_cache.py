@@ -0,0 +1,202 @@
+import os
+import threading
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+from .storage import find_columnar_file, read_table
+from .metrics import get_metrics_registry
+
+
+# 缓存占用内存的默认上限（MB），可通过环境变量 FRAME_CACHE_MAX_MB 调整，取值不大于 0 表示不缓存
+DEFAULT_FRAME_CACHE_MB = 512
+
+
+def get_frame_cache_limit() -> int:
+    """
+    获取缓存的内存上限（字节）
+    """
+    return int(float(os.environ.get('FRAME_CACHE_MAX_MB', DEFAULT_FRAME_CACHE_MB)) * 1024 * 1024)
+
+
+def get_file_identity(csv_path: str) -> tuple:
+    """
+    数据文件的标识：CSV 和（存在时）对应列式文件的修改时间与大小，任一变化即视为新文件
+
+    Raises:
+        FileNotFoundError: CSV和列式文件都不存在
+    """
+    identity = ()
+    if os.path.exists(csv_path):
+        stat = os.stat(csv_path)
+        identity += (stat.st_mtime_ns, stat.st_size)
+    found = find_columnar_file(csv_path)
+    if found is not None:
+        stat = os.stat(found[0])
+        identity += (found[0], stat.st_mtime_ns, stat.st_size)
+    if not identity:
+        raise FileNotFoundError(csv_path)
+    return identity
+
+
+class FrameCache:
+    """
+    进程内解析结果的 LRU 缓存
+
+    以 (文件路径, 修改时间, 大小) 为键缓存整个数据表，同一文件在一次请求内被多个读取函数读取、
+    或在多次请求之间重复读取时只解析一次。总内存超过上限时淘汰最久未使用的数据表。
+    get() 返回数据表的深拷贝，调用方可以随意修改；由数据表派生的结果（如日期解析结果）
+    可以通过 get_derived() 挂在同一条缓存上，占用的内存计入同一上限，并随数据表一起淘汰。
+    """
+
+    def __init__(self, max_bytes: int = None) -> None:
+        self.max_bytes = get_frame_cache_limit() if max_bytes is None else max_bytes
+        # 文件绝对路径 -> [文件标识, DataFrame, 占用字节数, {派生结果名: 派生结果}]
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+        metrics = get_metrics_registry()
+        self._requests = metrics.counter('frame_cache_requests_total', '数据表缓存的读取次数，hit 表示直接使用缓存', ('result',))
+        self._evictions = metrics.counter('frame_cache_evictions_total', '超出内存上限被淘汰的数据表数量')
+        self._bytes = metrics.gauge('frame_cache_bytes', '数据表缓存当前占用的内存（估算）')
+
+    def _lookup(self, csv_path: str) -> Tuple[str, tuple, pd.DataFrame]:
+        """
+        获取缓存中的数据表（与缓存共享内存，不能修改），未命中时读取文件
+
+        Returns:
+            (文件绝对路径, 文件标识, DataFrame)
+        """
+        file_path = os.path.abspath(csv_path)
+        identity = get_file_identity(file_path)
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and entry[0] == identity:
+                self._entries.move_to_end(file_path)
+                self.hits += 1
+                self._requests.inc(result='hit')
+                return file_path, identity, entry[1]
+            self.misses += 1
+            self._requests.inc(result='miss')
+
+        df = read_table(file_path)
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes <= self.max_bytes:
+            with self._lock:
+                self._remove(file_path)
+                self._entries[file_path] = [identity, df, nbytes, {}]
+                self.bytes += nbytes
+                self._evict()
+                self._bytes.set(self.bytes)
+        return file_path, identity, df
+
+    def get(self, csv_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        读取数据文件，文件未变化时直接使用缓存中的数据表
+
+        Args:
+            csv_path: CSV文件路径
+            columns: 只返回指定的列，None 表示全部
+
+        Returns:
+            pd.DataFrame: 缓存数据表的副本，修改它不会影响缓存
+        """
+        _, _, df = self._lookup(csv_path)
+        return (df[list(columns)] if columns is not None else df).copy()
+
+    def get_derived(self, csv_path: str, name: str,
+                    build: Callable[[pd.DataFrame], Tuple[Any, int]]) -> Tuple[pd.DataFrame, Any]:
+        """
+        获取数据表及由它派生的结果，派生结果随数据表一起缓存和淘汰
+
+        Args:
+            csv_path: CSV文件路径
+            name: 派生结果名
+            build: 根据数据表计算派生结果，返回 (派生结果, 占用字节数)
+
+        Returns:
+            (DataFrame, 派生结果)，其中 DataFrame 与缓存共享内存，调用方只能读取不能修改
+        """
+        file_path, identity, df = self._lookup(csv_path)
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and entry[0] == identity and name in entry[3]:
+                return df, entry[3][name]
+
+        derived, nbytes = build(df)
+        with self._lock:
+            entry = self._entries.get(file_path)
+            # 数据表已被淘汰或文件已更新时不再缓存派生结果
+            if entry is not None and entry[0] == identity and entry[1] is df and name not in entry[3]:
+                entry[3][name] = derived
+                entry[2] += nbytes
+                self.bytes += nbytes
+                self._evict()
+                self._bytes.set(self.bytes)
+        return df, derived
+
+    def _remove(self, file_path: str) -> None:
+        entry = self._entries.pop(file_path, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def _evict(self) -> None:
+        while self.bytes > self.max_bytes and self._entries:
+            _, (_, _, nbytes, _) = self._entries.popitem(last=False)
+            self.bytes -= nbytes
+            self.evictions += 1
+            self._evictions.inc()
+
+    def invalidate(self, csv_path: str = None) -> None:
+        """
+        移除指定文件的缓存，不指定时清空缓存
+        """
+        with self._lock:
+            if csv_path is None:
+                self._entries.clear()
+                self.bytes = 0
+            else:
+                self._remove(os.path.abspath(csv_path))
+            self._bytes.set(self.bytes)
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            {'entries', 'bytes', 'max_bytes', 'hits', 'misses', 'evictions'}
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_frame_cache = FrameCache()
+
+
+def get_frame_cache() -> FrameCache:
+    """
+    获取进程内共享的数据表缓存
+    """
+    return _frame_cache
+
+
+def read_frame(csv_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    通过进程内缓存读取数据文件（存在有效的列式文件时优先读取列式文件）
+
+    Args:
+        csv_path: CSV文件路径
+        columns: 只返回指定的列，None 表示全部
+
+    Raises:
+        FileNotFoundError: CSV和列式文件都不存在
+    """
+    return _frame_cache.get(csv_path, columns)
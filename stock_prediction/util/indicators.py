@@ -0,0 +1,344 @@
+import os
+import json
+import math
+import threading
+import numpy as np
+import pandas as pd
+from collections import deque
+from typing import Dict, Optional
+from .storage import get_dataset_lock, write_atomic
+from .date_index import get_date_index
+
+
+# 与 calculate_technical_indicators 的列及顺序一致
+INDICATOR_COLUMNS = ['MA5', 'MA10', 'MA20', 'RSI', 'MACD', 'Signal', 'BB_middle', 'BB_upper', 'BB_lower',
+                     'Price_Change', 'Volume_Change', 'Volatility', 'Momentum', 'VWAP', 'Price_MA_Ratio', 'Volume_MA_Ratio']
+
+CHECKPOINT_SUFFIX = '.indicators.npz'
+CHECKPOINT_VERSION = 1
+
+RSI_WINDOW = 14
+LONG_WINDOW = 20
+MOMENTUM_PERIODS = 10
+
+
+def _div(a: float, b: float) -> float:
+    """
+    与 pandas 一致的除法：除以 0 得到 ±inf，0/0 得到 NaN
+    """
+    if math.isnan(a) or math.isnan(b):
+        return math.nan
+    if b == 0:
+        return math.nan if a == 0 else math.copysign(math.inf, a)
+    return a / b
+
+
+def _window_mean(values: deque, window: int) -> float:
+    if len(values) < window:
+        return math.nan
+    return math.fsum(list(values)[-window:]) / window
+
+
+class IndicatorState:
+    """
+    单只股票技术指标的滚动状态
+
+    只保存计算下一根K线所需的最少状态：最近20根收盘价和成交量、最近14个涨跌幅度、
+    三条EWM的当前值和VWAP的累计和。每根新K线的更新只涉及固定长度的窗口，与历史长度无关，
+    结果与 calculate_technical_indicators 对整段历史的计算一致（浮点误差范围内）。
+    """
+
+    def __init__(self) -> None:
+        self.closes = deque(maxlen=LONG_WINDOW)
+        self.volumes = deque(maxlen=LONG_WINDOW)
+        self.gains = deque(maxlen=RSI_WINDOW)
+        self.losses = deque(maxlen=RSI_WINDOW)
+        self.ema12 = None
+        self.ema26 = None
+        self.signal = None
+        self.cum_price_volume = 0.0
+        self.cum_volume = 0.0
+        self.count = 0
+
+    @staticmethod
+    def _ewm(previous: Optional[float], value: float, span: int) -> float:
+        # ewm(adjust=False) 的递推形式，以第一个值为初值
+        if previous is None:
+            return value
+        alpha = 2 / (span + 1)
+        return alpha * value + (1 - alpha) * previous
+
+    def update(self, close: float, volume: float) -> tuple:
+        """
+        加入一根新K线
+
+        Returns:
+            按 INDICATOR_COLUMNS 顺序排列的指标值
+        """
+        close = float(close)
+        volume = float(volume)
+        prev_close = self.closes[-1] if self.closes else math.nan
+        prev_volume = self.volumes[-1] if self.volumes else math.nan
+
+        # 与 delta.where(delta > 0, 0) 一致，第一根K线的涨跌记为0
+        delta = close - prev_close
+        self.gains.append(delta if delta > 0 else 0.0)
+        self.losses.append(-delta if delta < 0 else 0.0)
+        momentum_base = self.closes[-MOMENTUM_PERIODS] if len(self.closes) >= MOMENTUM_PERIODS else math.nan
+        self.closes.append(close)
+        self.volumes.append(volume)
+        self.count += 1
+
+        ma5 = _window_mean(self.closes, 5)
+        ma10 = _window_mean(self.closes, 10)
+        ma20 = _window_mean(self.closes, LONG_WINDOW)
+
+        rsi = math.nan
+        if len(self.gains) == RSI_WINDOW:
+            rs = _div(math.fsum(self.gains) / RSI_WINDOW, math.fsum(self.losses) / RSI_WINDOW)
+            rsi = 100 - _div(100, 1 + rs) if not math.isinf(rs) else 100.0
+
+        self.ema12 = self._ewm(self.ema12, close, 12)
+        self.ema26 = self._ewm(self.ema26, close, 26)
+        macd = self.ema12 - self.ema26
+        self.signal = self._ewm(self.signal, macd, 9)
+
+        std20 = math.nan
+        if len(self.closes) == LONG_WINDOW:
+            std20 = math.sqrt(math.fsum((value - ma20) ** 2 for value in self.closes) / (LONG_WINDOW - 1))
+
+        self.cum_price_volume += close * volume
+        self.cum_volume += volume
+
+        return (
+            ma5, ma10, ma20, rsi, macd, self.signal,
+            ma20, ma20 + 2 * std20, ma20 - 2 * std20,
+            _div(close, prev_close) - 1, _div(volume, prev_volume) - 1,
+            std20, _div(close, momentum_base) - 1,
+            _div(self.cum_price_volume, self.cum_volume),
+            _div(close, ma20), _div(volume, _window_mean(self.volumes, LONG_WINDOW)),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'closes': list(self.closes), 'volumes': list(self.volumes),
+            'gains': list(self.gains), 'losses': list(self.losses),
+            'ema12': self.ema12, 'ema26': self.ema26, 'signal': self.signal,
+            'cum_price_volume': self.cum_price_volume, 'cum_volume': self.cum_volume, 'count': self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'IndicatorState':
+        state = cls()
+        state.closes.extend(data['closes'])
+        state.volumes.extend(data['volumes'])
+        state.gains.extend(data['gains'])
+        state.losses.extend(data['losses'])
+        state.ema12, state.ema26, state.signal = data['ema12'], data['ema26'], data['signal']
+        state.cum_price_volume, state.cum_volume = data['cum_price_volume'], data['cum_volume']
+        state.count = data['count']
+        return state
+
+
+def compute_indicator_values(df: pd.DataFrame, state: IndicatorState = None) -> np.ndarray:
+    """
+    逐根K线推进状态，计算数据表每一行的指标
+
+    Returns:
+        np.ndarray: 形状为 (行数, 指标数)
+    """
+    state = state or IndicatorState()
+    closes = df['收盘'].to_numpy(dtype=float)
+    volumes = df['成交量'].to_numpy(dtype=float)
+    values = np.empty((len(df), len(INDICATOR_COLUMNS)))
+    for i in range(len(df)):
+        values[i] = state.update(closes[i], volumes[i])
+    return values
+
+
+def get_checkpoint_path(csv_path: str) -> str:
+    """
+    获取日线文件对应的指标检查点路径
+    """
+    return os.path.splitext(csv_path)[0] + CHECKPOINT_SUFFIX
+
+
+class IndicatorEngine:
+    """
+    单个日线文件的增量指标引擎
+
+    检查点保存每一行的日期和指标值，以及最后一根K线之后的滚动状态。
+    文件更新后只读取新增的行（有日期索引时只读取文件尾部）并逐根推进；
+    如果最后一根已处理K线的价格发生变化（如复权调整），则整体重算。
+    """
+
+    def __init__(self, csv_path: str) -> None:
+        self.csv_path = csv_path
+        self.checkpoint_path = get_checkpoint_path(csv_path)
+        self.dates = np.empty(0, dtype=np.int64)
+        self.values = np.empty((0, len(INDICATOR_COLUMNS)))
+        self.state = IndicatorState()
+        self.last_bar = None
+        self.source_mtime_ns = None
+        self.source_size = None
+
+    def is_current(self, stat: os.stat_result) -> bool:
+        return stat.st_mtime_ns == self.source_mtime_ns and stat.st_size == self.source_size
+
+    def load(self) -> bool:
+        """
+        读取检查点，不存在或版本不符时返回 False
+        """
+        try:
+            with np.load(self.checkpoint_path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('version') != CHECKPOINT_VERSION:
+                    return False
+                self.dates = data['dates']
+                self.values = data['values']
+        except (OSError, ValueError, KeyError):
+            return False
+        self.state = IndicatorState.from_dict(meta['state'])
+        self.last_bar = meta['last_bar']
+        self.source_mtime_ns = meta['source_mtime_ns']
+        self.source_size = meta['source_size']
+        return True
+
+    def save(self) -> None:
+        """
+        保存检查点（原子写入）
+        """
+        meta = {
+            'version': CHECKPOINT_VERSION,
+            'state': self.state.to_dict(),
+            'last_bar': self.last_bar,
+            'source_mtime_ns': self.source_mtime_ns,
+            'source_size': self.source_size,
+        }
+
+        def write(tmp_path: str) -> None:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, dates=self.dates, values=self.values, meta=np.array(json.dumps(meta)))
+
+        write_atomic(write, self.checkpoint_path)
+
+    def _append(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        values = compute_indicator_values(df, self.state)
+        dates = pd.to_datetime(df['日期']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        self.dates = np.concatenate([self.dates, dates])
+        self.values = np.concatenate([self.values, values])
+        last = df.iloc[-1]
+        self.last_bar = [int(dates[-1]), float(last['收盘']), float(last['成交量'])]
+
+    def rebuild(self, df: pd.DataFrame) -> None:
+        """
+        从头计算整个文件的指标
+        """
+        self.dates = np.empty(0, dtype=np.int64)
+        self.values = np.empty((0, len(INDICATOR_COLUMNS)))
+        self.state = IndicatorState()
+        self.last_bar = None
+        self._append(df)
+
+    def _read_new_rows(self) -> Optional[pd.DataFrame]:
+        """
+        读取上次处理之后新增的行
+
+        Returns:
+            新增的行（可能为空），已处理的最后一根K线发生变化或无法定位时返回 None
+        """
+        last_date, last_close, last_volume = self.last_bar
+        date_index = get_date_index(self.csv_path)
+        if date_index is not None and date_index.date_column == '日期':
+            rows = date_index.lookup(pd.Timestamp(last_date), pd.Timestamp.max)
+            # 必须从已处理的最后一行开始且连续
+            if len(rows) == 0 or rows[0] != self.state.count - 1 or rows[-1] - rows[0] + 1 != len(rows):
+                return None
+            tail = date_index.read_rows(self.csv_path, rows)
+        else:
+            df = pd.read_csv(self.csv_path, encoding='utf-8-sig', low_memory=False)
+            if len(df) < self.state.count:
+                return None
+            tail = df.iloc[self.state.count - 1:]
+        first = tail.iloc[0]
+        if (pd.Timestamp(first['日期']).value != last_date or float(first['收盘']) != last_close
+                or float(first['成交量']) != last_volume):
+            return None
+        return tail.iloc[1:]
+
+    def sync(self) -> None:
+        """
+        使检查点与日线文件保持一致
+        """
+        stat = os.stat(self.csv_path)
+        if self.is_current(stat):
+            return
+        if self.source_mtime_ns is None:
+            self.load()
+            if self.is_current(stat):
+                return
+
+        new_rows = self._read_new_rows() if self.last_bar is not None else None
+        if new_rows is None:
+            self.rebuild(pd.read_csv(self.csv_path, encoding='utf-8-sig', low_memory=False))
+        else:
+            self._append(new_rows)
+        self.source_mtime_ns = stat.st_mtime_ns
+        self.source_size = stat.st_size
+        self.save()
+
+    def lookup(self, dates: pd.Series) -> Optional[np.ndarray]:
+        """
+        取指定日期的指标
+
+        Returns:
+            np.ndarray: 形状为 (len(dates), 指标数)，有日期不在检查点中时返回 None
+        """
+        keys = pd.to_datetime(dates).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        positions = np.searchsorted(self.dates, keys)
+        if len(positions) and (positions.max() >= len(self.dates) or (self.dates[positions] != keys).any()):
+            return None
+        return self.values[positions]
+
+
+_engines: Dict[str, IndicatorEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_indicator_engine(csv_path: str) -> IndicatorEngine:
+    """
+    获取日线文件对应的指标引擎（进程内复用），并同步到文件的最新内容
+    """
+    csv_path = os.path.abspath(csv_path)
+    with _engines_lock:
+        engine = _engines.setdefault(csv_path, IndicatorEngine(csv_path))
+    with get_dataset_lock(engine.checkpoint_path):
+        engine.sync()
+    return engine
+
+
+def add_technical_indicators(df: pd.DataFrame, csv_path: str = None) -> pd.DataFrame:
+    """
+    为日线数据添加技术指标列
+
+    传入 csv_path 且 df 的日期都在该文件中时，直接取检查点中的指标，文件有新增K线时只增量计算新增部分；
+    否则对 df 逐根计算一遍。基于整个文件计算的指标只依赖当天及之前的数据，
+    不受 df 截取起点的影响。
+
+    Args:
+        df: 日线数据，需包含 日期、收盘、成交量 列
+        csv_path: 日线文件路径
+    """
+    values = None
+    if csv_path is not None and os.path.exists(csv_path):
+        try:
+            values = get_indicator_engine(csv_path).lookup(df['日期'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ 读取指标检查点失败，改为直接计算: {csv_path} ({str(e)})")
+    if values is None:
+        values = compute_indicator_values(df)
+    for i, column in enumerate(INDICATOR_COLUMNS):
+        df[column] = values[:, i]
+    return df
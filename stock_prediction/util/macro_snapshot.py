@@ -0,0 +1,194 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+from .prompt_format import format_kv_rows
+
+
+SNAPSHOT_DB_NAME = '最新数据快照.db'
+
+
+class MacroSnapshotStore:
+    """
+    宏观数据最新值的物化快照
+
+    目录下每个CSV在拉取后解析一次：每个日期只保留第一行，预先格式化为提示词文本，
+    存入 SQLite 并按 (数据集, 日期) 建立索引。查询任意日期的最新值只需一次 SQL，
+    不再在每次请求时逐行解析所有文件。没有日期列的文件只保存最后一行，任何日期都返回该行。
+    """
+
+    def __init__(self, directory: str, db_path: str = None) -> None:
+        self.directory = os.path.abspath(directory)
+        self.db_path = db_path or os.path.join(self.directory, SNAPSHOT_DB_NAME)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sources ('
+                'dataset TEXT PRIMARY KEY, title TEXT, mtime_ns INTEGER, size INTEGER, updated_at REAL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS latest_rows ('
+                'dataset TEXT, position INTEGER, data_date TEXT, content TEXT, PRIMARY KEY (dataset, position))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_latest_rows_date ON latest_rows (dataset, data_date)')
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        打开数据库连接，正常退出时提交、异常时回滚，最后关闭连接
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def list_csv_files(self) -> Dict[str, str]:
+        """
+        列出目录下的CSV文件
+
+        Returns:
+            {数据集（相对路径）: 文件绝对路径}
+        """
+        csv_files = {}
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                if file.lower().endswith('.csv'):
+                    file_path = os.path.join(root, file)
+                    csv_files[os.path.relpath(file_path, self.directory).replace(os.sep, '/')] = file_path
+        return csv_files
+
+    @staticmethod
+    def build_rows(df: pd.DataFrame) -> List[tuple]:
+        """
+        计算需要物化的行
+
+        Returns:
+            [(行号, 日期文本或None, 格式化后的内容)]
+        """
+        # 延迟导入，避免与 data_api 循环导入
+        from .data_api import find_date_columns, parse_date_column
+        if df.empty:
+            return []
+        date_columns = find_date_columns(df)
+        dates = parse_date_column(df[date_columns[0]], date_columns[0]) if date_columns else None
+        if dates is None or dates.isna().all():
+            # 没有可用的日期时使用最后一行
+            return [(len(df) - 1, None, format_kv_rows(df.iloc[-1].to_frame().T, decimals=2)[0])]
+
+        # 每个日期只保留第一行
+        dated = pd.DataFrame({'position': range(len(df)), 'date': dates.values}).dropna(subset=['date'])
+        first_rows = dated.drop_duplicates(subset='date', keep='first')
+        contents = format_kv_rows(df.iloc[first_rows['position'].to_numpy()], decimals=2)
+        return [(int(position), date.strftime('%Y-%m-%d %H:%M:%S'), content)
+                for position, date, content in zip(first_rows['position'], first_rows['date'], contents)]
+
+    def refresh_dataset(self, dataset: str, file_path: str) -> None:
+        """
+        重新物化单个数据集
+        """
+        stat = os.stat(file_path)
+        df = pd.read_csv(file_path, encoding='utf-8-sig', low_memory=False)
+        rows = self.build_rows(df)
+        title = os.path.splitext(os.path.basename(file_path))[0]
+        with self._connect() as conn:
+            conn.execute('DELETE FROM latest_rows WHERE dataset = ?', (dataset,))
+            conn.executemany(
+                'INSERT INTO latest_rows (dataset, position, data_date, content) VALUES (?, ?, ?, ?)',
+                [(dataset, position, data_date, content) for position, data_date, content in rows]
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO sources (dataset, title, mtime_ns, size, updated_at) VALUES (?, ?, ?, ?, ?)',
+                (dataset, title, stat.st_mtime_ns, stat.st_size, time.time())
+            )
+
+    def sync(self) -> int:
+        """
+        同步快照与目录中的文件：新增或变化的文件重新物化，已删除的文件移除
+
+        Returns:
+            int: 重新物化的数据集数量
+        """
+        with self._lock:
+            csv_files = self.list_csv_files()
+            with self._connect() as conn:
+                known = {dataset: (mtime_ns, size) for dataset, mtime_ns, size
+                         in conn.execute('SELECT dataset, mtime_ns, size FROM sources')}
+                for dataset in set(known) - set(csv_files):
+                    conn.execute('DELETE FROM latest_rows WHERE dataset = ?', (dataset,))
+                    conn.execute('DELETE FROM sources WHERE dataset = ?', (dataset,))
+
+            refreshed = 0
+            for dataset, file_path in csv_files.items():
+                stat = os.stat(file_path)
+                if known.get(dataset) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                try:
+                    self.refresh_dataset(dataset, file_path)
+                    refreshed += 1
+                except (OSError, ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+                    print(f"❌ 物化宏观数据 {dataset} 时出错: {str(e)}")
+            return refreshed
+
+    def query(self, end_dt: Optional[datetime] = None, start_dt: Optional[datetime] = None) -> List[tuple]:
+        """
+        查询每个数据集在 [start_dt, end_dt] 内最新的一行
+
+        Args:
+            end_dt: 截止时间（包含），None 表示不限制
+            start_dt: 开始时间（包含），None 表示不限制
+
+        Returns:
+            [(标题, 格式化后的内容)]，按数据集路径排序
+        """
+        end_text = end_dt.strftime('%Y-%m-%d %H:%M:%S') if end_dt is not None else '9999-12-31 23:59:59'
+        start_text = start_dt.strftime('%Y-%m-%d %H:%M:%S') if start_dt is not None else ''
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT s.title, r.content FROM ('
+                '  SELECT dataset, content, ROW_NUMBER() OVER ('
+                '    PARTITION BY dataset ORDER BY data_date DESC, position ASC) AS rank_in_dataset'
+                '  FROM latest_rows'
+                '  WHERE data_date IS NULL OR (data_date >= ? AND data_date <= ?)'
+                ') r JOIN sources s ON s.dataset = r.dataset'
+                ' WHERE r.rank_in_dataset = 1 ORDER BY r.dataset',
+                (start_text, end_text)
+            ).fetchall()
+
+    def get_latest_rows(self, end_dt: Optional[datetime] = None, start_dt: Optional[datetime] = None) -> List[tuple]:
+        """
+        同步后查询各数据集的最新值
+
+        Returns:
+            [(标题, 格式化后的内容)]
+        """
+        self.sync()
+        return self.query(end_dt, start_dt)
+
+    def get_latest_text(self, end_dt: Optional[datetime] = None, start_dt: Optional[datetime] = None) -> str:
+        """
+        获取所有数据集最新值拼接后的提示词文本
+        """
+        return "\n".join(f"{title}:\n{content}\n" for title, content in self.get_latest_rows(end_dt, start_dt))
+
+
+_stores: Dict[str, MacroSnapshotStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_macro_snapshot_store(directory: str) -> MacroSnapshotStore:
+    """
+    获取目录对应的快照存储，同一目录只会创建一个
+    """
+    directory = os.path.abspath(directory)
+    with _stores_lock:
+        if directory not in _stores:
+            _stores[directory] = MacroSnapshotStore(directory)
+        return _stores[directory]
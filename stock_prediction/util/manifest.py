@@ -0,0 +1,255 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, List
+
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 刷新策略
+REFRESH_POLICIES = ('hourly', 'daily', 'weekly', 'monthly', 'quarterly', 'on_release')
+
+# 按文件名（不含扩展名）指定的默认刷新策略，未列出的数据集沿用 max_age_days
+DATASET_POLICIES = {
+    # 个股数据
+    '股票新闻数据': 'hourly',
+    '个股研报': 'daily',
+    '业绩报表': 'on_release',
+    '主营介绍': 'quarterly',
+    '主营构成': 'on_release',
+    '基本面数据关键指标': 'on_release',
+    # 宏观数据按发布节奏更新
+    '宏观杠杆率数据': 'on_release',
+    '企业商品价格指数数据': 'on_release',
+    '外商直接投资数据': 'on_release',
+    'LPR品种数据': 'on_release',
+    '城镇调查失业率': 'on_release',
+    '社会融资规模增量统计': 'on_release',
+    '中国GDP年率': 'on_release',
+    '中国CPI年率报告': 'on_release',
+    '中国CPI月率报告': 'on_release',
+    '中国PPI年率报告': 'on_release',
+    '以美元计算的出口年率': 'on_release',
+    '以美元计算的进口年率': 'on_release',
+    '以美元计算的贸易帐（亿美元）': 'on_release',
+    '工业增加值增长': 'on_release',
+    '制造业PMI': 'on_release',
+    '非制造业PMI': 'on_release',
+    '外汇储备（亿美元）': 'on_release',
+    'M2货币供应年率': 'on_release',
+    '企业景气及企业家信心指数': 'on_release',
+    '居民消费价格指数': 'on_release',
+    '国内生产总值': 'on_release',
+    '货币供应量': 'on_release',
+    '人民币汇率中间价': 'daily',
+}
+
+
+def get_default_policy(file_path: str) -> Optional[str]:
+    """
+    获取数据集的默认刷新策略
+    """
+    return DATASET_POLICIES.get(os.path.splitext(os.path.basename(file_path))[0])
+
+
+def file_content_hash(file_path: str) -> str:
+    """
+    计算文件内容的 md5
+    """
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def is_policy_stale(policy: str, last_fetch: datetime, now: datetime,
+                    last_data_date: Optional[datetime] = None, data_interval_days: Optional[float] = None) -> bool:
+    """
+    按刷新策略判断数据是否过期
+
+    Args:
+        policy: 刷新策略
+        last_fetch: 上次拉取时间
+        now: 当前时间
+        last_data_date: 数据中最新的日期
+        data_interval_days: 数据相邻两期的间隔天数
+    """
+    if policy == 'hourly':
+        return now - last_fetch >= timedelta(hours=1)
+    if policy == 'daily':
+        return last_fetch.date() < now.date()
+    if policy == 'weekly':
+        return now - last_fetch >= timedelta(days=7)
+    if policy == 'monthly':
+        return (last_fetch.year, last_fetch.month) < (now.year, now.month)
+    if policy == 'quarterly':
+        return (last_fetch.year, (last_fetch.month - 1) // 3) < (now.year, (now.month - 1) // 3)
+    if policy == 'on_release':
+        # 同一天内不重复检查
+        if last_fetch.date() >= now.date():
+            return False
+        if last_data_date is None or not data_interval_days:
+            return (last_fetch.year, last_fetch.month) < (now.year, now.month)
+        # 下一期数据通常在一个统计周期结束后再经过一个周期左右发布
+        expected_release = last_data_date + timedelta(days=2 * data_interval_days)
+        if now >= expected_release and last_fetch < expected_release:
+            return True
+        # 发布推迟或数据源停更时，至少每个周期重新检查一次
+        return now - last_fetch >= timedelta(days=data_interval_days)
+    raise ValueError(f"未知的刷新策略: {policy}")
+
+
+class DatasetManifest:
+    """
+    数据集清单
+
+    记录每个数据集的上次拉取时间、行数、内容哈希、最新数据日期和刷新策略，
+    用于替代仅凭文件修改时间判断是否过期。
+    """
+
+    def __init__(self, manifest_path: str = None, data_root: str = None) -> None:
+        self.data_root = os.path.abspath(data_root or os.path.join(root_dir, 'data'))
+        self.manifest_path = manifest_path or os.path.join(self.data_root, 'manifest.json')
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = f'{self.manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def key(self, file_path: str) -> str:
+        """
+        数据集在清单中的键，即相对数据根目录的路径
+        """
+        return os.path.relpath(os.path.abspath(file_path), self.data_root).replace(os.sep, '/')
+
+    def get(self, file_path: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(self.key(file_path))
+            return dict(entry) if entry else None
+
+    def record(self, file_path: str, row_count: int, policy: str = None,
+               last_data_date: Optional[datetime] = None, data_interval_days: Optional[float] = None) -> dict:
+        """
+        记录一次成功的拉取
+
+        Returns:
+            dict: 清单条目，changed 字段表示内容是否与上次不同
+        """
+        content_hash = file_content_hash(file_path)
+        with self._lock:
+            previous = self._entries.get(self.key(file_path), {})
+            entry = {
+                'last_fetch': time.time(),
+                'row_count': int(row_count),
+                'content_hash': content_hash,
+                'last_data_date': last_data_date.strftime('%Y-%m-%d') if last_data_date is not None else None,
+                'data_interval_days': data_interval_days,
+                'policy': policy or previous.get('policy'),
+                'changed': previous.get('content_hash') != content_hash,
+            }
+            self._entries[self.key(file_path)] = entry
+            self._save()
+        return entry
+
+    def is_stale(self, file_path: str, policy: str = None, max_age_days: float = 30, now: datetime = None) -> bool:
+        """
+        判断数据集是否需要重新拉取
+
+        Args:
+            file_path: 数据文件路径
+            policy: 刷新策略，为 None 时使用清单中记录的策略，仍为 None 则按 max_age_days 判断
+            max_age_days: 没有刷新策略时的最大有效期（天）
+            now: 当前时间，默认 datetime.now()
+        """
+        if not os.path.exists(file_path):
+            return True
+        now = now or datetime.now()
+        entry = self.get(file_path)
+        if entry is None:
+            # 清单建立之前拉取的文件，退回到按修改时间判断
+            last_fetch = datetime.fromtimestamp(os.path.getmtime(file_path))
+            return now - last_fetch > timedelta(days=max_age_days)
+
+        last_fetch = datetime.fromtimestamp(entry['last_fetch'])
+        policy = policy or entry.get('policy')
+        if policy is None:
+            return now - last_fetch > timedelta(days=max_age_days)
+        last_data_date = datetime.strptime(entry['last_data_date'], '%Y-%m-%d') if entry.get('last_data_date') else None
+        return is_policy_stale(policy, last_fetch, now, last_data_date, entry.get('data_interval_days'))
+
+    def plan(self, max_age_days: float = 30, now: datetime = None) -> List[dict]:
+        """
+        列出数据目录下所有数据集及其是否需要重新拉取
+
+        Returns:
+            List[dict]: {'dataset', 'policy', 'last_fetch', 'last_data_date', 'stale'}
+        """
+        now = now or datetime.now()
+        result = []
+        for root, _, files in os.walk(self.data_root):
+            for file in files:
+                if not file.lower().endswith('.csv'):
+                    continue
+                file_path = os.path.join(root, file)
+                entry = self.get(file_path) or {}
+                policy = entry.get('policy') or get_default_policy(file_path)
+                result.append({
+                    'dataset': self.key(file_path),
+                    'policy': policy or f'{max_age_days}天',
+                    'last_fetch': datetime.fromtimestamp(entry['last_fetch']).strftime('%Y-%m-%d %H:%M') if entry else None,
+                    'last_data_date': entry.get('last_data_date'),
+                    'stale': self.is_stale(file_path, policy, max_age_days, now),
+                })
+        return sorted(result, key=lambda item: item['dataset'])
+
+
+_default_manifest = None
+_default_manifest_lock = threading.Lock()
+
+
+def get_manifest() -> DatasetManifest:
+    """
+    获取进程内共享的数据集清单
+    """
+    global _default_manifest
+    with _default_manifest_lock:
+        if _default_manifest is None:
+            _default_manifest = DatasetManifest()
+        return _default_manifest
+
+
+def print_plan(max_age_days: float = 30) -> List[dict]:
+    """
+    打印拉取计划：哪些数据集已过期需要重新拉取
+    """
+    plan = get_manifest().plan(max_age_days)
+    stale = [item for item in plan if item['stale']]
+    print(f"📋 共 {len(plan)} 个数据集，需要更新 {len(stale)} 个")
+    for item in plan:
+        status = '🔄' if item['stale'] else '✅'
+        print(f"  {status} {item['dataset']} [{item['policy']}] 上次拉取: {item['last_fetch'] or '未知'}, 最新数据: {item['last_data_date'] or '未知'}")
+    return plan
+
+
+if __name__ == '__main__':
+    # python -m stock_prediction.util.manifest plan
+    if len(sys.argv) > 1 and sys.argv[1] == 'plan':
+        print_plan()
+    else:
+        print("用法: python -m stock_prediction.util.manifest plan")
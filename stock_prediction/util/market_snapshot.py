@@ -0,0 +1,162 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 各季度报告的法定披露截止日（月, 日, 相对报告期的年份偏移）
+DISCLOSURE_DEADLINES = {
+    '0331': (4, 30, 0),   # 一季报: 当年4月30日
+    '0630': (8, 31, 0),   # 半年报: 当年8月31日
+    '0930': (10, 31, 0),  # 三季报: 当年10月31日
+    '1231': (4, 30, 1),   # 年报: 次年4月30日
+}
+
+
+def get_disclosure_deadline(report_date: str) -> datetime:
+    """
+    获取报告期的披露截止日，截止日之后拉取的全市场数据视为完整
+
+    Args:
+        report_date: 报告期 (格式: %Y%m%d)
+    """
+    month, day, year_offset = DISCLOSURE_DEADLINES[report_date[4:]]
+    return datetime(int(report_date[:4]) + year_offset, month, day, 23, 59, 59)
+
+
+class EarningsSnapshotStore:
+    """
+    全市场业绩报表快照的本地存储
+
+    每个报告期的全市场数据只下载一次，存入 SQLite 并按股票代码建立索引，
+    单只股票的查询直接从本地读取。披露截止日之前拉取的快照可能不完整，
+    超过 max_age_hours 后会重新下载；截止日之后拉取的快照不再更新。
+    """
+
+    def __init__(self, db_path: str = None, max_age_hours: float = 24) -> None:
+        self.db_path = db_path or os.path.join(root_dir, 'data', '市场数据', '业绩报表.db')
+        self.max_age_seconds = max_age_hours * 3600
+        self._download_locks = {}
+        self._locks_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS snapshots ('
+                'report_date TEXT PRIMARY KEY, fetched_at REAL, row_count INTEGER)'
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        打开数据库连接，正常退出时提交、异常时回滚，最后关闭连接
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _table_name(report_date: str) -> str:
+        return f'yjbb_{report_date}'
+
+    def _download_lock(self, report_date: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._download_locks.setdefault(report_date, threading.Lock())
+
+    def get_snapshot_info(self, report_date: str) -> Optional[tuple]:
+        """
+        获取快照的 (拉取时间戳, 行数)，不存在时返回 None
+        """
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT fetched_at, row_count FROM snapshots WHERE report_date = ?', (report_date,)
+            ).fetchone()
+
+    def is_complete(self, report_date: str) -> bool:
+        """
+        判断快照是否在披露截止日之后拉取，完整的快照不再更新
+        """
+        info = self.get_snapshot_info(report_date)
+        return info is not None and datetime.fromtimestamp(info[0]) > get_disclosure_deadline(report_date)
+
+    def is_fresh(self, report_date: str) -> bool:
+        """
+        判断快照是否可以直接使用
+        """
+        info = self.get_snapshot_info(report_date)
+        if info is None:
+            return False
+        return self.is_complete(report_date) or time.time() - info[0] <= self.max_age_seconds
+
+    def save_snapshot(self, report_date: str, df: pd.DataFrame) -> None:
+        """
+        保存全市场快照并按股票代码建立索引
+        """
+        table_name = self._table_name(report_date)
+        df = df.copy()
+        df['股票代码'] = df['股票代码'].astype(str)
+        with self._connect() as conn:
+            df.to_sql(table_name, conn, if_exists='replace', index=False)
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table_name}_code" ON "{table_name}" ("股票代码")')
+            conn.execute(
+                'INSERT OR REPLACE INTO snapshots (report_date, fetched_at, row_count) VALUES (?, ?, ?)',
+                (report_date, time.time(), len(df))
+            )
+        print(f"✅ 业绩报表快照已保存: {report_date}, 共 {len(df)} 行")
+
+    def query_stock(self, report_date: str, stock_code) -> pd.DataFrame:
+        """
+        从本地快照中查询单只股票的数据，快照不存在时返回空表
+        """
+        if self.get_snapshot_info(report_date) is None:
+            return pd.DataFrame()
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                f'SELECT * FROM "{self._table_name(report_date)}" WHERE "股票代码" = ?',
+                conn, params=(str(stock_code),)
+            )
+
+    def get_stock_rows(self, report_date: str, stock_code, download: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+        """
+        获取单只股票在指定报告期的业绩报表，必要时下载全市场快照
+
+        Args:
+            report_date: 报告期 (格式: %Y%m%d)
+            stock_code: 股票代码
+            download: 下载全市场数据的函数，参数为报告期
+
+        Returns:
+            pd.DataFrame: 该股票的数据，可能为空
+        """
+        if not self.is_fresh(report_date):
+            # 同一报告期同时只允许一个线程下载，其余线程等待后直接复用结果
+            with self._download_lock(report_date):
+                if not self.is_fresh(report_date):
+                    df = download(report_date)
+                    if df is not None and not df.empty:
+                        self.save_snapshot(report_date, df)
+        return self.query_stock(report_date, stock_code)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_earnings_snapshot_store() -> EarningsSnapshotStore:
+    """
+    获取进程内共享的业绩报表快照存储
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = EarningsSnapshotStore()
+        return _default_store
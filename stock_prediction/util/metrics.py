@@ -0,0 +1,230 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+
+# 默认的耗时分桶（秒），覆盖从毫秒级切片到分钟级的推理
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# 生成速度分桶（token/秒）
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300)
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple, extra: Dict[str, str] = None) -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs += [f'{name}="{value}"' for name, value in extra.items()]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """
+    指标基类，按标签值分别统计
+    """
+
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"指标 {self.name} 的标签必须是 {self.label_names}: {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    """
+    只增不减的计数器
+    """
+
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    可增可减的瞬时值
+    """
+
+    metric_type = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """
+    分桶直方图，记录分布、总和与次数
+    """
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # [各分桶计数..., 总和, 次数]
+            state = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        统计代码块的耗时
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            for upper_bound, count in zip(self.buckets, state):
+                labels = _format_labels(self.label_names, key, {'le': _format_value(upper_bound)})
+                lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(state[-2])}')
+            lines.append(f'{self.name}_count{labels} {state[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    进程内的指标注册表，可导出为 Prometheus 文本格式
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name: str, documentation: str, label_names: Tuple[str, ...], **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, documentation, label_names, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, metric_class) or metric.label_names != tuple(label_names):
+                raise ValueError(f"指标 {name} 已以不同的类型或标签注册")
+            return metric
+
+    def counter(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, label_names)
+
+    def gauge(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, label_names)
+
+    def histogram(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, label_names, buckets=buckets)
+
+    def render(self) -> str:
+        """
+        导出所有指标（Prometheus 文本格式 0.0.4）
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """
+    获取进程内共享的指标注册表
+    """
+    return REGISTRY
+
+
+class StreamMetrics:
+    """
+    统计一次流式生成的首 token 延迟、生成速度和总耗时
+    """
+
+    def __init__(self, agent: str, registry: MetricsRegistry = None) -> None:
+        registry = registry or REGISTRY
+        self.agent = agent
+        self.ttft = registry.histogram('agent_time_to_first_token_seconds', '智能体流式输出的首 token 延迟', ('agent',))
+        self.duration = registry.histogram('agent_call_duration_seconds', '智能体单次调用的总耗时', ('agent',))
+        self.token_rate = registry.histogram('agent_tokens_per_second', '智能体首 token 之后的生成速度', ('agent',),
+                                             buckets=TOKEN_RATE_BUCKETS)
+        self.tokens = registry.counter('agent_completion_tokens_total', '智能体生成的 token 数', ('agent',))
+        self.start_time = time.perf_counter()
+        self.first_token_time = None
+        self.token_count = 0
+        self.usage_tokens = None
+
+    def on_chunk(self, chunk) -> None:
+        """
+        记录一个流式分片，分片自带 usage 时以 usage 为准，否则每个分片按一个 token 计
+        """
+        if self.first_token_time is None:
+            self.first_token_time = time.perf_counter()
+            self.ttft.observe(self.first_token_time - self.start_time, agent=self.agent)
+        usage = getattr(chunk, 'usage', None)
+        if usage is not None and getattr(usage, 'completion_tokens', None):
+            self.usage_tokens = usage.completion_tokens
+        else:
+            self.token_count += 1
+
+    def finish(self) -> None:
+        end_time = time.perf_counter()
+        self.duration.observe(end_time - self.start_time, agent=self.agent)
+        tokens = self.usage_tokens or self.token_count
+        self.tokens.inc(tokens, agent=self.agent)
+        if self.first_token_time is not None and end_time > self.first_token_time:
+            self.token_rate.observe(tokens / (end_time - self.first_token_time), agent=self.agent)
@@ -0,0 +1,142 @@
+import os
+import re
+import zlib
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from typing import List, Optional
+from .metrics import get_metrics_registry
+
+
+# 估计的 Jaccard 相似度不低于该值的两条新闻视为重复，可通过环境变量 NEWS_DEDUP_THRESHOLD 调整，取值不大于 0 表示不去重
+DEFAULT_DEDUP_THRESHOLD = 0.7
+# 字符 shingle 的长度，中文新闻按字切分
+SHINGLE_SIZE = 3
+# MinHash 签名长度 = LSH 分段数 × 每段行数，分段 32 × 4 时相似度约 0.42 以上的新闻会成为候选
+LSH_BANDS = 32
+LSH_ROWS = 4
+NUM_PERMUTATIONS = LSH_BANDS * LSH_ROWS
+
+DUPLICATE_COUNT_COLUMN = '相似报道数'
+TEXT_COLUMNS = ('新闻标题', '新闻内容')
+
+# 梅森素数 2^31-1，保证 a * x + b 不超出 uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20250301)
+_HASH_A = _rng.integers(1, (1 << 31) - 1, NUM_PERMUTATIONS, dtype=np.uint64)
+_HASH_B = _rng.integers(0, (1 << 31) - 1, NUM_PERMUTATIONS, dtype=np.uint64)
+
+# 去掉空白和标点，只保留文字和数字
+_NOISE_PATTERN = re.compile(r'[\W_]+')
+
+
+def get_dedup_threshold() -> Optional[float]:
+    """
+    获取新闻去重的相似度阈值，None 表示不去重
+    """
+    value = os.environ.get('NEWS_DEDUP_THRESHOLD')
+    threshold = DEFAULT_DEDUP_THRESHOLD if value is None else float(value)
+    return threshold if threshold > 0 else None
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    把文本切分为字符 shingle 并哈希为 31 位整数
+    """
+    text = _NOISE_PATTERN.sub('', str(text)).lower()
+    if len(text) < size:
+        shingles = {text} if text else set()
+    else:
+        shingles = {text[i:i + size] for i in range(len(text) - size + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode('utf-8')) & 0x7fffffff for shingle in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+
+def minhash_signature(hashes: np.ndarray) -> np.ndarray:
+    """
+    计算 MinHash 签名，两个签名中相同位置取值相等的比例即 Jaccard 相似度的估计
+
+    Returns:
+        np.ndarray: 长度为 NUM_PERMUTATIONS 的签名，空文本为全最大值
+    """
+    if len(hashes) == 0:
+        return np.full(NUM_PERMUTATIONS, _PRIME, dtype=np.uint64)
+    return ((_HASH_A[:, None] * hashes[None, :] + _HASH_B[:, None]) % _PRIME).min(axis=1)
+
+
+def cluster_near_duplicates(texts: List[str], threshold: float = DEFAULT_DEDUP_THRESHOLD) -> np.ndarray:
+    """
+    用 MinHash + LSH 把近似重复的文本聚类
+
+    签名按段分桶，同一桶中的文本成为候选对，候选对的估计相似度不低于 threshold 时合并为一类。
+
+    Returns:
+        np.ndarray: 每条文本所属类别的编号（类中第一条文本的下标）
+    """
+    signatures = np.array([minhash_signature(shingle_hashes(text)) for text in texts]).reshape(len(texts), NUM_PERMUTATIONS)
+    empty = signatures[:, 0] == _PRIME
+    parent = np.arange(len(texts))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(LSH_BANDS):
+        buckets = defaultdict(list)
+        for i, rows in enumerate(signatures[:, band * LSH_ROWS:(band + 1) * LSH_ROWS]):
+            if not empty[i]:
+                buckets[rows.tobytes()].append(i)
+        for members in buckets.values():
+            for j in members[1:]:
+                first, other = find(members[0]), find(j)
+                if first == other:
+                    continue
+                if np.mean(signatures[members[0]] == signatures[j]) >= threshold:
+                    parent[max(first, other)] = min(first, other)
+    return np.array([find(i) for i in range(len(texts))], dtype=int)
+
+
+def deduplicate_news(df: pd.DataFrame, threshold: Optional[float] = None) -> pd.DataFrame:
+    """
+    去除近似重复的新闻（转载、改写标题的同一篇报道）
+
+    每类只保留最早发布的一条（通常是原始报道），保持原有顺序；有重复时增加一列"相似报道数"，
+    记录该类新闻的条数。
+
+    Args:
+        df: 新闻数据，需包含 新闻标题 / 新闻内容 中至少一列
+        threshold: 相似度阈值，None 时使用 get_dedup_threshold()
+    """
+    threshold = get_dedup_threshold() if threshold is None else threshold
+    text_columns = [column for column in TEXT_COLUMNS if column in df.columns]
+    if threshold is None or not text_columns or len(df) < 2:
+        return df
+
+    texts = df[text_columns].fillna('').astype(str).agg(' '.join, axis=1).tolist()
+    clusters = cluster_near_duplicates(texts, threshold)
+    if len(np.unique(clusters)) == len(df):
+        return df
+
+    positions = pd.Series(np.arange(len(df)))
+    if '发布时间' in df.columns:
+        # 同一类中发布时间最早的一条作为代表，时间相同时取靠前的
+        published = pd.to_datetime(df['发布时间'], errors='coerce').reset_index(drop=True)
+        order = pd.DataFrame({'cluster': clusters, 'published': published, 'position': positions})
+        order = order.sort_values(['cluster', 'published', 'position'], na_position='last', kind='stable')
+        representatives = np.sort(order.drop_duplicates('cluster')['position'].to_numpy())
+    else:
+        representatives = np.sort(pd.DataFrame({'cluster': clusters, 'position': positions})
+                                  .drop_duplicates('cluster')['position'].to_numpy())
+    counts = pd.Series(clusters).value_counts()
+
+    result = df.iloc[representatives].copy()
+    result[DUPLICATE_COUNT_COLUMN] = counts.reindex(clusters[representatives]).to_numpy()
+
+    removed = len(df) - len(result)
+    counter = get_metrics_registry().counter('news_dedup_articles_total', '新闻去重处理的条数，removed 表示被合并的重复新闻', ('result',))
+    counter.inc(len(result), result='kept')
+    counter.inc(removed, result='removed')
+    print(f"🔍 新闻去重: {len(df)} 条 → {len(result)} 条，合并了 {removed} 条近似重复的新闻")
+    return result
@@ -0,0 +1,363 @@
+import os
+import io
+import re
+import csv
+import random
+import threading
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Tuple
+from .metrics import get_metrics_registry
+from .token_budget import PromptSection, TokenBudget, estimate_tokens
+
+
+# legacy: 各读取函数原有的输出（to_string / "列名: 值"）
+# csv: 紧凑的逗号分隔表格（带表头）
+# markdown: 紧凑的 Markdown 表格
+# kv: 紧凑的 "列名: 值"，每行数据一段
+PROMPT_FORMATS = ('legacy', 'csv', 'markdown', 'kv')
+DEFAULT_PROMPT_FORMAT = 'csv'
+
+# 数值后缀单位，整列单位相同时提到表头中
+VALUE_UNIT_PATTERN = re.compile(r'^([+-]?\d+(?:\.\d+)?)\s*(%|亿元|万元|亿|万|元|倍|股|手)$')
+
+def get_token_report_sample_rate() -> float:
+    """
+    获取与原有输出（legacy）对比 token 数的抽样比例
+
+    对比需要额外按原有方式渲染一遍数据，默认关闭；环境变量 PROMPT_TOKEN_REPORT_SAMPLE_RATE 取 0~1，
+    如 0.05 表示抽样 5% 的调用，1 表示每次都对比。格式为 legacy 时无需额外渲染，始终对比。
+    """
+    return min(1.0, max(0.0, float(os.environ.get('PROMPT_TOKEN_REPORT_SAMPLE_RATE', 0))))
+
+
+def get_prompt_format(agent: str = None) -> str:
+    """
+    获取提示词序列化格式
+
+    优先级：环境变量 PROMPT_FORMAT_<智能体>（如 PROMPT_FORMAT_MARKET）> PROMPT_FORMAT > 默认 csv
+    """
+    prompt_format = None
+    if agent:
+        prompt_format = os.environ.get(f'PROMPT_FORMAT_{agent.upper()}')
+    prompt_format = (prompt_format or os.environ.get('PROMPT_FORMAT') or DEFAULT_PROMPT_FORMAT).lower()
+    if prompt_format not in PROMPT_FORMATS:
+        raise ValueError(f"提示词格式必须是 {PROMPT_FORMATS} 之一: {prompt_format}")
+    return prompt_format
+
+
+def format_value(value, decimals: int = 2) -> str:
+    """
+    格式化单个值：数值按位数四舍五入并去掉末尾的0，日期去掉为0的时间部分，空值为空字符串
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d') if value == value.normalize() else value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        text = f"{value:.{decimals}f}".rstrip('0').rstrip('.')
+        return '0' if text in ('-0', '') else text
+    return str(value)
+
+
+def format_fixed(values: np.ndarray, decimals: int = 2) -> np.ndarray:
+    """
+    按列把 float64 格式化为定点小数，结果与逐个 f"{value:.{decimals}f}" 完全一致
+
+    整数部分和小数部分分别由整型数组转换为字符串再拼接；舍入位恰好落在 .5 附近（二进制误差可能改变舍入方向）、
+    非有限值和过大的值仍由 Python 逐个格式化。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return np.array([], dtype=object)
+    scale = 10 ** decimals
+    with np.errstate(invalid='ignore', over='ignore'):
+        scaled = np.abs(values) * scale
+        fraction = scaled - np.floor(scaled)
+        exact = np.isfinite(scaled) & (scaled < 2.0 ** 50) & \
+            (np.abs(fraction - 0.5) > 4 * np.spacing(scaled) + 1e-9)
+    integers = np.where(exact, np.rint(np.where(exact, scaled, 0)), 0).astype(np.int64)
+    text = (integers // scale).astype(str).astype(object)
+    if decimals > 0:
+        text = text + '.' + np.char.zfill((integers % scale).astype(str), decimals).astype(object)
+    text = np.where(np.signbit(values), '-', '').astype(object) + text
+    if not exact.all():
+        fallback = ~exact
+        text[fallback] = [f"{value:.{decimals}f}" for value in values[fallback]]
+    return text
+
+
+def _format_cell(value, decimals: Optional[int], date_format: Optional[str]) -> str:
+    if decimals is not None and isinstance(value, float):
+        return f"{value:.{decimals}f}"
+    if date_format is not None and isinstance(value, pd.Timestamp):
+        return value.strftime(date_format)
+    return str(value)
+
+
+def format_cells(values: pd.Series, decimals: Optional[int] = 2, date_format: Optional[str] = None) -> np.ndarray:
+    """
+    按列把单元格格式化为字符串，结果与逐个单元格格式化一致：
+    浮点数保留 decimals 位小数（None 时为 str(值)），日期按 date_format 格式化（None 时为 str(值)），其余为 str(值)。
+    空值的结果未定义，由调用方处理。
+
+    Returns:
+        np.ndarray: 字符串数组（object）
+    """
+    dtype = values.dtype
+    if dtype == np.float64:
+        if decimals is not None:
+            return format_fixed(values.to_numpy(), decimals)
+        return values.to_numpy().astype(str).astype(object)
+    if isinstance(dtype, np.dtype) and (np.issubdtype(dtype, np.integer) or np.issubdtype(dtype, np.bool_)):
+        return values.to_numpy().astype(str).astype(object)
+    if date_format is not None and isinstance(dtype, np.dtype) and np.issubdtype(dtype, np.datetime64):
+        return values.dt.strftime(date_format).to_numpy(dtype=object)
+    if isinstance(dtype, pd.StringDtype):
+        return values.to_numpy(dtype=object)
+    # 混合类型的列逐个格式化
+    return np.array([_format_cell(value, decimals, date_format) for value in values], dtype=object)
+
+
+def format_kv_rows(df: pd.DataFrame, decimals: Optional[int] = 2, date_format: Optional[str] = None,
+                   skip_na: bool = True) -> List[str]:
+    """
+    把每行数据格式化为多行 "列名: 值"，按列整块转换和拼接，耗时只随列数线性增长
+
+    Args:
+        df: 数据表
+        decimals: 浮点数保留的小数位数，None 表示 str(值)
+        date_format: 日期的格式，None 表示 str(值)
+        skip_na: 是否跳过空值；不跳过时空值为 str(值)（如 nan）
+
+    Returns:
+        每行数据的文本
+    """
+    rows = np.full(len(df), '', dtype=object)
+    for position, column in enumerate(df.columns):
+        values = df.iloc[:, position]
+        text = format_cells(values, decimals, date_format)
+        missing = values.isna().to_numpy()
+        if missing.any():
+            text[missing] = '' if skip_na else [str(value) for value in values[missing]]
+        cells = f"{column}: " + text
+        if skip_na:
+            cells[missing] = ''
+        separators = np.where((rows != '') & (cells != ''), '\n', '').astype(object)
+        rows = rows + separators + cells
+    return rows.tolist()
+
+
+def extract_value_units(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    整列的值都带有相同单位（如 "1.23亿"、"12.5%"）时，把单位移到列名中，值转换为数值
+    """
+    renamed = {}
+    converted = {}
+    for column in df.columns:
+        if not (pd.api.types.is_object_dtype(df[column]) or pd.api.types.is_string_dtype(df[column])):
+            continue
+        values = df[column].dropna()
+        if values.empty or not all(isinstance(value, str) for value in values):
+            continue
+        matches = values.str.strip().str.extract(VALUE_UNIT_PATTERN)
+        if matches[0].isna().any() or matches[1].nunique() != 1:
+            continue
+        converted[column] = pd.to_numeric(matches[0]).reindex(df.index)
+        renamed[column] = f"{column}({matches[1].iloc[0]})"
+    if not converted:
+        return df
+    return df.assign(**converted).rename(columns=renamed)
+
+
+def compact_frame(df: pd.DataFrame, decimals: int = 2) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    压缩数据表：去掉全空列，提取单位，多行数据中取值不变的列提到表外只写一次，数值四舍五入
+
+    Returns:
+        (值均为字符串的数据表, 表外说明行)
+    """
+    notes = []
+    frame = df.dropna(axis=1, how='all')
+    frame = extract_value_units(frame)
+    if len(frame) > 1:
+        constant_columns = [column for column in frame.columns
+                            if frame[column].notna().all() and frame[column].nunique() == 1]
+        # 至少保留一列
+        if len(constant_columns) == len(frame.columns):
+            constant_columns = constant_columns[1:]
+        for column in constant_columns:
+            notes.append(f"{column}: {format_value(frame[column].iloc[0], decimals)}")
+        frame = frame.drop(columns=constant_columns)
+    frame = frame.apply(lambda column: column.map(lambda value: format_value(value, decimals)))
+    return frame, notes
+
+
+def render_frame(df: pd.DataFrame, prompt_format: str, decimals: int = 2) -> str:
+    """
+    按紧凑格式序列化数据表
+    """
+    frame, notes = compact_frame(df, decimals)
+    lines = list(notes)
+    if prompt_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(frame.columns)
+        writer.writerows(frame.itertuples(index=False, name=None))
+        lines.append(buffer.getvalue().rstrip('\n'))
+    elif prompt_format == 'markdown':
+        def escape(value: str) -> str:
+            return str(value).replace('|', '\\|').replace('\n', ' ')
+        lines.append('|' + '|'.join(escape(column) for column in frame.columns) + '|')
+        lines.append('|' + '|'.join('-' for _ in frame.columns) + '|')
+        lines.extend('|' + '|'.join(escape(value) for value in row) + '|'
+                     for row in frame.itertuples(index=False, name=None))
+    else:
+        blocks = ["\n".join(f"{column}: {value}" for column, value in zip(frame.columns, row) if value != '')
+                  for row in frame.itertuples(index=False, name=None)]
+        lines.append("\n\n".join(blocks))
+    return "\n".join(lines)
+
+
+class PromptTokenReport:
+    """
+    统计各智能体提示词数据的 token 数，并在抽样的调用中与原有输出（legacy）对比节省量
+    """
+
+    def __init__(self) -> None:
+        # 智能体 -> {'calls', 'legacy_tokens', 'tokens'}，只统计做过对比的调用
+        self._stats: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, prompt_format: str, legacy_text: Optional[str], text: str) -> None:
+        """
+        Args:
+            legacy_text: 原有输出，为 None 表示本次调用不做对比，只记录当前的 token 数
+        """
+        tokens = estimate_tokens(text)
+        metrics = get_metrics_registry()
+        metrics.counter('prompt_data_tokens_total', '提示词数据部分的估算 token 数', ('agent', 'format')).inc(
+            tokens, agent=agent, format=prompt_format)
+        if legacy_text is None:
+            return
+        legacy_tokens = tokens if text is legacy_text else estimate_tokens(legacy_text)
+        with self._lock:
+            stats = self._stats.setdefault(agent, {'calls': 0, 'legacy_tokens': 0, 'tokens': 0})
+            stats['calls'] += 1
+            stats['legacy_tokens'] += legacy_tokens
+            stats['tokens'] += tokens
+        metrics.counter('prompt_data_tokens_saved_total', '抽样对比中相比原有输出节省的估算 token 数', ('agent',)).inc(
+            legacy_tokens - tokens, agent=agent)
+
+    def report(self) -> List[dict]:
+        """
+        Returns:
+            [{'agent', 'calls', 'legacy_tokens', 'tokens', 'saved', 'saved_ratio'}]
+        """
+        with self._lock:
+            items = sorted((agent, dict(stats)) for agent, stats in self._stats.items())
+        result = []
+        for agent, stats in items:
+            saved = stats['legacy_tokens'] - stats['tokens']
+            result.append({'agent': agent, **stats, 'saved': saved,
+                           'saved_ratio': saved / stats['legacy_tokens'] if stats['legacy_tokens'] else 0.0})
+        return result
+
+    def print_report(self) -> None:
+        rows = self.report()
+        if not rows:
+            print("📋 暂无提示词 token 对比统计（可设置 PROMPT_TOKEN_REPORT_SAMPLE_RATE 开启）")
+            return
+        print("📊 提示词数据 token 节省统计（估算）:")
+        for row in rows:
+            print(f"  {row['agent']}: 对比 {row['calls']} 次, 原有 {row['legacy_tokens']} → 当前 {row['tokens']}, "
+                  f"节省 {row['saved']} ({row['saved_ratio']:.1%})")
+
+
+_token_report = PromptTokenReport()
+
+
+def get_prompt_token_report() -> PromptTokenReport:
+    """
+    获取进程内共享的 token 节省统计
+    """
+    return _token_report
+
+
+class PromptFormatter:
+    """
+    将读取到的数据序列化为提示词文本
+
+    每个读取函数都以原有的输出方式作为 legacy，格式为 legacy 时结果与原来完全一致；
+    指定了智能体时，会记录本次输出的 token 数，并按 get_token_report_sample_rate 抽样与 legacy 对比；
+    指定了 token 预算时，超出预算的数据会按 TokenBudget 的策略裁剪。
+    """
+
+    def __init__(self, prompt_format: str = 'legacy', agent: str = None, decimals: int = 2,
+                 budget: TokenBudget = None) -> None:
+        if prompt_format not in PROMPT_FORMATS:
+            raise ValueError(f"提示词格式必须是 {PROMPT_FORMATS} 之一: {prompt_format}")
+        self.prompt_format = prompt_format
+        self.agent = agent
+        self.decimals = decimals
+        self.budget = budget
+
+    def render_section(self, section: PromptSection) -> str:
+        """
+        按当前格式渲染一段数据
+        """
+        if section.text is not None:
+            return section.text
+        if self.prompt_format == 'legacy':
+            return section.legacy_render(section.df)
+        if section.single_row:
+            frame, _ = compact_frame(section.df, self.decimals)
+            return "\n".join(f"{column}: {value}" for column, value in zip(frame.columns, frame.iloc[0]) if value != '')
+        return render_frame(section.df, self.prompt_format, self.decimals)
+
+    def sections(self, sections: List[PromptSection]) -> List[str]:
+        """
+        在预算内渲染多段数据
+
+        Returns:
+            各段的文本，被预算丢弃的段为空字符串
+        """
+        # 原有输出只在抽样对比时渲染（裁剪会修改 sections，需要在裁剪前渲染）；legacy 格式下直接复用本次输出
+        legacy_text = None
+        compare = self.agent is not None and self.prompt_format != 'legacy' and \
+            random.random() < get_token_report_sample_rate()
+        if compare:
+            legacy_text = "\n".join(section.text if section.text is not None else section.legacy_render(section.df)
+                                    for section in sections)
+        if self.budget is not None:
+            texts = self.budget.fit(sections, self.render_section)
+        else:
+            texts = [self.render_section(section) for section in sections]
+        if self.agent is not None:
+            text = "\n".join(texts)
+            if self.prompt_format == 'legacy':
+                legacy_text = text
+            _token_report.record(self.agent, self.prompt_format, legacy_text, text)
+        return texts
+
+    def frame(self, df: pd.DataFrame, legacy_render: Callable[[pd.DataFrame], str] = None,
+              title: str = '数据', date_column: str = None, key_columns: Tuple[str, ...] = ()) -> str:
+        """
+        序列化多行数据，legacy 为 df.to_string() 或 legacy_render(df)
+        """
+        section = PromptSection(title, df, date_column=date_column, key_columns=key_columns,
+                                legacy_render=legacy_render)
+        return self.sections([section])[0]
+
+    def row(self, row: pd.Series, title: str = '数据') -> str:
+        """
+        序列化单行数据，紧凑格式下统一为 "列名: 值"（跳过空值），legacy 为 row.to_string()
+        """
+        section = PromptSection(title, row.to_frame().T, single_row=True,
+                                legacy_render=lambda frame: frame.iloc[0].to_string())
+        return self.sections([section])[0]
+
+
+LEGACY_FORMATTER = PromptFormatter('legacy')
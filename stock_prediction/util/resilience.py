@@ -0,0 +1,261 @@
+import time
+import random
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional
+from .metrics import get_metrics_registry
+
+
+# 全市场类的重接口单次调用耗时远超普通接口，默认给更长的截止时间（秒），其余接口使用 ResilientCaller.timeout
+DEFAULT_ENDPOINT_TIMEOUTS = {
+    'stock_yjbb_em': 180.0,
+}
+
+
+def parse_endpoint_timeouts(text: Optional[str]) -> Dict[str, float]:
+    """
+    解析按接口配置的截止时间，格式如 "stock_yjbb_em=180,stock_news_em=20"
+
+    Raises:
+        ValueError: 格式错误
+    """
+    timeouts = {}
+    for item in (text or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        endpoint, sep, seconds = item.partition('=')
+        if not sep or not endpoint.strip():
+            raise ValueError(f"接口截止时间的格式应为 接口名=秒数: {item}")
+        timeouts[endpoint.strip()] = float(seconds)
+    return timeouts
+
+
+class FetchTimeoutError(Exception):
+    """
+    接口调用超过截止时间
+    """
+
+
+class CircuitOpenError(Exception):
+    """
+    接口熔断中，暂时不再请求
+    """
+
+
+class DeadlineExecutor:
+    """
+    带截止时间的调用执行器
+
+    每次调用在独立的守护线程中执行，超过截止时间后调用方立即返回，
+    卡住的线程不会阻塞请求线程和进程退出。同时在途的调用数有上限，
+    卡住的调用会一直占用名额，直到上游最终返回。
+    """
+
+    def __init__(self, max_inflight: int = 16, name: str = 'deadline') -> None:
+        self.name = name
+        self._slots = threading.BoundedSemaphore(max_inflight)
+
+    def submit(self, func: Callable, timeout: float) -> Future:
+        """
+        在独立线程中开始执行 func，在途名额用完时最多等待 timeout 秒
+
+        Raises:
+            FetchTimeoutError: 等待在途名额超时
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise FetchTimeoutError(f"在途请求过多，等待 {timeout:g} 秒后仍无空闲名额")
+
+        future = Future()
+
+        def target():
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(func())
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                self._slots.release()
+
+        threading.Thread(target=target, name=self.name, daemon=True).start()
+        return future
+
+    @staticmethod
+    def wait(future: Future, timeout: float):
+        """
+        最多等待 timeout 秒获取调用结果，超时后调用仍在后台执行，可以再次等待
+
+        Raises:
+            FetchTimeoutError: 超时
+        """
+        try:
+            return future.result(timeout=max(0.0, timeout))
+        except FutureTimeoutError:
+            raise FetchTimeoutError(f"请求超过 {timeout:g} 秒未返回")
+
+    def run(self, func: Callable, timeout: float):
+        """
+        在截止时间内执行 func
+
+        Raises:
+            FetchTimeoutError: 超时，或等待在途名额超时
+        """
+        deadline = time.monotonic() + timeout
+        future = self.submit(func, timeout)
+        return self.wait(future, deadline - time.monotonic())
+
+
+class CircuitBreaker:
+    """
+    单个接口的熔断器
+
+    连续失败 failure_threshold 次后熔断，reset_timeout 秒内的请求直接失败；
+    之后放行一个试探请求，成功则恢复，失败则继续熔断。
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """
+        判断是否放行本次请求
+        """
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class ResilientCaller:
+    """
+    为上游接口调用加上截止时间、指数退避重试和按接口划分的熔断
+
+    超时的调用无法取消，线程会继续执行并占用在途名额。重试时如果上一次调用仍在执行，
+    继续等待它的结果，而不是再发起一次下载，避免卡住的请求越积越多。
+    """
+
+    def __init__(self, timeout: float = 30.0, max_retries: int = 3,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 failure_threshold: int = 5, reset_timeout: float = 60.0,
+                 endpoint_timeouts: Dict[str, float] = None) -> None:
+        """
+        Args:
+            timeout: 单次调用的默认截止时间（秒）
+            max_retries: 失败后的最大重试次数
+            backoff_base: 第一次重试前的基础等待时间（秒），之后每次翻倍
+            backoff_max: 单次等待时间上限（秒）
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断持续时间（秒）
+            endpoint_timeouts: {接口名: 截止时间}，覆盖 DEFAULT_ENDPOINT_TIMEOUTS 和默认截止时间
+        """
+        self.timeout = timeout
+        self.endpoint_timeouts = {**DEFAULT_ENDPOINT_TIMEOUTS, **(endpoint_timeouts or {})}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.executor = DeadlineExecutor()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+
+    def get_breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._breakers_lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[endpoint]
+
+    def get_timeout(self, endpoint: str) -> float:
+        """
+        获取接口单次调用的截止时间
+        """
+        return self.endpoint_timeouts.get(endpoint, self.timeout)
+
+    def get_backoff(self, attempt: int) -> float:
+        """
+        第 attempt 次重试前的等待时间，带随机抖动避免多个请求同时重试
+        """
+        return min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+    def call(self, endpoint: str, func: Callable):
+        """
+        调用接口
+
+        Args:
+            endpoint: 接口名称，熔断按接口独立统计
+            func: 无参数的调用函数
+
+        Raises:
+            CircuitOpenError: 接口熔断中
+            最后一次失败的异常
+        """
+        breaker = self.get_breaker(endpoint)
+        metrics = get_metrics_registry()
+        retry_counter = metrics.counter('akshare_call_retries_total', 'akshare 接口重试次数', ('endpoint',))
+        timeout_counter = metrics.counter('akshare_call_timeouts_total', 'akshare 接口超时次数', ('endpoint',))
+        circuit_gauge = metrics.gauge('akshare_circuit_open', 'akshare 接口是否处于熔断状态', ('endpoint',))
+        timeout = self.get_timeout(endpoint)
+        last_error = None
+        # 仍在执行的上一次调用
+        future = None
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                raise CircuitOpenError(f"接口 {endpoint} 熔断中，{self.reset_timeout:g} 秒内不再请求") from last_error
+            try:
+                if future is None:
+                    future = self.executor.submit(func, timeout)
+                else:
+                    print(f"⏳ 接口 {endpoint} 上一次请求仍在执行，继续等待")
+                result = self.executor.wait(future, timeout)
+            except Exception as e:
+                if future is not None and future.done():
+                    future = None
+                breaker.record_failure()
+                circuit_gauge.set(1 if breaker.state != 'closed' else 0, endpoint=endpoint)
+                last_error = e
+                if isinstance(e, FetchTimeoutError):
+                    timeout_counter.inc(endpoint=endpoint)
+                    print(f"⏰ 接口 {endpoint} 超时: {str(e)}")
+                if attempt < self.max_retries:
+                    retry_counter.inc(endpoint=endpoint)
+                    # 上一次调用仍在执行时直接继续等待，无需退避
+                    if future is None:
+                        wait_time = self.get_backoff(attempt)
+                        print(f"⚠️ 接口 {endpoint} 第 {attempt + 1} 次请求失败，{wait_time:.1f} 秒后重试: {str(e)}")
+                        time.sleep(wait_time)
+                continue
+            breaker.record_success()
+            circuit_gauge.set(0, endpoint=endpoint)
+            return result
+        raise last_error
@@ -0,0 +1,311 @@
+import os
+import sys
+import threading
+import pandas as pd
+from datetime import datetime
+from typing import List, Optional
+from .date_index import build_date_index
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STORAGE_FORMATS = ('csv', 'parquet', 'feather')
+COLUMNAR_EXTENSIONS = {'parquet': '.parquet', 'feather': '.feather'}
+
+# 列式文件中额外保存的主日期列（datetime64 类型），用于按日期过滤，读取时去掉
+DATE_INDEX_COLUMN = '__date__'
+ROW_GROUP_SIZE = 10000
+
+_warned_missing_pyarrow = False
+
+# 文件绝对路径 -> 锁
+_dataset_locks = {}
+_dataset_locks_lock = threading.Lock()
+
+
+def is_columnar_available() -> bool:
+    """
+    判断是否安装了列式存储依赖 pyarrow
+    """
+    return pa is not None
+
+
+def get_storage_format() -> str:
+    """
+    获取数据写入格式，由环境变量 DATA_STORAGE_FORMAT 控制（csv / parquet / feather），默认 csv
+
+    未安装 pyarrow 时退回 csv。
+    """
+    global _warned_missing_pyarrow
+    storage_format = os.environ.get('DATA_STORAGE_FORMAT', 'csv').lower()
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(f"DATA_STORAGE_FORMAT 必须是 {STORAGE_FORMATS} 之一: {storage_format}")
+    if storage_format != 'csv' and not is_columnar_available():
+        if not _warned_missing_pyarrow:
+            print(f"⚠️ 未安装 pyarrow，无法使用 {storage_format} 格式，退回 csv")
+            _warned_missing_pyarrow = True
+        return 'csv'
+    return storage_format
+
+
+def get_columnar_path(csv_path: str, storage_format: str) -> str:
+    """
+    获取CSV文件对应的列式文件路径
+    """
+    return os.path.splitext(csv_path)[0] + COLUMNAR_EXTENSIONS[storage_format]
+
+
+def find_columnar_file(csv_path: str) -> Optional[tuple]:
+    """
+    查找CSV文件对应的列式文件，列式文件比CSV旧时视为失效
+
+    Returns:
+        (列式文件路径, 格式)，不存在时返回 None
+    """
+    if not is_columnar_available():
+        return None
+    csv_mtime = os.path.getmtime(csv_path) if os.path.exists(csv_path) else None
+    for storage_format in COLUMNAR_EXTENSIONS:
+        columnar_path = get_columnar_path(csv_path, storage_format)
+        if os.path.exists(columnar_path) and (csv_mtime is None or os.path.getmtime(columnar_path) >= csv_mtime):
+            return columnar_path, storage_format
+    return None
+
+
+def get_primary_dates(df: pd.DataFrame) -> Optional[pd.Series]:
+    """
+    解析数据的主日期列（第一个可识别的日期列）
+
+    Returns:
+        pd.Series: datetime64 类型的日期，没有日期列时返回 None
+    """
+    # 延迟导入，避免与 data_api 循环导入
+    from .data_api import find_date_columns, parse_date_column
+    date_columns = find_date_columns(df)
+    if not date_columns:
+        return None
+    return parse_date_column(df[date_columns[0]], date_columns[0])
+
+
+def write_atomic(write, target_path: str) -> None:
+    """
+    先写入同目录下的临时文件再重命名，读取方不会看到写了一半的文件
+
+    Args:
+        write: 写文件的函数，参数为临时文件路径
+        target_path: 目标文件路径
+    """
+    tmp_path = f'{target_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def to_csv_atomic(df, csv_path: str) -> None:
+    """
+    以原子方式保存CSV
+    """
+    write_atomic(lambda p: df.to_csv(p, index=False, encoding='utf-8-sig'), csv_path)
+
+
+def get_dataset_lock(file_path: str) -> threading.Lock:
+    """
+    获取数据集的锁，同一文件在进程内只有一个线程在拉取和写入
+    """
+    file_path = os.path.abspath(file_path)
+    with _dataset_locks_lock:
+        return _dataset_locks.setdefault(file_path, threading.Lock())
+
+
+def write_columnar(df: pd.DataFrame, csv_path: str, storage_format: str = 'parquet') -> Optional[str]:
+    """
+    将数据写为CSV对应的列式文件，附带类型化的主日期列
+
+    Returns:
+        str: 列式文件路径，写入失败（如混合类型的列）时返回 None
+    """
+    columnar_path = get_columnar_path(csv_path, storage_format)
+    frame = df.reset_index(drop=True)
+    dates = get_primary_dates(frame)
+    if dates is not None:
+        frame = frame.assign(**{DATE_INDEX_COLUMN: dates.values})
+    try:
+        if storage_format == 'parquet':
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            write_atomic(lambda p: pq.write_table(table, p, row_group_size=ROW_GROUP_SIZE), columnar_path)
+        else:
+            write_atomic(lambda p: feather.write_feather(frame, p), columnar_path)
+    except (pa.ArrowException, ValueError, TypeError) as e:
+        print(f"⚠️ 写入列式文件失败，继续使用CSV: {csv_path} ({str(e)})")
+        return None
+    return columnar_path
+
+
+def write_table(df, csv_path: str, storage_format: str = None) -> None:
+    """
+    保存数据：始终写CSV（兼容旧的读取方式）并建立日期索引，配置了列式格式时同时写列式文件
+
+    列式文件和日期索引由写出的CSV重新解析得到，保证与直接读取CSV的结果完全一致。
+
+    Args:
+        df: 要保存的数据（DataFrame 或 Series）
+        csv_path: CSV文件路径
+        storage_format: 列式格式，默认取 get_storage_format()
+    """
+    to_csv_atomic(df, csv_path)
+    written_df = pd.read_csv(csv_path, encoding='utf-8-sig', low_memory=False)
+    build_date_index(csv_path, written_df)
+    storage_format = storage_format or get_storage_format()
+    if storage_format != 'csv':
+        write_columnar(written_df, csv_path, storage_format)
+
+
+def _filter_by_dates(df: pd.DataFrame, dates: Optional[pd.Series],
+                     start_date: Optional[datetime], end_date: Optional[datetime]) -> pd.DataFrame:
+    if dates is None:
+        return df
+    mask = pd.Series(True, index=df.index)
+    if start_date is not None:
+        mask &= dates.values >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= dates.values <= pd.Timestamp(end_date)
+    return df[mask.values].reset_index(drop=True)
+
+
+def _read_columnar(columnar_path: str, storage_format: str, columns: Optional[List[str]],
+                   start_date: Optional[datetime], end_date: Optional[datetime]) -> pd.DataFrame:
+    filter_dates = start_date is not None or end_date is not None
+    if storage_format == 'parquet':
+        schema_names = pq.read_schema(columnar_path).names
+        has_dates = DATE_INDEX_COLUMN in schema_names
+        read_columns = None
+        if columns is not None:
+            read_columns = list(columns) + ([DATE_INDEX_COLUMN] if has_dates and filter_dates else [])
+        filters = None
+        if filter_dates and has_dates:
+            # 按行组的日期统计信息跳过范围外的行组
+            filters = []
+            if start_date is not None:
+                filters.append((DATE_INDEX_COLUMN, '>=', pd.Timestamp(start_date)))
+            if end_date is not None:
+                filters.append((DATE_INDEX_COLUMN, '<=', pd.Timestamp(end_date)))
+        df = pq.read_table(columnar_path, columns=read_columns, filters=filters).to_pandas()
+    else:
+        df = feather.read_feather(columnar_path)
+        if filter_dates and DATE_INDEX_COLUMN in df.columns:
+            df = _filter_by_dates(df, df[DATE_INDEX_COLUMN], start_date, end_date)
+        if columns is not None:
+            df = df[list(columns)]
+    return df.drop(columns=[DATE_INDEX_COLUMN], errors='ignore')
+
+
+def read_table(csv_path: str, columns: List[str] = None,
+               start_date: datetime = None, end_date: datetime = None) -> pd.DataFrame:
+    """
+    读取数据文件，存在有效的列式文件时优先读取列式文件，否则读取CSV
+
+    Args:
+        csv_path: CSV文件路径（列式文件与其同名，扩展名不同）
+        columns: 只读取指定的列，None 表示全部
+        start_date: 按主日期列过滤的开始时间（包含）
+        end_date: 按主日期列过滤的结束时间（包含）
+
+    Raises:
+        FileNotFoundError: CSV和列式文件都不存在
+    """
+    found = find_columnar_file(csv_path)
+    if found is not None:
+        try:
+            return _read_columnar(found[0], found[1], columns, start_date, end_date)
+        except (OSError, pa.ArrowException) as e:
+            print(f"⚠️ 读取列式文件失败，改为读取CSV: {found[0]} ({str(e)})")
+
+    if start_date is None and end_date is None:
+        df = pd.read_csv(csv_path, encoding='utf-8-sig', usecols=columns, low_memory=False)
+    else:
+        df = pd.read_csv(csv_path, encoding='utf-8-sig', low_memory=False)
+        df = _filter_by_dates(df, get_primary_dates(df), start_date, end_date)
+    return df[list(columns)] if columns is not None else df
+
+
+def migrate_directory(directory: str = None, storage_format: str = 'parquet') -> dict:
+    """
+    一次性将目录下所有CSV转换为列式文件，CSV保留不动
+
+    Returns:
+        dict: {'converted', 'skipped', 'failed'} 计数
+    """
+    if not is_columnar_available():
+        raise RuntimeError("迁移需要安装 pyarrow")
+    directory = directory or os.path.join(root_dir, 'data')
+    stats = {'converted': 0, 'skipped': 0, 'failed': 0}
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if not file.lower().endswith('.csv'):
+                continue
+            csv_path = os.path.join(root, file)
+            if find_columnar_file(csv_path) is not None:
+                stats['skipped'] += 1
+                continue
+            try:
+                df = pd.read_csv(csv_path, encoding='utf-8-sig', low_memory=False)
+            except (OSError, pd.errors.EmptyDataError, pd.errors.ParserError) as e:
+                print(f"❌ 读取失败: {csv_path} ({str(e)})")
+                stats['failed'] += 1
+                continue
+            if write_columnar(df, csv_path, storage_format) is None:
+                stats['failed'] += 1
+            else:
+                stats['converted'] += 1
+    print(f"✅ 迁移完成: 转换 {stats['converted']} 个, 跳过 {stats['skipped']} 个, 失败 {stats['failed']} 个")
+    return stats
+
+
+def export_directory_to_csv(directory: str = None) -> int:
+    """
+    将目录下的列式文件导出为CSV，用于兼容只能读取CSV的工具
+
+    Returns:
+        int: 导出的文件数
+    """
+    if not is_columnar_available():
+        raise RuntimeError("导出需要安装 pyarrow")
+    directory = directory or os.path.join(root_dir, 'data')
+    exported = 0
+    for root, _, files in os.walk(directory):
+        for file in files:
+            storage_format = next((fmt for fmt, ext in COLUMNAR_EXTENSIONS.items() if file.endswith(ext)), None)
+            if storage_format is None:
+                continue
+            csv_path = os.path.join(root, os.path.splitext(file)[0] + '.csv')
+            if find_columnar_file(csv_path) is None:
+                continue
+            df = _read_columnar(os.path.join(root, file), storage_format, None, None, None)
+            to_csv_atomic(df, csv_path)
+            # 保持列式文件不早于CSV，避免被判定为失效
+            os.utime(os.path.join(root, file))
+            exported += 1
+    print(f"✅ 导出完成: {exported} 个CSV文件")
+    return exported
+
+
+if __name__ == '__main__':
+    # python -m stock_prediction.util.storage migrate [parquet|feather]
+    # python -m stock_prediction.util.storage export
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'migrate':
+        migrate_directory(storage_format=sys.argv[2] if len(sys.argv) > 2 else 'parquet')
+    elif command == 'export':
+        export_directory_to_csv()
+    else:
+        print("用法: python -m stock_prediction.util.storage migrate [parquet|feather] | export")
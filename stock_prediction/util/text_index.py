@@ -0,0 +1,219 @@
+import os
+import re
+import math
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from .frame_cache import get_file_identity
+from .metrics import get_metrics_registry
+
+try:
+    import jieba
+except ImportError:
+    jieba = None
+
+
+# 各数据源默认检索的条数，None 表示不检索（全部输出）
+DEFAULT_RETRIEVAL_TOP_K = {
+    'news': 20,
+    'report': 10,
+}
+# 相关度按发布时间衰减的半衰期（天）
+RECENCY_HALF_LIFE_DAYS = {
+    'news': 14,
+    'report': 180,
+}
+# 进程内缓存的索引数量上限
+MAX_CACHED_INDEXES = 64
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# 汉字串、英文单词、数字
+TOKEN_PATTERN = re.compile(r'[\u4e00-\u9fff]+|[A-Za-z]+|\d+(?:\.\d+)?')
+
+
+def get_retrieval_top_k(source: str) -> Optional[int]:
+    """
+    获取数据源的检索条数
+
+    优先级：环境变量 RETRIEVAL_TOP_K_<数据源>（如 RETRIEVAL_TOP_K_NEWS）> RETRIEVAL_TOP_K > 默认值，
+    取值不大于 0 表示不检索，输出全部数据。
+    """
+    value = os.environ.get(f'RETRIEVAL_TOP_K_{source.upper()}') or os.environ.get('RETRIEVAL_TOP_K')
+    if value is None:
+        return DEFAULT_RETRIEVAL_TOP_K.get(source)
+    top_k = int(value)
+    return top_k if top_k > 0 else None
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    中文分词：安装了 jieba 时使用其搜索引擎模式（去掉单字），否则按相邻两字切分；英文转小写，数字保留
+    """
+    tokens = []
+    for piece in TOKEN_PATTERN.findall(str(text)):
+        if '\u4e00' <= piece[0] <= '\u9fff':
+            if jieba is not None:
+                tokens.extend(word for word in jieba.cut_for_search(piece) if len(word) > 1)
+            elif len(piece) == 1:
+                tokens.append(piece)
+            else:
+                tokens.extend(piece[i:i + 2] for i in range(len(piece) - 1))
+        else:
+            tokens.append(piece.lower())
+    return tokens
+
+
+class BM25Index:
+    """
+    BM25 倒排索引
+
+    文档按日期升序编号，检索时只在截止日期及之前的文档前缀上计算（文档频率和平均长度也只统计这部分），
+    结果不受截止日期之后的数据影响。没有日期的文档视为最早的文档，任何截止日期都可见。
+    """
+
+    def __init__(self, texts: Sequence[str], dates: Optional[Sequence] = None) -> None:
+        """
+        Args:
+            texts: 文档文本
+            dates: 文档日期，None 表示全部没有日期
+        """
+        if dates is None:
+            dates = [pd.NaT] * len(texts)
+        # NaT 的整数表示为 int64 最小值，排序时在最前
+        date_values = pd.to_datetime(pd.Series(dates), errors='coerce').to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        self.order = np.argsort(date_values, kind='stable')
+        self.dates = date_values[self.order]
+
+        postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        lengths = np.zeros(len(texts), dtype=np.float64)
+        for doc_id, position in enumerate(self.order):
+            tokens = tokenize(texts[position])
+            lengths[doc_id] = len(tokens)
+            for token in tokens:
+                counts = postings[token]
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+        self.lengths = lengths
+        self.cumulative_lengths = np.cumsum(lengths)
+        # 词 -> (升序的文档编号, 词频)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            token: (np.fromiter(counts.keys(), dtype=np.int64, count=len(counts)),
+                    np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+            for token, counts in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def search(self, query: str, as_of: datetime = None, limit: int = None,
+               half_life_days: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        检索与查询相关的文档
+
+        Args:
+            query: 查询文本
+            as_of: 截止时间（包含），None 表示全部文档
+            limit: 返回的最大条数，None 表示全部可见文档
+            half_life_days: 相关度按距截止时间的天数衰减的半衰期，None 表示不衰减
+
+        Returns:
+            (文档在原始输入中的下标, 得分)，按得分降序，得分相同时较新的在前
+        """
+        n = len(self.dates) if as_of is None else int(np.searchsorted(self.dates, pd.Timestamp(as_of).value, side='right'))
+        if n == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+
+        scores = np.zeros(n, dtype=np.float64)
+        average_length = self.cumulative_lengths[n - 1] / n or 1.0
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            visible = int(np.searchsorted(posting[0], n))
+            if visible == 0:
+                continue
+            doc_ids, frequencies = posting[0][:visible], posting[1][:visible]
+            idf = math.log(1 + (n - visible + 0.5) / (visible + 0.5))
+            norms = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_ids] / average_length)
+            scores[doc_ids] += idf * frequencies * (BM25_K1 + 1) / (frequencies + norms)
+
+        dates = self.dates[:n]
+        if half_life_days:
+            reference = pd.Timestamp(as_of).value if as_of is not None else dates[-1]
+            dated = dates != np.iinfo(np.int64).min
+            ages = np.maximum(reference - np.where(dated, dates, reference), 0) / (86400 * 1e9)
+            scores = scores * np.power(0.5, ages / half_life_days)
+
+        # 文档按日期升序编号，编号越大越新
+        ranked = np.lexsort((-np.arange(n), -scores))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return self.order[ranked], scores[ranked]
+
+
+_indexes: 'OrderedDict[tuple, BM25Index]' = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index_key(file_path: str, data_view=None) -> tuple:
+    """
+    索引的缓存键：文件标识，传入数据视图时加上视图的日期范围
+    """
+    key = (os.path.abspath(file_path), get_file_identity(file_path))
+    if data_view is not None:
+        key += (data_view.start_date, data_view.end_date)
+    return key
+
+
+def get_text_index(key: tuple, df: pd.DataFrame, text_columns: Sequence[str], date_column: str = None) -> BM25Index:
+    """
+    获取数据表对应的索引（进程内按 LRU 缓存），文件未变化时不重新建立
+    """
+    key = key + (tuple(text_columns), date_column, len(df))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+    texts = [' '.join(row) for row in df[list(text_columns)].fillna('').astype(str).itertuples(index=False, name=None)]
+    dates = df[date_column] if date_column in df.columns else None
+    index = BM25Index(texts, dates)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def retrieve_relevant(df: pd.DataFrame, key: tuple, source: str, query: str, text_columns: Sequence[str],
+                      date_column: str = None, as_of: datetime = None, limit: int = None) -> pd.DataFrame:
+    """
+    检索数据表中与查询最相关的行
+
+    Args:
+        df: 数据表（建立索引的完整数据，截止时间之后的行不会被返回）
+        key: 索引缓存键，见 get_index_key
+        source: 数据源名称（news / report），决定相关度的时间衰减
+        query: 查询文本，如公司主营业务
+        text_columns: 参与检索的文本列，不存在的列会被忽略
+        date_column: 日期列
+        as_of: 截止时间（包含）
+        limit: 返回的最大行数，None 表示全部
+
+    Returns:
+        pd.DataFrame: 按相关度降序排列的行
+    """
+    text_columns = [column for column in text_columns if column in df.columns]
+    if not text_columns or df.empty:
+        return df
+    histogram = get_metrics_registry().histogram('retrieval_duration_seconds', '本地检索（含建立索引）的耗时', ('source',))
+    with histogram.time(source=source):
+        index = get_text_index(key, df, text_columns, date_column)
+        positions, _ = index.search(query, as_of=as_of, limit=limit,
+                                    half_life_days=RECENCY_HALF_LIFE_DAYS.get(source))
+    return df.iloc[positions]
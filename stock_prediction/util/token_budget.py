@@ -0,0 +1,228 @@
+import os
+import re
+import math
+import numpy as np
+import pandas as pd
+from typing import Callable, Iterator, List, Optional, Sequence
+from .metrics import get_metrics_registry
+
+
+# 各智能体默认的输入 token 预算（只计提示词中的数据部分），None 表示不限制
+DEFAULT_TOKEN_BUDGETS = {
+    'market': 6000,
+    'news': 16000,
+    'fundamental': 16000,
+    'macro': 12000,
+}
+
+# 按日期只保留最近的行数，依次收紧
+RECENCY_WINDOWS = (60, 40, 20, 10, 5)
+# 行抽样时每个数据段至少保留的行数
+MIN_SAMPLED_ROWS = 5
+
+# 粗略的分词规则：汉字、英文单词、数字、空白、其他符号
+TOKEN_PATTERN = re.compile(r'[\u4e00-\u9fff]|[A-Za-z]+|\d+|\s+|[^\sA-Za-z\d\u4e00-\u9fff]')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    在本地估算文本的 token 数，不依赖模型的分词器
+
+    经验值：每个汉字约 0.6 个 token，英文单词约每 4 个字母 1 个，数字约每 3 位 1 个，
+    连续空白约每 4 个字符 1 个，其他符号各 1 个。
+    """
+    if not text:
+        return 0
+    tokens = 0.0
+    for piece in TOKEN_PATTERN.findall(text):
+        first = piece[0]
+        if '\u4e00' <= first <= '\u9fff':
+            tokens += 0.6
+        elif first.isspace():
+            tokens += math.ceil(len(piece) / 4)
+        elif first.isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        elif first.isascii() and first.isalpha():
+            tokens += math.ceil(len(piece) / 4)
+        else:
+            tokens += 1
+    return int(math.ceil(tokens))
+
+
+def get_token_budget(agent: str = None) -> Optional[int]:
+    """
+    获取智能体的输入 token 预算
+
+    优先级：环境变量 PROMPT_TOKEN_BUDGET_<智能体>（如 PROMPT_TOKEN_BUDGET_NEWS）> PROMPT_TOKEN_BUDGET > 默认值，
+    取值不大于 0 表示不限制。
+    """
+    value = os.environ.get(f'PROMPT_TOKEN_BUDGET_{agent.upper()}') if agent else None
+    value = value or os.environ.get('PROMPT_TOKEN_BUDGET')
+    if value is None:
+        return DEFAULT_TOKEN_BUDGETS.get(agent)
+    budget = int(value)
+    return budget if budget > 0 else None
+
+
+class PromptSection:
+    """
+    提示词中的一段数据，预算不足时可以被裁剪
+    """
+
+    def __init__(self, title: str, df: pd.DataFrame = None, text: str = None, priority: int = 1,
+                 date_column: str = None, key_columns: Sequence[str] = (), single_row: bool = False,
+                 legacy_render: Callable[[pd.DataFrame], str] = None) -> None:
+        """
+        Args:
+            title: 名称，用于记录裁剪日志
+            df: 数据表，与 text 二选一
+            text: 已格式化好的文本，只能整段丢弃
+            priority: 优先级，越小越先被丢弃
+            date_column: 日期列，用于只保留最近的数据
+            key_columns: 不会被裁剪的列
+            single_row: 是否为单行数据（不做按行裁剪）
+            legacy_render: 原有的输出方式，默认 df.to_string()
+        """
+        self.title = title
+        self.df = df
+        self.text = text
+        self.priority = priority
+        self.date_column = date_column
+        self.key_columns = tuple(key_columns)
+        self.single_row = single_row
+        self.legacy_render = legacy_render or (lambda frame: frame.to_string())
+        self.dropped = False
+        self.original_rows = len(df) if df is not None else 0
+
+
+class TokenBudget:
+    """
+    智能体的输入 token 预算
+
+    同一个预算可以被多次读取共享，每次读取只能使用剩余的部分。超出预算时按顺序应用：
+    1. 按日期只保留最近的行
+    2. 对行均匀抽样
+    3. 删除非关键列（每次删除占用最多的一列）
+    4. 按优先级丢弃整段数据
+    每一步之后重新估算，满足预算即停止。
+    """
+
+    def __init__(self, limit: Optional[int], agent: str = None) -> None:
+        self.limit = limit
+        self.agent = agent
+        self.used = 0
+        # [(策略, 说明)]
+        self.cuts = []
+
+    @property
+    def remaining(self) -> Optional[int]:
+        if self.limit is None:
+            return None
+        return max(0, self.limit - self.used)
+
+    def fit(self, sections: List[PromptSection], render: Callable[[PromptSection], str]) -> List[str]:
+        """
+        在剩余预算内渲染各段数据，会直接修改传入的 sections
+
+        Returns:
+            各段的文本，被丢弃的段为空字符串
+        """
+        texts = [render(section) for section in sections]
+        total = sum(estimate_tokens(text) for text in texts)
+        remaining = self.remaining
+        if remaining is None or total <= remaining:
+            self.used += total
+            return texts
+
+        original_total = total
+        cuts = {}
+        policies = [('recency', self._recency_window), ('sample', self._sample_rows),
+                    ('columns', self._prune_columns), ('sections', self._drop_sections)]
+        for policy_name, policy in policies:
+            for section, description in policy(sections):
+                # 按行裁剪时同一段只保留最后一次的说明，删除的列和丢弃的段逐条记录
+                if policy_name in ('recency', 'sample'):
+                    cuts[(policy_name, section.title)] = description
+                else:
+                    cuts[(policy_name, section.title, description)] = description
+                texts = ['' if section.dropped else render(section) for section in sections]
+                total = sum(estimate_tokens(text) for text in texts)
+                if total <= remaining:
+                    break
+            if total <= remaining:
+                break
+
+        self.used += total
+        self._log_cuts(original_total, total, remaining, cuts)
+        return texts
+
+    def _log_cuts(self, original_total: int, total: int, remaining: int, cuts: dict) -> None:
+        counter = get_metrics_registry().counter('prompt_budget_cuts_total', '超出 token 预算时各裁剪策略的执行次数',
+                                                 ('agent', 'policy'))
+        agent = self.agent or 'unknown'
+        print(f"⚠️ [{agent}] 提示词数据约 {original_total} tokens，超出剩余预算 {remaining}，裁剪后约 {total} tokens:")
+        for (policy_name, *_), description in cuts.items():
+            counter.inc(agent=agent, policy=policy_name)
+            self.cuts.append((policy_name, description))
+            print(f"  - {description}")
+
+    @staticmethod
+    def _frame_sections(sections: List[PromptSection]) -> List[PromptSection]:
+        return [section for section in sections if section.df is not None and not section.dropped]
+
+    def _recency_window(self, sections: List[PromptSection]) -> Iterator[tuple]:
+        for window in RECENCY_WINDOWS:
+            for section in self._frame_sections(sections):
+                if section.single_row or section.date_column not in section.df.columns or len(section.df) <= window:
+                    continue
+                # 延迟导入，避免与 data_api 循环导入
+                from .data_api import parse_date_column
+                # 无法解析的日期不参与排序，否则会被当作最新的行保留下来
+                dates = parse_date_column(section.df[section.date_column], section.date_column).dropna()
+                if dates.empty:
+                    continue
+                newest = dates.sort_values(kind='stable').index[-window:]
+                section.df = section.df[section.df.index.isin(newest)]
+                yield section, f"{section.title}: 只保留最近 {len(section.df)} 行（原 {section.original_rows} 行）"
+
+    def _sample_rows(self, sections: List[PromptSection]) -> Iterator[tuple]:
+        while True:
+            candidates = [section for section in self._frame_sections(sections)
+                          if not section.single_row and len(section.df) > MIN_SAMPLED_ROWS]
+            if not candidates:
+                return
+            for section in candidates:
+                rows = len(section.df)
+                # 均匀抽样，保留首尾行
+                positions = np.unique(np.linspace(0, rows - 1, max(MIN_SAMPLED_ROWS, rows // 2)).round().astype(int))
+                section.df = section.df.iloc[positions]
+                yield section, f"{section.title}: 均匀抽样至 {len(section.df)} 行（原 {section.original_rows} 行）"
+
+    def _prune_columns(self, sections: List[PromptSection]) -> Iterator[tuple]:
+        while True:
+            widest = None
+            for section in self._frame_sections(sections):
+                if len(section.df.columns) <= 1:
+                    continue
+                for column in section.df.columns:
+                    if column in section.key_columns or column == section.date_column:
+                        continue
+                    tokens = estimate_tokens(' '.join(section.df[column].dropna().astype(str)))
+                    if widest is None or tokens > widest[0]:
+                        widest = (tokens, section, column)
+            if widest is None:
+                return
+            _, section, column = widest
+            section.df = section.df.drop(columns=[column])
+            yield section, f"{section.title}: 删除列 {column}"
+
+    def _drop_sections(self, sections: List[PromptSection]) -> Iterator[tuple]:
+        # 优先级相同时先丢弃靠后的段，至少保留一段
+        order = sorted(range(len(sections)), key=lambda i: (sections[i].priority, -i))
+        for i in order:
+            if sum(not section.dropped for section in sections) <= 1:
+                return
+            if sections[i].dropped:
+                continue
+            sections[i].dropped = True
+            yield sections[i], f"丢弃 {sections[i].title}"
@@ -0,0 +1,12 @@
+import pandas as pd
+from stock_prediction.util.text_index import get_text_index, retrieve_relevant
+
+
+def test_retrieve_relevant_on_empty_frame():
+    df = pd.DataFrame({'新闻标题': ['业绩 增长'], '发布时间': ['2024-01-01']}).iloc[:0]
+
+    result = retrieve_relevant(df, ('empty',), 'news', '业绩', ['新闻标题'], '发布时间', limit=5)
+    assert result.empty
+
+    positions, scores = get_text_index(('empty',), df, ['新闻标题'], '发布时间').search('业绩')
+    assert len(positions) == 0 and len(scores) == 0
@@ -0,0 +1,17 @@
+import pandas as pd
+from stock_prediction.util.token_budget import PromptSection, TokenBudget
+
+
+def test_recency_window_drops_unparseable_dates():
+    dates = pd.date_range('2024-01-01', periods=80, freq='D').strftime('%Y-%m-%d').tolist()
+    dates[0] = '未知日期'
+    df = pd.DataFrame({'日期': dates, '收盘': range(80)})
+    section = PromptSection('价格', df=df, date_column='日期')
+
+    windows = TokenBudget(limit=0)._recency_window([section])
+    next(windows)
+
+    assert len(section.df) == 60
+    assert '未知日期' not in section.df['日期'].tolist()
+    assert section.df['日期'].iloc[-1] == dates[-1]
+    assert section.df['日期'].iloc[0] == dates[20]